@@ -1,7 +1,10 @@
 import re
 from abc import ABC, abstractmethod
-import copy
-from health_system import HealthSystem
+from collections.abc import MutableMapping
+from health_system import HealthMixin, HealthSystem
+from components import copy_attributes
+from particle_store import ParticleStore
+from rng_streams import RandomStreams
 
 SCREEN_WIDTH = 1024
 SCREEN_HEIGHT = 576
@@ -9,10 +12,16 @@ SCREEN_HEIGHT = 576
 SPATIAL_RESOLUTION = 576
 NUM_INPUTS = 4
 
-import random
-
 class Particle:
+    # slot, kind_slot and removed are bookkeeping owned by BaseGame: position
+    # in BaseGame.particles, position in the kind bucket, and the tombstone
+    # set by remove_particle
+    __slots__ = ("kind", "x", "y", "attributes", "health_system", "slot", "kind_slot", "removed")
+
     def __init__(self, kind, x, y, attributes=None):
+        self.slot = -1
+        self.kind_slot = -1
+        self.removed = False
         self.kind = kind
         self.x = x
         self.y = y
@@ -20,13 +29,60 @@ class Particle:
             attributes = {}
         self.attributes = attributes
         
+        # Records that carry their own hit points act as the health system
+        if isinstance(attributes, HealthMixin) and attributes.base_hp is not None:
+            self.health_system = attributes
         # Initialize health system if health attributes are provided
-        if 'base_hp' in attributes:
+        elif 'base_hp' in attributes:
             max_hp = attributes.get('max_hp', attributes['base_hp'])
             self.health_system = HealthSystem(attributes['base_hp'], max_hp)
         else:
             self.health_system = None
 
+    def get_state(self):
+        """Capture kind, position, attributes and hit points for BaseGame.snapshot"""
+        attributes = self.attributes
+        health = self.health_system
+        if type(attributes) is dict:
+            attribute_state = copy_attributes(attributes)
+        else:
+            attribute_state = attributes.get_state()
+        if health is None or health is attributes:
+            health_state = None
+        else:
+            health_state = health.get_state()
+        return self.kind, self.x, self.y, attributes, attribute_state, health, health_state
+
+    def set_state(self, state, reuse=True):
+        """
+        Load a state captured by get_state.
+
+        Args:
+            state (tuple): The captured state.
+            reuse (bool): Load into the attribute record and health system
+                the state was taken from. False builds new ones, for
+                particles restored into another game.
+        """
+        kind, x, y, attributes, attribute_state, health, health_state = state
+        self.kind = kind
+        self.x = x
+        self.y = y
+        if type(attributes) is dict:
+            self.attributes = copy_attributes(attribute_state)
+        else:
+            record = attributes if reuse else object.__new__(type(attributes))
+            record.set_state(attribute_state)
+            self.attributes = record
+        if health is None:
+            self.health_system = None
+        elif health is attributes:
+            self.health_system = self.attributes
+        else:
+            if not reuse:
+                health = object.__new__(type(health))
+            health.set_state(health_state)
+            self.health_system = health
+
     def to_str(self):
         attr_str = []
         for k, v in self.attributes.items():
@@ -34,7 +90,7 @@ class Particle:
                 attr_str.append(f'{k}:{v}')
         
         # Add health info to attributes if health system exists
-        if self.health_system:
+        if self.health_system is not None:
             attr_str.append(f'current_hp:{self.health_system.current_hp}')
             attr_str.append(f'is_alive:{int(self.health_system.is_alive)}')
             
@@ -46,31 +102,217 @@ class Particle:
             
     def take_damage(self, damage_amount):
         """Apply damage to this particle if it has a health system"""
-        if self.health_system:
+        if self.health_system is not None:
             return self.health_system.take_damage(damage_amount)
         return True
         
     def heal(self, heal_amount):
         """Heal this particle if it has a health system"""
-        if self.health_system:
+        if self.health_system is not None:
             return self.health_system.heal(heal_amount)
         return 0
         
     def is_alive(self):
         """Check if this particle is alive"""
-        if self.health_system:
+        if self.health_system is not None:
             return self.health_system.is_alive
         return True  # Particles without health systems are always considered "alive"
 
+
+class RowAttributes(MutableMapping):
+    """
+    Attribute dict of a stored particle.
+
+    Keys listed in ``ParticleStore.ATTRIBUTE_COLUMNS`` are read from and
+    written to the particle's row; every other key lives in a plain dict.
+    Key order is kept so ``to_str`` output matches an unstored particle.
+    Like the slotted records, keys can also be read and written as
+    attributes, with a missing key reading as None.
+    """
+
+    def __init__(self, store, row, attributes):
+        object.__setattr__(self, "_store", store)
+        object.__setattr__(self, "_row", row)
+        object.__setattr__(self, "_data", {})
+        for k, v in attributes.items():
+            self[k] = v
+
+    _columns = frozenset(ParticleStore.ATTRIBUTE_COLUMNS)
+    _timer_columns = frozenset(ParticleStore.TIMER_COLUMNS)
+
+    def __getitem__(self, key):
+        value = self._data[key]
+        if key in self._columns:
+            return getattr(self._store, key)[self._row].item()
+        return value
+
+    def __setitem__(self, key, value):
+        if key in self._columns:
+            if key in self._timer_columns and value != int(value):
+                raise ValueError(f"{key} is a frame count, got {value!r}")
+            getattr(self._store, key)[self._row] = value
+            self._data[key] = None
+        else:
+            self._data[key] = value
+
+    def __delitem__(self, key):
+        del self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __getattr__(self, key):
+        if key.startswith("_"):
+            raise AttributeError(key)
+        return self.get(key)
+
+    def __setattr__(self, key, value):
+        self[key] = value
+
+    def get_state(self):
+        # Column values are restored with the store itself
+        return copy_attributes(self._data)
+
+    def set_state(self, state):
+        object.__setattr__(self, "_data", copy_attributes(state))
+
+
+class StoredHealthSystem(HealthSystem):
+    """Health system whose current hit points live in the store's ``hp`` column."""
+
+    def __init__(self, store, row, base_hp=20, max_hp=None):
+        self._store = store
+        self._row = row
+        super().__init__(base_hp, max_hp)
+
+    @property
+    def current_hp(self):
+        return self._store.hp[self._row].item()
+
+    @current_hp.setter
+    def current_hp(self, value):
+        self._store.hp[self._row] = value
+
+
+class StoredParticle(Particle):
+    """
+    Thin view onto one row of a ParticleStore.
+
+    Position, velocity, speed, hit points and the common timers are kept in
+    the store's columns; the particle object only remembers its row.
+    """
+
+    __slots__ = ("store", "row")
+
+    def __init__(self, store, kind, x, y, attributes=None):
+        self.slot = -1
+        self.kind_slot = -1
+        self.removed = False
+        self.store = store
+        self.row = store.alloc(kind)
+        if attributes is None:
+            attributes = {}
+        self.kind = kind
+        self.x = x
+        self.y = y
+        self.attributes = RowAttributes(store, self.row, attributes)
+
+        if 'base_hp' in attributes:
+            max_hp = attributes.get('max_hp', attributes['base_hp'])
+            self.health_system = StoredHealthSystem(store, self.row, attributes['base_hp'], max_hp)
+        else:
+            self.health_system = None
+
+    def set_state(self, state, reuse=True):
+        """Load a state captured by get_state; position and columns come back with the store"""
+        kind, x, y, attributes, attribute_state, health, health_state = state
+        self.kind = kind
+        if not reuse:
+            attributes = RowAttributes(self.store, self.row, {})
+        attributes.set_state(attribute_state)
+        self.attributes = attributes
+        if health is not None:
+            if not reuse:
+                health = StoredHealthSystem(self.store, self.row)
+            health.set_state(health_state)
+        self.health_system = health
+
+    @property
+    def x(self):
+        return self.store.x[self.row].item()
+
+    @x.setter
+    def x(self, value):
+        self.store.x[self.row] = value
+
+    @property
+    def y(self):
+        return self.store.y[self.row].item()
+
+    @y.setter
+    def y(self, value):
+        self.store.y[self.row] = value
+
+
+class GameSnapshot:
+    """
+    Saved game state produced by BaseGame.snapshot.
+
+    Holds one state tuple per live particle plus the particle objects it
+    came from, so restoring into the same game reloads those objects in
+    place instead of allocating new ones. A snapshot is never modified by
+    restore and can be restored any number of times.
+    """
+
+    __slots__ = ("game", "particles", "kind_slots", "id_slots", "store_state", "num_steps", "rng_state", "extra")
+
+    def __init__(self, game, particles, kind_slots, id_slots, store_state, num_steps, rng_state, extra):
+        self.game = game
+        self.particles = particles  # [(particle, state)] in self.particles order
+        # kind -> indices into particles, in kind bucket order (update order depends on it)
+        self.kind_slots = kind_slots
+        self.id_slots = id_slots  # id attribute -> index into particles
+        self.store_state = store_state
+        self.num_steps = num_steps
+        self.rng_state = rng_state  # RandomStreams.get_state()
+        self.extra = extra  # Whatever the game's snapshot_extras returned
+
+
 class BaseGame(ABC):
-    def __init__(self, max_num_particles):
+    def __init__(self, max_num_particles, use_store=False, seed=None):
         self.particles = []
+        # kind -> particles of that kind, kept in sync with self.particles
+        self.particles_by_kind = {}
+        # id attribute -> live particle, for O(1) cross-references
+        self.particles_by_id = {}
+        # Tombstoned particles waiting to be compacted out of self.particles
+        self.pending_removals = []
         self.max_num_particles = max_num_particles
+        # Optional columnar storage; particles become views into its rows
+        self.store = ParticleStore(max_num_particles) if use_store else None
         self.num_steps = 0
+        # Per-game RNG streams; the same seed and inputs replay identically
+        self.rngs = RandomStreams(seed)
+        self.encode_rng = self.rngs.python("encode")
         self.num_inputs = NUM_INPUTS
         self.fps = 60
         self.system_prompt = ""
 
+    def reseed(self, seed=None):
+        """
+        Reseed every RNG stream of the game.
+
+        Args:
+            seed (int, optional): New root seed; None draws fresh entropy.
+        """
+        self.rngs.reseed(seed)
+
     def set_system_prompt(self, system_prompt):
         self.system_prompt = system_prompt
 
@@ -79,41 +321,140 @@ class BaseGame(ABC):
 
     def clear_particles(self):
         self.particles = []
+        self.particles_by_kind = {}
+        self.particles_by_id = {}
+        self.pending_removals = []
+        if self.store is not None:
+            self.store.clear()
 
-    def create_particle(self, kind, x, y, attributes={}):
-        assert len(self.particles) < self.max_num_particles
-        particle = Particle(kind, x, y, attributes)
+    def new_particle(self, kind, x, y, attributes=None):
+        """
+        Construct a particle without adding it to the game.
+
+        Returns a StoredParticle bound to a fresh row when the columnar store
+        is enabled, otherwise a plain Particle whose attributes have been
+        passed through make_attributes.
+        """
+        if self.store is not None:
+            return StoredParticle(self.store, kind, x, y, attributes)
+        return Particle(kind, x, y, self.make_attributes(kind, attributes))
+
+    def make_attributes(self, kind, attributes):
+        """
+        Build the attribute container for a new particle.
+
+        Games override this to swap the attribute dict of hot particle kinds
+        for a typed record (see components.py). The default keeps the dict.
+        """
+        return attributes
+
+    def add_particle(self, particle):
+        """Add a particle to the game and register it in the kind and id indexes."""
+        particle.removed = False
+        particle.slot = len(self.particles)
         self.particles.append(particle)
+        bucket = self.particles_by_kind.get(particle.kind)
+        if bucket is None:
+            bucket = self.particles_by_kind[particle.kind] = []
+        particle.kind_slot = len(bucket)
+        bucket.append(particle)
+        particle_id = particle.attributes.get('id')
+        if particle_id is not None:
+            self.particles_by_id[particle_id] = particle
         return particle
 
+    def create_particle(self, kind, x, y, attributes={}):
+        assert len(self.particles) < self.max_num_particles
+        return self.add_particle(self.new_particle(kind, x, y, attributes))
+
     def remove_particle(self, particle):
-        assert particle in self.particles
-        self.particles.remove(particle)
+        """
+        Remove a particle from the game in O(1).
+
+        The particle is swap-removed from its kind bucket and dropped from the
+        id index right away, so get_particles and get_particle_by_id no longer
+        return it, and tombstoned in self.particles.
+        The tombstones are compacted by flush_removals at the end of the
+        step. Removing an already removed particle is a no-op.
+        """
+        if particle.removed:
+            return
+        assert self.particles[particle.slot] is particle
+        particle.removed = True
+        bucket = self.particles_by_kind[particle.kind]
+        last = bucket.pop()
+        if last is not particle:
+            bucket[particle.kind_slot] = last
+            last.kind_slot = particle.kind_slot
+        particle_id = particle.attributes.get('id')
+        if self.particles_by_id.get(particle_id) is particle:
+            del self.particles_by_id[particle_id]
+        self.pending_removals.append(particle)
+
+    def flush_removals(self):
+        """Compact tombstoned particles out of self.particles with swap-removes."""
+        if not self.pending_removals:
+            return
+        particles = self.particles
+        for particle in self.pending_removals:
+            last = particles.pop()
+            if last is not particle:
+                particles[particle.slot] = last
+                last.slot = particle.slot
+            if self.store is not None:
+                # Released only now so a stale view cannot alias a new row mid-step
+                self.store.release(particle.row)
+        self.pending_removals = []
 
     def step(self):
         self.num_steps += 1
+        self.flush_removals()
 
     @abstractmethod
     def get_frame(self):
         pass
 
     def encode(self):
+        self.flush_removals()
         game_state = ""
         for p in self.particles:
             game_state += p.to_str()
+        for line in self.encode_extras():
+            game_state += line
         return game_state
 
     def shuffle_encode(self):
+        self.flush_removals()
         game_state = ""
-        particles = copy.deepcopy(self.particles)
-        random.shuffle(particles)
-        for p in particles:
-            game_state += p.to_str()
+        lines = [p.to_str() for p in self.particles] + self.encode_extras()
+        self.encode_rng.shuffle(lines)
+        for line in lines:
+            game_state += line
         return game_state
 
+    def encode_extras(self):
+        """
+        Extra encoded lines for state kept outside self.particles.
+
+        Games override this, together with decode_extra, to put entities
+        that do not live in self.particles (such as cosmetic effects) into
+        the encoding. Each line uses the Particle.to_str format.
+        """
+        return []
+
+    def decode_extra(self, kind, x, y, attributes):
+        """
+        Give the game a chance to take a decoded block before it becomes a particle.
+
+        Returns:
+            bool: True if the block was consumed and must not become a particle.
+        """
+        return False
+
     def decode(self, game_state: str):
         particle_blocks = re.findall(r'\{(.*?)\}', game_state)
-        self.particles.clear()
+        self.clear_particles()
+        decoded = []
         for block in particle_blocks:
             pairs = dict(re.findall(r'(\w+):([^\s,<>]+)', block))
             kind = pairs['kind']
@@ -126,26 +467,126 @@ class BaseGame(ABC):
                         attributes[k] = float(v)
                     except:
                         attributes[k] = v
+
+            if self.decode_extra(kind, x, y, attributes):
+                continue
             
             # Create the particle
-            particle = Particle(kind, x, y, attributes)
+            particle = self.new_particle(kind, x, y, attributes)
             
             # If the particle has health-related attributes, set them correctly
-            if particle.health_system and 'current_hp' in pairs:
+            if particle.health_system is not None and 'current_hp' in pairs:
                 particle.health_system.current_hp = float(pairs['current_hp'])
                 if 'is_alive' in pairs:
                     particle.health_system.is_alive = bool(int(pairs['is_alive']))
             
-            self.particles.append(particle)
+            decoded.append(particle)
         
-        self.particles = sorted(self.particles, key=lambda p: p.attributes['id'])
+        for particle in sorted(decoded, key=lambda p: p.attributes['id']):
+            self.add_particle(particle)
         return self.encode()
 
+    def snapshot(self):
+        """
+        Capture the game state for a later restore.
+
+        Particles are copied field by field (typed records through their
+        get_state, dict attributes one level deep) and the columnar store
+        through its arrays; nothing is deep-copied. The RNG streams are saved
+        too. Game-specific state such as timers comes from snapshot_extras.
+
+        Returns:
+            GameSnapshot: The saved state.
+        """
+        self.flush_removals()
+        return GameSnapshot(
+            self,
+            [(particle, particle.get_state()) for particle in self.particles],
+            {kind: [particle.slot for particle in bucket] for kind, bucket in self.particles_by_kind.items()},
+            {particle_id: particle.slot for particle_id, particle in self.particles_by_id.items()},
+            None if self.store is None else self.store.get_state(),
+            self.num_steps,
+            self.rngs.get_state(),
+            self.snapshot_extras(),
+        )
+
+    def restore(self, snapshot):
+        """
+        Return the game to a state captured by snapshot.
+
+        Restoring into the game that took the snapshot reuses its particle
+        objects; particles spawned since are left removed. A snapshot from
+        another game gets new particle objects, so the two games never share
+        state.
+
+        Args:
+            snapshot (GameSnapshot): The state to restore.
+        """
+        if (self.store is None) != (snapshot.store_state is None):
+            raise ValueError("Snapshot and game disagree on use_store")
+        reuse = snapshot.game is self
+        if self.store is not None:
+            self.store.set_state(snapshot.store_state)
+        elif reuse:
+            # Tombstone everything; particles that come back are revived below
+            for particle in self.particles:
+                particle.removed = True
+
+        particles = []
+        for particle, state in snapshot.particles:
+            if not reuse:
+                fresh = object.__new__(type(particle))
+                if self.store is not None:
+                    fresh.store = self.store
+                    fresh.row = particle.row
+                particle = fresh
+            particle.set_state(state, reuse)
+            particle.removed = False
+            particle.slot = len(particles)
+            particles.append(particle)
+        particles_by_id = {particle_id: particles[slot] for particle_id, slot in snapshot.id_slots.items()}
+        particles_by_kind = {}
+        for kind, slots in snapshot.kind_slots.items():
+            bucket = particles_by_kind[kind] = [particles[slot] for slot in slots]
+            for kind_slot, particle in enumerate(bucket):
+                particle.kind_slot = kind_slot
+        self.particles = particles
+        self.particles_by_kind = particles_by_kind
+        self.particles_by_id = particles_by_id
+        self.pending_removals = []
+        self.num_steps = snapshot.num_steps
+        self.rngs.set_state(snapshot.rng_state)
+        self.restore_extras(snapshot.extra)
+
+    def snapshot_extras(self):
+        """
+        Extra state for snapshot, kept outside self.particles.
+
+        Games override this, together with restore_extras, to save their
+        timers, counters and so on. The returned value must not
+        change when the game keeps running.
+        """
+        return None
+
+    def restore_extras(self, state):
+        """Load the state returned by snapshot_extras"""
+        pass
+
     def get_particle(self, kind):
-        return next((p for p in self.particles if p.kind == kind), None)
+        bucket = self.particles_by_kind.get(kind)
+        return bucket[0] if bucket else None
+
+    def get_particle_by_id(self, particle_id):
+        """Return the live particle with the given id, or None if it is gone."""
+        return self.particles_by_id.get(particle_id)
 
     def get_particles(self, kind):
-        return [p for p in self.particles if p.kind == kind]
+        # Return a copy so callers can add or remove particles while iterating
+        return list(self.particles_by_kind.get(kind, ()))
+
+    def count_particles(self, *kinds):
+        """Return the number of live particles of the given kinds."""
+        return sum(len(self.particles_by_kind.get(kind, ())) for kind in kinds)
 
     @abstractmethod
     def agent_action(self, last_action=None):
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compare the collision backends and report where each one starts to win.
+
+Each simulated frame moves every enemy a little (untimed), calls update() and then
+runs the queries Game.gather_contacts makes: one batched nearby_many() for the
+weapons plus nearby() around the player. A few k_nearest() calls stand in
+for weapon targeting.
+
+Usage: python benchmark_collision.py [weapons] [frames]
+"""
+import math
+import random
+import sys
+import time
+
+from collision_backends import available_backends, make_collision_backend
+from games.survivor import (
+    ELITE_SIZE, GRID_SIZE, LAYER_ENEMIES, LAYER_PLAYER, PLAYER_SIZE,
+    SCREEN_HEIGHT, SCREEN_WIDTH, SPATIAL_LAYERS, WEAPON_SIZE,
+)
+
+# 从默认波次（约30个敌人）到压力测试场景（上千个）
+ENEMY_COUNTS = [10, 30, 100, 300, 1000, 3000, 10000]
+
+
+class Body:
+    """Bare position holder standing in for a particle."""
+    __slots__ = ("x", "y")
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+def frame_time(backend_name, num_enemies, num_weapons, frames):
+    """Return the mean seconds per frame for one backend and workload."""
+    rng = random.Random(num_enemies)
+    index = make_collision_backend(backend_name, GRID_SIZE, set(SPATIAL_LAYERS.values()))
+    player = Body(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2)
+    index.insert(player, LAYER_PLAYER)
+    enemies = [Body(rng.uniform(0, SCREEN_WIDTH), rng.uniform(0, SCREEN_HEIGHT)) for _ in range(num_enemies)]
+    for enemy in enemies:
+        index.insert(enemy, LAYER_ENEMIES)
+    weapons = [Body(rng.uniform(0, SCREEN_WIDTH), rng.uniform(0, SCREEN_HEIGHT)) for _ in range(num_weapons)]
+    radii = [(WEAPON_SIZE * rng.choice((1, 1.5, 3)) + ELITE_SIZE) / 2 for _ in weapons]
+
+    elapsed = 0.0
+    for _ in range(frames):
+        # 移动不计时，只测索引本身
+        for enemy in enemies:
+            enemy.x += rng.uniform(-2, 2)
+            enemy.y += rng.uniform(-2, 2)
+        start = time.perf_counter()
+        index.update()
+        index.nearby_many([(weapon.x, weapon.y) for weapon in weapons], radii, LAYER_ENEMIES)
+        index.nearby(player.x, player.y, (PLAYER_SIZE + ELITE_SIZE) / 2, LAYER_ENEMIES)
+        for weapon in weapons[:3]:
+            index.k_nearest(weapon.x, weapon.y, 1, LAYER_ENEMIES)
+        elapsed += time.perf_counter() - start
+    return elapsed / frames
+
+
+def crossover(counts, times_a, times_b):
+    """
+    Estimate the enemy count where backend b becomes faster than backend a.
+
+    Interpolates linearly in log-log space between the two measured counts
+    around the first sign change. Returns None if the order never flips.
+    """
+    for i in range(1, len(counts)):
+        before = times_a[i - 1] - times_b[i - 1]
+        after = times_a[i] - times_b[i]
+        if before > 0 or after <= 0:
+            continue
+        # log(t_a / t_b) 在两点之间从负变正
+        r0 = math.log(times_a[i - 1] / times_b[i - 1])
+        r1 = math.log(times_a[i] / times_b[i])
+        frac = r0 / (r0 - r1)
+        return math.exp(math.log(counts[i - 1]) + frac * (math.log(counts[i]) - math.log(counts[i - 1])))
+    return None
+
+
+def main():
+    num_weapons = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    frames = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    backends = available_backends()
+    print("碰撞后端基准: {} 个武器, 每组 {} 帧".format(num_weapons, frames))
+
+    results = {name: [] for name in backends}
+    print("{:>8}".format("enemies") + "".join("{:>12}".format(name) for name in backends) + "  fastest")
+    for count in ENEMY_COUNTS:
+        row = {name: frame_time(name, count, num_weapons, frames) for name in backends}
+        for name, seconds in row.items():
+            results[name].append(seconds)
+        fastest = min(row, key=row.get)
+        print("{:>8}".format(count) + "".join("{:>10.3f}ms".format(row[name] * 1000) for name in backends) + "  " + fastest)
+
+    print("交叉点（之后第二个后端更快）:")
+    for a in backends:
+        for b in backends:
+            if a == b:
+                continue
+            point = crossover(ENEMY_COUNTS, results[a], results[b])
+            if point is not None:
+                print("  {} -> {}: ~{:.0f} enemies".format(a, b, point))
+    if "kdtree" not in backends:
+        print("  (未安装scipy，跳过kdtree)")
+
+
+if __name__ == "__main__":
+    main()
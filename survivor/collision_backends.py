@@ -0,0 +1,308 @@
+import numpy as np
+
+from spatial_hash import SpatialHash
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:  # SciPy是可选依赖，没有时kdtree后端不可用
+    cKDTree = None
+
+
+class BruteForceBackend:
+    """
+    Collision index that compares every query against every entity.
+
+    Same interface as SpatialHash. Positions of each layer are copied into
+    one NumPy array the first time the layer is queried after update(),
+    insert() or remove(), and queries are whole-array comparisons. There is
+    no structure to maintain, which makes this the fastest choice for the
+    small entity counts of the default waves. Results come back in
+    insertion order.
+    """
+
+    def __init__(self, layers=()):
+        """
+        Initialize an empty index.
+
+        Args:
+            layers (iterable): Layer names to create up front. Unknown layers
+                are created on first insert.
+        """
+        # layer -> {entity: None}，保持插入顺序
+        self.layers = {layer: {} for layer in layers}
+        # entity -> layer
+        self.entries = {}
+        # layer -> cached arrays, rebuilt lazily after any change
+        self._cache = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, entity):
+        return entity in self.entries
+
+    def clear(self):
+        """Remove every entity, keeping the layers."""
+        for layer in self.layers:
+            self.layers[layer] = {}
+        self.entries = {}
+        self._cache = {}
+
+    def insert(self, entity, layer):
+        """Add an entity to a layer."""
+        if entity in self.entries:
+            self.remove(entity)
+        members = self.layers.get(layer)
+        if members is None:
+            members = self.layers[layer] = {}
+        members[entity] = None
+        self.entries[entity] = layer
+        self._cache.pop(layer, None)
+
+    def remove(self, entity):
+        """Drop an entity from the index; unknown entities are ignored."""
+        layer = self.entries.pop(entity, None)
+        if layer is None:
+            return
+        del self.layers[layer][entity]
+        self._cache.pop(layer, None)
+
+    def update(self):
+        """
+        Mark every position as changed; arrays are rebuilt on the next query.
+
+        Returns:
+            int: Number of indexed entities.
+        """
+        self._cache = {}
+        return len(self.entries)
+
+    def _build(self, layer):
+        entities = list(self.layers[layer])
+        points = np.empty((len(entities), 2))
+        points[:, 0] = [entity.x for entity in entities]
+        points[:, 1] = [entity.y for entity in entities]
+        return entities, points
+
+    def _arrays(self, layer):
+        cached = self._cache.get(layer)
+        if cached is None:
+            cached = self._cache[layer] = self._build(layer)
+        return cached
+
+    def _layer_names(self, layers):
+        if layers is None:
+            return list(self.layers)
+        if isinstance(layers, str):
+            layers = (layers,)
+        return [layer for layer in layers if layer in self.layers]
+
+    def _square(self, layer, x, y, radius):
+        """Indices of the layer's entities inside the square of half width radius."""
+        entities, points = self._arrays(layer)
+        if not entities:
+            return entities, ()
+        inside = (np.abs(points[:, 0] - x) <= radius) & (np.abs(points[:, 1] - y) <= radius)
+        return entities, np.flatnonzero(inside)
+
+    def nearby(self, x, y, radius, layers=None):
+        """
+        Broadphase candidates: every entity inside a square of half width radius.
+
+        Returns:
+            list: Candidate entities; callers run their own narrowphase test.
+        """
+        found = []
+        for layer in self._layer_names(layers):
+            entities, indices = self._square(layer, x, y, radius)
+            found.extend(entities[i] for i in indices)
+        return found
+
+    def nearby_many(self, points, radii, layers=None):
+        """
+        Run nearby() for a batch of query squares with one distance matrix per layer.
+
+        Returns:
+            list: One candidate list per query, in query order.
+        """
+        results = [[] for _ in points]
+        if not results:
+            return results
+        queries = np.asarray(points, dtype=float).reshape(-1, 2)
+        half = np.asarray(radii, dtype=float)[:, None]
+        for layer in self._layer_names(layers):
+            entities, layer_points = self._arrays(layer)
+            if not entities:
+                continue
+            # (queries, entities) 切比雪夫距离矩阵
+            inside = (np.abs(layer_points[None, :, 0] - queries[:, None, 0]) <= half) & \
+                     (np.abs(layer_points[None, :, 1] - queries[:, None, 1]) <= half)
+            rows, cols = np.nonzero(inside)
+            for row, col in zip(rows.tolist(), cols.tolist()):
+                results[row].append(entities[col])
+        return results
+
+    def query_rect(self, x0, y0, x1, y1, layers=None):
+        """Return the entities whose position lies inside the rectangle [x0, x1] x [y0, y1]."""
+        half = max(x1 - x0, y1 - y0) / 2
+        return [
+            entity for entity in self.nearby((x0 + x1) / 2, (y0 + y1) / 2, half, layers)
+            if x0 <= entity.x <= x1 and y0 <= entity.y <= y1
+        ]
+
+    def query_radius(self, x, y, radius, layers=None):
+        """Return the entities within radius of (x, y)."""
+        radius_sq = radius * radius
+        return [
+            entity for entity in self.nearby(x, y, radius, layers)
+            if (entity.x - x) ** 2 + (entity.y - y) ** 2 <= radius_sq
+        ]
+
+    def k_nearest(self, x, y, k, layers=None, max_radius=None):
+        """
+        Return up to k entities nearest to (x, y), closest first.
+
+        Args:
+            x (float): Query x.
+            y (float): Query y.
+            k (int): Number of entities wanted.
+            layers (str or iterable, optional): Layers to search, all if None.
+            max_radius (float, optional): Ignore entities farther than this.
+
+        Returns:
+            list: Entities sorted by distance.
+        """
+        if k <= 0:
+            return []
+        candidates = []
+        distances = []
+        for layer in self._layer_names(layers):
+            entities, points = self._arrays(layer)
+            if not entities:
+                continue
+            candidates.extend(entities)
+            distances.append((points[:, 0] - x) ** 2 + (points[:, 1] - y) ** 2)
+        if not candidates:
+            return []
+        distances = np.concatenate(distances)
+        order = np.argsort(distances, kind="stable")[:k]
+        if max_radius is not None:
+            order = order[distances[order] <= max_radius * max_radius]
+        return [candidates[i] for i in order]
+
+    def get_state(self, index_of):
+        """
+        Capture the membership for a game snapshot.
+
+        Args:
+            index_of (callable): Maps an entity to a value restore can map back.
+
+        Returns:
+            list: [(layer, [indices])] in insertion order.
+        """
+        return [
+            (layer, [index_of(entity) for entity in members])
+            for layer, members in self.layers.items()
+        ]
+
+    def set_state(self, state, entity_at):
+        """
+        Rebuild the index from get_state output.
+
+        Args:
+            state (list): Output of get_state.
+            entity_at (callable): Maps a saved index back to an entity.
+        """
+        self.clear()
+        for layer, indices in state:
+            members = self.layers[layer] = {}
+            for index in indices:
+                entity = entity_at(index)
+                members[entity] = None
+                self.entries[entity] = layer
+
+
+class KDTreeBackend(BruteForceBackend):
+    """
+    Collision index backed by one scipy.spatial.cKDTree per layer.
+
+    Trees are built lazily, like the brute-force arrays, so a frame pays one
+    O(N log N) build per queried layer and then O(log N + k) per query. This
+    wins once the layers hold thousands of entities. Requires SciPy.
+    """
+
+    def __init__(self, layers=()):
+        if cKDTree is None:
+            raise ImportError("the kdtree collision backend requires scipy")
+        super().__init__(layers)
+
+    def _build(self, layer):
+        entities, points = super()._build(layer)
+        tree = cKDTree(points) if entities else None
+        return entities, points, tree
+
+    def _arrays(self, layer):
+        cached = self._cache.get(layer)
+        if cached is None:
+            cached = self._cache[layer] = self._build(layer)
+        return cached[0], cached[1]
+
+    def _tree(self, layer):
+        self._arrays(layer)
+        return self._cache[layer][2]
+
+    def _square(self, layer, x, y, radius):
+        entities, _ = self._arrays(layer)
+        if not entities:
+            return entities, ()
+        # p=inf 是切比雪夫距离，与网格/暴力后端的正方形查询一致
+        return entities, self._tree(layer).query_ball_point((x, y), radius, p=np.inf, return_sorted=True)
+
+    def nearby_many(self, points, radii, layers=None):
+        """Run nearby() for a batch of query squares with one tree query per layer."""
+        results = [[] for _ in points]
+        if not results:
+            return results
+        queries = np.asarray(points, dtype=float).reshape(-1, 2)
+        half = np.asarray(radii, dtype=float)
+        for layer in self._layer_names(layers):
+            entities, _ = self._arrays(layer)
+            if not entities:
+                continue
+            hits = self._tree(layer).query_ball_point(queries, half, p=np.inf, return_sorted=True)
+            for found, indices in zip(results, hits):
+                found.extend(entities[i] for i in indices)
+        return results
+
+
+# 碰撞后端注册表：Game(collision_backend=...) 按名字选择
+COLLISION_BACKENDS = {
+    "grid": SpatialHash,
+    "brute": BruteForceBackend,
+    "kdtree": KDTreeBackend,
+}
+
+
+def available_backends():
+    """Return the names of the backends that can be created in this environment."""
+    return [name for name in COLLISION_BACKENDS if name != "kdtree" or cKDTree is not None]
+
+
+def make_collision_backend(name, cell_size, layers=()):
+    """
+    Create a collision index by name.
+
+    Args:
+        name (str): "grid" (persistent spatial hash), "brute" (NumPy distance
+            matrix) or "kdtree" (SciPy cKDTree).
+        cell_size (float): Cell width for the grid backend; ignored by the others.
+        layers (iterable): Layer names to create up front.
+
+    Returns:
+        The backend instance.
+    """
+    if name not in COLLISION_BACKENDS:
+        raise ValueError(f"unknown collision backend {name!r}, expected one of {sorted(COLLISION_BACKENDS)}")
+    if name == "grid":
+        return SpatialHash(cell_size, layers)
+    return COLLISION_BACKENDS[name](layers)
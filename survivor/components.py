@@ -0,0 +1,233 @@
+from operator import attrgetter
+
+from health_system import HealthMixin
+
+# Attribute values the game mutates in place; snapshots copy them one level deep
+CONTAINER_TYPES = (dict, list, set)
+
+
+def copy_attributes(attributes):
+    """Copy an attribute dict, also copying dict, list and set values."""
+    return {
+        key: value.copy() if type(value) in CONTAINER_TYPES else value
+        for key, value in attributes.items()
+    }
+
+
+class Record:
+    """
+    Slotted, typed replacement for a particle's attribute dict.
+
+    Each subclass lists the keys its kind uses in FIELDS (in to_str order)
+    and declares them as slots, so hot loops can read ``record.speed``
+    directly instead of hashing into a dict. A slot holding None counts as
+    an absent key, which keeps the dict semantics of ``in``, ``get`` and
+    ``items`` that the encoder and existing code rely on. Keys that are not
+    fields go to a lazily created ``extra`` dict, so nothing is ever lost.
+    """
+    __slots__ = ("extra",)
+    FIELDS = ()
+    # Settable through the mapping interface but not listed by items()
+    HIDDEN = ()
+    # Fields holding a dict or set that is mutated in place (copied by get_state)
+    NESTED = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._all_fields = cls.FIELDS + cls.HIDDEN
+        cls._field_set = frozenset(cls._all_fields)
+        cls._nested_slots = tuple(cls._all_fields.index(name) for name in cls.NESTED)
+        if cls._all_fields:
+            cls._get_fields = staticmethod(attrgetter(*cls._all_fields))
+
+    def __init__(self, attributes=None):
+        self.extra = None
+        for name in self._all_fields:
+            setattr(self, name, None)
+        if attributes:
+            for key, value in attributes.items():
+                self[key] = value
+
+    def __getitem__(self, key):
+        if key in self._field_set:
+            value = getattr(self, key)
+            if value is None:
+                raise KeyError(key)
+            return value
+        if self.extra is None:
+            raise KeyError(key)
+        return self.extra[key]
+
+    def __setitem__(self, key, value):
+        if key in self._field_set:
+            setattr(self, key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self.pop(key)
+
+    def __contains__(self, key):
+        if key in self._field_set:
+            return getattr(self, key) is not None
+        return self.extra is not None and key in self.extra
+
+    def __iter__(self):
+        for name in self.FIELDS:
+            if getattr(self, name) is not None:
+                yield name
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self.items())})"
+
+    def get(self, key, default=None):
+        if key in self._field_set:
+            value = getattr(self, key)
+            return default if value is None else value
+        if self.extra is None:
+            return default
+        return self.extra.get(key, default)
+
+    def pop(self, key, *default):
+        if key in self._field_set:
+            value = getattr(self, key)
+            setattr(self, key, None)
+            if value is not None:
+                return value
+        elif self.extra is not None and key in self.extra:
+            return self.extra.pop(key)
+        if default:
+            return default[0]
+        raise KeyError(key)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, attributes):
+        for key, value in attributes.items():
+            self[key] = value
+
+    def keys(self):
+        return list(self)
+
+    def values(self):
+        return [self[key] for key in self]
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
+    def copy(self):
+        """Return the attributes as a plain dict."""
+        return dict(self.items())
+
+    def get_state(self):
+        """
+        Capture every field for a game snapshot.
+
+        Returns:
+            tuple: (field values, extra dict copy). Mutable containers are
+            copied, so later changes to the record do not leak into it.
+        """
+        values = self._get_fields(self)
+        for i in self._nested_slots:
+            value = values[i]
+            if type(value) in CONTAINER_TYPES:
+                values = values[:i] + (value.copy(),) + values[i + 1:]
+        extra = self.extra
+        return values, None if extra is None else copy_attributes(extra)
+
+    def set_state(self, state):
+        """Load a state captured by get_state; the state can be loaded again later."""
+        values, extra = state
+        for name, value in zip(self._all_fields, values):
+            setattr(self, name, value)
+        # 快照里的容器不能直接交给记录，否则恢复后的修改会改到快照
+        for i in self._nested_slots:
+            value = values[i]
+            if type(value) in CONTAINER_TYPES:
+                setattr(self, self._all_fields[i], value.copy())
+        self.extra = None if extra is None else copy_attributes(extra)
+
+
+class EnemyRecord(HealthMixin, Record):
+    """Enemy attributes with the health system stored inline."""
+    FIELDS = (
+        "speed", "base_hp", "max_hp", "damage", "id", "blink_timer", "wave",
+        "xp_value", "white_effect_timer", "knockback_timer", "knockback_dx",
+        "knockback_dy", "is_dying", "death_anim_timer", "death_anim_size",
+        "death_anim_white",
+    )
+    HIDDEN = ("current_hp", "is_alive")
+    __slots__ = FIELDS + HIDDEN
+
+    def __init__(self, attributes=None):
+        super().__init__(attributes)
+        if self.base_hp is not None:
+            if self.max_hp is None:
+                self.max_hp = self.base_hp
+            if self.current_hp is None:
+                self.current_hp = self.max_hp
+            if self.is_alive is None:
+                self.is_alive = True
+
+
+class WeaponRecord(Record):
+    """Fields shared by every weapon particle; loops over all weapons read these."""
+    FIELDS = (
+        "damage", "speed", "angle", "id", "weapon_name", "level", "shape",
+        "duration", "target_player_id", "hit_cooldown", "is_aura",
+    )
+    NESTED = ("hit_cooldown",)
+    __slots__ = FIELDS
+
+
+class ProjectileRecord(WeaponRecord):
+    """Attributes of a moving weapon particle (knife, wand, axe, cross, whip...)."""
+    OWN_FIELDS = (
+        "vx", "vy", "pierce_count", "size", "width", "height", "gravity",
+        "lifetime", "initial_y", "initial_vx", "initial_vy", "ax", "ay",
+        "original_speed", "has_hit", "is_returning", "has_pierced",
+        "self_rotation", "rotation_speed", "whip_timer", "target_id",
+        "last_vx", "last_vy",
+    )
+    FIELDS = WeaponRecord.FIELDS + OWN_FIELDS
+    __slots__ = OWN_FIELDS
+
+
+class AuraRecord(WeaponRecord):
+    """Attributes of an aura weapon that follows the player (Garlic)."""
+    OWN_FIELDS = (
+        "base_size", "area_multiplier", "aura_radius", "pool_limit",
+        "knockback", "affected_enemies", "cooldown", "breath_timer",
+    )
+    FIELDS = WeaponRecord.FIELDS + OWN_FIELDS
+    NESTED = WeaponRecord.NESTED + ("affected_enemies",)
+    __slots__ = OWN_FIELDS
+
+
+class OrbitRecord(WeaponRecord):
+    """Attributes of a weapon orbiting the player (KingBible)."""
+    OWN_FIELDS = (
+        "orbit_radius", "orbit_angle", "total_duration", "original_size",
+        "current_size",
+    )
+    FIELDS = WeaponRecord.FIELDS + OWN_FIELDS
+    __slots__ = OWN_FIELDS
+
+
+class XPRecord(Record):
+    """Attributes of an experience gem."""
+    FIELDS = ("id", "speed", "moving_to_player", "value")
+    __slots__ = FIELDS
+
@@ -0,0 +1,201 @@
+import numpy as np
+
+
+class EffectsLayer:
+    """
+    Fixed-capacity storage for cosmetic effects: blood splatter and damage numbers.
+
+    Effects are not game entities, so they live here instead of in
+    BaseGame.particles: they are not scanned by get_particles, do not count
+    against max_num_particles, and only reach the encoding when the game asks
+    for them. Each effect type has a preallocated set of columns and an
+    ``alive`` mask; update() advances all of them in one vectorized pass.
+    """
+
+    def __init__(self, max_blood, max_texts, blood_lifetime, text_duration, text_rise):
+        """
+        Initialize empty effect buffers.
+
+        Args:
+            max_blood (int): Capacity for blood particles.
+            max_texts (int): Capacity for damage numbers.
+            blood_lifetime (int): Frames a blood particle lives.
+            text_duration (int): Frames a damage number lives.
+            text_rise (float): Total distance a damage number rises.
+        """
+        self.blood_lifetime = blood_lifetime
+        self.text_duration = text_duration
+        self.text_rise = text_rise
+
+        self.blood_alive = np.zeros(max_blood, dtype=bool)
+        self.blood_id = np.zeros(max_blood, dtype=np.int64)
+        self.blood_x = np.zeros(max_blood)
+        self.blood_y = np.zeros(max_blood)
+        self.blood_vx = np.zeros(max_blood)
+        self.blood_vy = np.zeros(max_blood)
+        self.blood_lifetime_left = np.zeros(max_blood, dtype=np.int64)
+        self.blood_size = np.zeros(max_blood, dtype=np.int64)
+        self.blood_alpha = np.zeros(max_blood, dtype=np.int64)
+
+        self.text_alive = np.zeros(max_texts, dtype=bool)
+        self.text_id = np.zeros(max_texts, dtype=np.int64)
+        self.text_x = np.zeros(max_texts)
+        self.text_y = np.zeros(max_texts)
+        self.text_timer = np.zeros(max_texts, dtype=np.int64)
+        self.text_alpha = np.zeros(max_texts, dtype=np.int64)
+        self.text_scale = np.zeros(max_texts)
+        self.text_growing = np.zeros(max_texts, dtype=bool)
+        self.text_value = [""] * max_texts
+        self.text_color = [""] * max_texts
+
+    # Per-slot columns, copied as a whole by get_state
+    COLUMNS = (
+        "blood_alive", "blood_id", "blood_x", "blood_y", "blood_vx", "blood_vy",
+        "blood_lifetime_left", "blood_size", "blood_alpha",
+        "text_alive", "text_id", "text_x", "text_y", "text_timer", "text_alpha",
+        "text_scale", "text_growing", "text_value", "text_color",
+    )
+
+    @property
+    def blood_count(self):
+        return int(np.count_nonzero(self.blood_alive))
+
+    @property
+    def text_count(self):
+        return int(np.count_nonzero(self.text_alive))
+
+    def clear(self):
+        """Remove every effect."""
+        self.blood_alive[:] = False
+        self.text_alive[:] = False
+
+    def get_state(self):
+        """Copy every column for a game snapshot."""
+        return tuple(getattr(self, name).copy() for name in self.COLUMNS)
+
+    def set_state(self, state):
+        """Load columns captured by get_state; the state is left untouched."""
+        for name, values in zip(self.COLUMNS, state):
+            setattr(self, name, values.copy())
+
+    def add_blood(self, effect_id, x, y, vx, vy, size, lifetime=None, alpha=255):
+        """
+        Add one blood particle.
+
+        Returns:
+            bool: False if the blood buffer is full and nothing was added.
+        """
+        free = np.flatnonzero(~self.blood_alive)
+        if len(free) == 0:
+            return False
+        i = free[0]
+        self.blood_alive[i] = True
+        self.blood_id[i] = effect_id
+        self.blood_x[i] = x
+        self.blood_y[i] = y
+        self.blood_vx[i] = vx
+        self.blood_vy[i] = vy
+        self.blood_lifetime_left[i] = self.blood_lifetime if lifetime is None else lifetime
+        self.blood_size[i] = size
+        self.blood_alpha[i] = alpha
+        return True
+
+    def add_text(self, effect_id, x, y, text, color="#FFFFFF", timer=None, alpha=255, scale=0.5, growing=True):
+        """Add one damage number, replacing the oldest one if the buffer is full."""
+        free = np.flatnonzero(~self.text_alive)
+        if len(free):
+            i = free[0]
+        else:
+            # 找到最旧的伤害文本并替换
+            i = int(np.argmin(self.text_timer))
+        self.text_alive[i] = True
+        self.text_id[i] = effect_id
+        self.text_x[i] = x
+        self.text_y[i] = y
+        self.text_timer[i] = self.text_duration if timer is None else timer
+        self.text_alpha[i] = alpha
+        self.text_scale[i] = scale
+        self.text_growing[i] = growing
+        self.text_value[i] = text
+        self.text_color[i] = color
+
+    def update(self):
+        """Advance every live effect by one frame and drop the expired ones."""
+        self._update_blood()
+        self._update_texts()
+
+    def _update_blood(self):
+        alive = self.blood_alive
+        if not alive.any():
+            return
+        self.blood_x[alive] += self.blood_vx[alive]
+        self.blood_y[alive] += self.blood_vy[alive]
+        self.blood_lifetime_left[alive] -= 1
+        alive &= self.blood_lifetime_left > 0
+        # 逐渐降低不透明度
+        progress = 1 - self.blood_lifetime_left[alive] / self.blood_lifetime
+        self.blood_alpha[alive] = (255 * (1 - progress)).astype(np.int64)
+        # 减小速度（模拟阻力）并添加一点重力效果
+        self.blood_vx[alive] *= 0.9
+        self.blood_vy[alive] *= 0.9
+        self.blood_vy[alive] += 0.2
+
+    def _update_texts(self):
+        alive = self.text_alive
+        if not alive.any():
+            return
+        duration = self.text_duration
+        self.text_timer[alive] -= 1
+        alive &= self.text_timer > 0
+        timer = self.text_timer[alive]
+        # Move the text upward as it fades
+        progress = 1 - timer / duration
+        self.text_y[alive] -= self.text_rise / duration
+        # 在最后0.3秒开始淡出
+        fade_start = 0.7
+        fade_progress = (progress - fade_start) / (1 - fade_start)
+        self.text_alpha[alive] = np.where(progress > fade_start, (255 * (1 - fade_progress)).astype(np.int64), 255)
+        # 处理尺寸动画：前0.2秒从50%变到100%，之后变回50%
+        elapsed = duration - timer
+        growing = self.text_growing[alive]
+        grow_progress = np.minimum(1.0, elapsed / (duration / 5))
+        shrink_progress = np.clip((elapsed - duration / 5) / duration, 0.0, 1.0)
+        self.text_scale[alive] = np.where(growing, 0.5 + 0.5 * grow_progress, 1.0 - 0.5 * shrink_progress)
+        self.text_growing[alive] = growing & (grow_progress < 1.0)
+
+    def blood(self):
+        """Return (x, y, size, alpha) for every live blood particle."""
+        alive = self.blood_alive
+        return list(zip(
+            self.blood_x[alive].tolist(),
+            self.blood_y[alive].tolist(),
+            self.blood_size[alive].tolist(),
+            self.blood_alpha[alive].tolist(),
+        ))
+
+    def texts(self):
+        """Return (x, y, text, alpha, scale) for every live damage number."""
+        rows = np.flatnonzero(self.text_alive).tolist()
+        return [
+            (self.text_x[i].item(), self.text_y[i].item(), self.text_value[i],
+             self.text_alpha[i].item(), self.text_scale[i].item())
+            for i in rows
+        ]
+
+    def to_strs(self, blood_kind, text_kind):
+        """Encode live effects in the same line format as Particle.to_str."""
+        lines = []
+        for i in np.flatnonzero(self.blood_alive).tolist():
+            lines.append(
+                f"{{id:{self.blood_id[i]}, kind:{blood_kind}, x:{self.blood_x[i].item()}, y:{self.blood_y[i].item()}, "
+                f"vx:{self.blood_vx[i].item()}, vy:{self.blood_vy[i].item()}, lifetime:{self.blood_lifetime_left[i]}, "
+                f"size:{self.blood_size[i]}, alpha:{self.blood_alpha[i]}}}\n"
+            )
+        for i in np.flatnonzero(self.text_alive).tolist():
+            phase = "grow" if self.text_growing[i] else "shrink"
+            lines.append(
+                f"{{id:{self.text_id[i]}, kind:{text_kind}, x:{self.text_x[i].item()}, y:{self.text_y[i].item()}, "
+                f"text:{self.text_value[i]}, timer:{self.text_timer[i]}, alpha:{self.text_alpha[i]}, "
+                f"scale:{self.text_scale[i].item()}, scale_phase:{phase}, color:{self.text_color[i]}}}\n"
+            )
+        return lines
@@ -0,0 +1,184 @@
+import math
+
+import numpy as np
+
+# 8邻域偏移 (dy, dx) 和步长
+_NEIGHBORS = [
+    (oy, ox, math.hypot(ox, oy))
+    for oy in (-1, 0, 1)
+    for ox in (-1, 0, 1)
+    if ox or oy
+]
+
+
+class FlowField:
+    """
+    Pursuit flow field on a coarse grid centred on a goal (the player).
+
+    update() computes every cell's shortest path cost to the goal cell,
+    then a per-cell direction pointing down that cost. Pursuers look up their
+    heading with sample() in one vectorized call, so pursuit costs
+    O(cells + N) per update instead of per-pursuer work.
+
+    Step costs are the mean of the two cells' costs times the step length,
+    with 8-connected moves. A cell's cost is 1 plus density_cost per pursuer
+    inside it, so paths bend around crowds, and infinite for blocked cells,
+    which are never entered. The grid only covers a square window of the
+    given radius around the goal, so the work does not grow with the world
+    size. Pursuers outside the window, or in cells that cannot reach the
+    goal, get no heading.
+    """
+
+    def __init__(self, cell_size, radius, density_cost=0.0):
+        """
+        Initialize an empty field.
+
+        Args:
+            cell_size (float): Side of a grid cell in world units.
+            radius (float): Half-width of the window around the goal.
+            density_cost (float): Extra cost of a cell per pursuer inside
+                it; 0 gives plain shortest paths.
+        """
+        self.cell_size = cell_size
+        self.size = 2 * math.ceil(radius / cell_size) + 1  # 奇数，目标格在正中
+        self.density_cost = density_cost
+        self.clear()
+
+    def clear(self):
+        """Forget the field; sample() gives no heading until the next update()."""
+        self.origin = (0.0, 0.0)  # 窗口左上角的世界坐标
+        self.distance = None  # (size, size)，到目标格的最短路代价
+        self.heading = None  # (2, size, size)，每格的单位追击方向
+
+    @property
+    def built(self):
+        return self.distance is not None
+
+    def update(self, goal_x, goal_y, x=None, y=None, blocked=None):
+        """
+        Recompute the field for a goal position.
+
+        Args:
+            goal_x (float): Goal x in world coordinates.
+            goal_y (float): Goal y in world coordinates.
+            x (np.ndarray, optional): Pursuer x coordinates, for the crowd
+                density cost.
+            y (np.ndarray, optional): Pursuer y coordinates.
+            blocked (np.ndarray, optional): (size, size) boolean mask of
+                impassable cells in window coordinates.
+        """
+        size = self.size
+        half = size // 2
+        cell = self.cell_size
+        # 窗口对齐到世界网格，目标所在的格子在正中
+        origin_x = (math.floor(goal_x / cell) - half) * cell
+        origin_y = (math.floor(goal_y / cell) - half) * cell
+        self.origin = (origin_x, origin_y)
+
+        cost = np.ones((size, size))
+        if self.density_cost and x is not None and len(x):
+            col = np.floor((np.asarray(x) - origin_x) / cell).astype(np.int64)
+            row = np.floor((np.asarray(y) - origin_y) / cell).astype(np.int64)
+            inside = (col >= 0) & (col < size) & (row >= 0) & (row < size)
+            counts = np.bincount(row[inside] * size + col[inside], minlength=size * size)
+            cost += self.density_cost * counts.reshape(size, size)
+        if blocked is not None:
+            cost[blocked] = np.inf
+
+        # 四周填一圈无穷大，邻居查找不用判断边界
+        padded_cost = np.full((size + 2, size + 2), np.inf)
+        padded_cost[1:-1, 1:-1] = cost
+        edges = [
+            length * (cost + padded_cost[1 + oy:1 + oy + size, 1 + ox:1 + ox + size]) / 2
+            for oy, ox, length in _NEIGHBORS
+        ]
+
+        # 从目标格向外整体松弛，直到没有格子变短（结果与Dijkstra相同，每轮都是整数组运算）
+        distance = np.full((size + 2, size + 2), np.inf)
+        inner = distance[1:-1, 1:-1]
+        inner[half, half] = 0.0
+        before = np.empty_like(inner)
+        candidate = np.empty_like(inner)
+        for _ in range(size * size):
+            before[...] = inner
+            for (oy, ox, _length), edge in zip(_NEIGHBORS, edges):
+                np.add(distance[1 + oy:1 + oy + size, 1 + ox:1 + ox + size], edge, out=candidate)
+                np.minimum(inner, candidate, out=inner)
+            if np.array_equal(before, inner):
+                break
+        self.distance = inner.copy()
+
+        # 追击方向：按各邻居的代价下降量加权的邻居方向之和
+        heading_x = np.zeros((size, size))
+        heading_y = np.zeros((size, size))
+        with np.errstate(invalid="ignore"):
+            for oy, ox, length in _NEIGHBORS:
+                drop = inner - distance[1 + oy:1 + oy + size, 1 + ox:1 + ox + size]
+                drop = np.where(drop > 0, drop, 0.0)  # 无穷大减无穷大为nan，也算0
+                heading_x += drop * (ox / length)
+                heading_y += drop * (oy / length)
+        norm = np.hypot(heading_x, heading_y)
+        moving = norm > 0
+        safe_norm = np.where(moving, norm, 1.0)
+        self.heading = np.stack([
+            np.where(moving, heading_x / safe_norm, 0.0),
+            np.where(moving, heading_y / safe_norm, 0.0),
+        ])
+
+    def sample(self, x, y):
+        """
+        Look up the pursuit heading at many positions at once.
+
+        Headings are bilinearly interpolated between cell centres, then
+        normalized.
+
+        Args:
+            x (np.ndarray): X coordinates.
+            y (np.ndarray): Y coordinates.
+
+        Returns:
+            tuple: (heading_x, heading_y) unit vectors; (0, 0) where the
+            field gives no heading.
+        """
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        if self.heading is None:
+            return np.zeros_like(x), np.zeros_like(y)
+        size = self.size
+        origin_x, origin_y = self.origin
+        fx = (x - origin_x) / self.cell_size - 0.5
+        fy = (y - origin_y) / self.cell_size - 0.5
+        inside = (fx > -0.5) & (fx < size - 0.5) & (fy > -0.5) & (fy < size - 0.5)
+        fx = np.clip(fx, 0, size - 1)
+        fy = np.clip(fy, 0, size - 1)
+        col0 = np.minimum(fx.astype(np.int64), size - 2)
+        row0 = np.minimum(fy.astype(np.int64), size - 2)
+        tx = fx - col0
+        ty = fy - row0
+        heading = self.heading
+        sample = (
+            heading[:, row0, col0] * ((1 - tx) * (1 - ty))
+            + heading[:, row0, col0 + 1] * (tx * (1 - ty))
+            + heading[:, row0 + 1, col0] * ((1 - tx) * ty)
+            + heading[:, row0 + 1, col0 + 1] * (tx * ty)
+        )
+        norm = np.hypot(sample[0], sample[1])
+        valid = inside & (norm > 1e-9)
+        safe_norm = np.where(valid, norm, 1.0)
+        return np.where(valid, sample[0] / safe_norm, 0.0), np.where(valid, sample[1] / safe_norm, 0.0)
+
+    def get_state(self):
+        """Capture the field for a game snapshot."""
+        if self.distance is None:
+            return None
+        return self.origin, self.distance.copy(), self.heading.copy()
+
+    def set_state(self, state):
+        """Load a state captured by get_state; the state is left untouched."""
+        if state is None:
+            self.clear()
+            return
+        origin, distance, heading = state
+        self.origin = origin
+        self.distance = distance.copy()
+        self.heading = heading.copy()
@@ -1,19 +1,57 @@
 # -*- coding: utf-8 -*-
-import random
 import math
+from operator import attrgetter
+from dataclasses import dataclass
+import numpy as np
 from base_game import (
     BaseGame,
-    Particle,
     SCREEN_WIDTH,
     SCREEN_HEIGHT,
     SPATIAL_RESOLUTION,
 )
 from graphics import Frame, Rectangle, Text, Circle, Triangle, Cross
+from effects import EffectsLayer
+from collision_backends import make_collision_backend
+from separation import neighbor_pairs
+from slot_table import SlotTable
+from world import Camera, ChunkGrid
+from flow_field import FlowField
+from spawning import SpawnDirector
+from components import (
+    AuraRecord,
+    EnemyRecord,
+    OrbitRecord,
+    ProjectileRecord,
+    Record,
+    XPRecord,
+)
+
+# 世界比屏幕大，摄像机跟随玩家；世界边缘是墙
+WORLD_WIDTH = SCREEN_WIDTH * 8
+WORLD_HEIGHT = SCREEN_HEIGHT * 8
 
 # 空间分区常量
 GRID_SIZE = 100  # 网格大小
-GRID_COLS = SCREEN_WIDTH // GRID_SIZE + 1
-GRID_ROWS = SCREEN_HEIGHT // GRID_SIZE + 1
+GRID_COLS = WORLD_WIDTH // GRID_SIZE + 1
+GRID_ROWS = WORLD_HEIGHT // GRID_SIZE + 1
+
+# 区块：视口周围的活跃区块每帧全速模拟，其余区块的敌人每CHUNK_SLEEP_INTERVAL帧更新一次
+CHUNK_SIZE = 256
+ACTIVE_CHUNK_MARGIN = 1  # 视口外保持活跃的区块圈数
+CHUNK_SLEEP_INTERVAL = 4
+
+# 敌人细节层级（LOD）：按到玩家的距离分档，越过档位边界LOD_HYSTERESIS后才换档，避免在边界附近来回跳
+LOD_NEAR = 0  # 每帧完整更新
+LOD_MID = 1  # 每LOD_MID_SEPARATION_INTERVAL帧计算一次排斥
+LOD_FAR = 2  # 只朝玩家移动，不计算排斥，不参与碰撞
+LOD_HYSTERESIS = 40
+LOD_NEAR_RADIUS = 300
+# 远档敌人要近到LOD_FAR_RADIUS - LOD_HYSTERESIS以内才离开远档，这个距离取视口对角线：
+# 摄像机卡在世界角落时玩家也在视口角落，视口里的点离玩家都不超过对角线，所以远档敌人一定在视口外
+LOD_FAR_RADIUS = math.hypot(SCREEN_WIDTH, SCREEN_HEIGHT) + LOD_HYSTERESIS
+LOD_BOUNDS = np.array([LOD_NEAR_RADIUS, LOD_FAR_RADIUS])
+LOD_MID_SEPARATION_INTERVAL = 4
+LOD_COLUMN = "lod"  # enemy_slots中存放每个敌人档位的列
 
 # Particle types
 PLAYER = "player"
@@ -24,6 +62,19 @@ XP = "xp"
 DAMAGE_TEXT = "damage_text"  # New particle type for damage numbers
 BLOOD = "blood"  # 血液粒子类型
 
+# 碰撞索引图层：每类实体单独建索引，查询时不必再按kind过滤
+LAYER_PLAYER = "player"
+LAYER_ENEMIES = "enemies"
+LAYER_PROJECTILES = "projectiles"
+LAYER_PICKUPS = "pickups"
+SPATIAL_LAYERS = {
+    PLAYER: LAYER_PLAYER,
+    ENEMY: LAYER_ENEMIES,
+    ENEMY_ELITE: LAYER_ENEMIES,
+    WEAPON: LAYER_PROJECTILES,
+    XP: LAYER_PICKUPS,
+}
+
 # Game states
 STATE_START_MENU = "start_menu"
 STATE_PLAYING = "playing"
@@ -42,6 +93,7 @@ ENEMY_SPEED_MAX = 3
 ELITE_SPEED_MULTIPLIER = 1.2  # Elite enemies move faster
 ENEMY_SPEED_REDUCTION = 0.5  # 全局敌人速度减速系数
 WEAPON_SPEED = 8
+# 离玩家超过DESPAWN_DISTANCE的敌人会被移除，这个上限管的是玩家周围这片区域里的敌人数，与世界大小无关
 MAX_ENEMIES = 50  # 优化：减少最大敌人数
 MAX_WEAPONS = 4   # 优化：减少最大武器数
 MAX_DAMAGE_TEXTS = 20  # 限制同时存在的伤害数字
@@ -53,18 +105,39 @@ BLOOD_PARTICLE_LIFETIME = 20  # 血液粒子存活帧数
 DESPAWN_DISTANCE = 1.5 * max(SCREEN_WIDTH, SCREEN_HEIGHT)  # Distance at which enemies despawn
 FRAMES_PER_MINUTE = 60 * 60  # 60fps * 60 seconds
 WAVE_INTERVAL = FRAMES_PER_MINUTE  # One wave per minute
-SPAWN_DISTANCE = max(SCREEN_WIDTH, SCREEN_HEIGHT) * 1.1  # Distance from player to spawn enemies
+SPAWN_DISTANCE = math.hypot(SCREEN_WIDTH, SCREEN_HEIGHT) / 2 + 2 * ELITE_SIZE  # Distance from player to spawn enemies, just outside the view
+FLOW_CELL_SIZE = 128  # 追击流场的格子大小
+FLOW_FIELD_INTERVAL = 10  # 每隔多少帧按玩家位置重算一次流场
+FLOW_DENSITY_COST = 0.2  # 格子里每个敌人让经过该格的代价增加这么多（0为纯最短路）
+FLOW_DIRECT_RADIUS = 2 * FLOW_CELL_SIZE  # 这个距离内的敌人不查流场，直接追向玩家
 KNOCKBACK_DISTANCE = 5  # Knockback distance in pixels
 KNOCKBACK_DURATION = 10  # Duration of knockback in frames
+ENEMY_REPULSION_RANGE = 1.2  # 敌人排斥范围 = (size1 + size2) * 1.2
+ENEMY_SAFE_MARGIN = 10  # 敌人移动前被限制在离世界边缘这么远的范围内
+ENEMY_PUSH = 0.5  # 重叠敌人每帧互相推开的距离（每对从两侧各推一次）
 DAMAGE_TEXT_DURATION = 30  # 伤害数字持续时间（1秒 = 60帧）
 DAMAGE_TEXT_RISE = 50  # 伤害数字上升距离
 MIN_ENEMIES_PER_WAVE = 30  # 提高最小敌人数
+SPAWN_BUDGET_PER_FRAME = 8  # 每帧最多生成的敌人数，大的波次分几帧生成完
+# 每种敌人的属性：生命值、伤害、经验值、速度倍数
+ENEMY_KIND_STATS = {
+    ENEMY: {"health": 10, "damage": 5, "xp_value": 10, "speed_multiplier": 1},
+    ENEMY_ELITE: {"health": 30, "damage": 10, "xp_value": 30, "speed_multiplier": ELITE_SPEED_MULTIPLIER},
+}
 XP_DROP_CHANCE = 0.5  # 50% chance to drop XP when enemy dies
 ELITE_HEALTH_MULTIPLIER = 5  # Elite enemies have 5x normal health
 XP_MAGNET_RANGE = 80  # Range at which XP starts moving toward player
 XP_MAGNET_SPEED_MIN = int(2 * 0.7)
 XP_MAGNET_SPEED_MAX = int(15 * 0.7)
 XP_ACCELERATION = 0.2  # How quickly XP accelerates toward player
+XP_GEM_VALUE = 10  # 敌人没有xp_value时掉落的经验值
+# 经验宝石合并：场上宝石超过XP_MAX_GEMS时立即合并；另外每XP_MERGE_INTERVAL帧把
+# 同一XP_MERGE_RADIUS格子里达到XP_MERGE_DENSITY颗的宝石合成一颗，总经验值不变
+XP_MAX_GEMS = 60
+XP_MERGE_RADIUS = 48
+XP_MERGE_DENSITY = 4
+XP_MERGE_INTERVAL = 30
+XP_MAX_DRAW_SCALE = 2.5  # 合并后的宝石按价值放大，最多放大到这个倍数
 
 # Health system animation constants
 HP_TRANSITION_DURATION = 20  # Steps for hp animation
@@ -350,20 +423,874 @@ WEAPON_COLORS = {
     "Garlic": "#FFFF99",
 }
 
+# 飞刀每级属性表
+KNIFE_DAMAGE_TABLE = [10, 10, 15, 15, 15, 15, 20, 20]
+KNIFE_PIERCE_TABLE = [0, 0, 0, 0, 1, 1, 1, 2]
+KNIFE_AMOUNT_TABLE = [1, 2, 3, 4, 4, 5, 6, 6]
+KNIFE_INTERVAL_TABLE = [6, 6, 6, 5, 5, 4, 3, 2]  # 间隔帧数（0.1s~0.04s）
+KNIFE_COOLDOWN = 60  # 每轮齐射后的冷却（1秒）
+KING_BIBLE_COOLDOWN = 180  # 圣经消失后的冷却（3秒）
+KING_BIBLE_BASE_RADIUS = 60
+CROSS_SHOT_INTERVAL = 6  # 十字架连发间隔（0.1秒）
+
+
+@dataclass(frozen=True)
+class WeaponStats:
+    """Final stats of one weapon at one level, precomputed in WEAPON_CATALOG"""
+    name: str
+    level: int
+    behavior: str
+    damage: float
+    amount: int  # Projectiles per volley
+    pierce: int  # Value stored in the projectile's pierce_count
+    cooldown: int  # Frames between volleys
+    interval: int  # Frames between shots inside a volley
+    speed: float
+    area: float
+    collision_size: float  # Diameter used by check_collision
+    size: int
+    shape: str
+    color: str
+    border_color: str
+    pool_limit: int
+    knockback: float
+
+
+def _upgrade_total(weapon_type, key, level):
+    """Sum one stat over the upgrade table entries unlocked at the given level"""
+    return sum(u.get(key, 0) for u in weapon_type["upgrade_table"][:max(0, level - 1)])
+
+
+def _compile_weapon_stats(weapon_type, level):
+    """Reproduce the per-weapon stat formulas of the spawn functions for one level"""
+    name = weapon_type["name"]
+    size = weapon_type["size"]
+    color_info = WEAPON_COLORS.get(name, WEAPON_COLOR)
+    if isinstance(color_info, dict):
+        color, border_color = color_info["main"], color_info["border"]
+    else:
+        color, border_color = color_info, color_info
+    stats = {
+        "damage": max(1, weapon_type["base_damage"] + _upgrade_total(weapon_type, "damage", level)),
+        "amount": 1,
+        "pierce": weapon_type["pierce"],
+        "cooldown": weapon_type["cooldown"],
+        "interval": weapon_type["projectile_interval"],
+        "speed": WEAPON_SPEED,
+        "area": 1.0,
+        "collision_size": size,
+        "pool_limit": weapon_type["pool_limit"],
+        "knockback": weapon_type["knockback"],
+    }
+    if name == "Whip":
+        stats.update(damage=max(1, 10 + 3 * (level - 1)), speed=0)
+    elif name == "MagicWand":
+        stats.update(
+            damage=8 + 2 * (level - 1),
+            amount=max(1, weapon_type["amount"] + _upgrade_total(weapon_type, "amount", level)),
+            pierce=weapon_type["pierce"] + _upgrade_total(weapon_type, "pierce", level) + 1,
+            speed=10 * 0.6,
+        )
+    elif name == "Knife":
+        idx = min(level, 8) - 1
+        stats.update(
+            damage=KNIFE_DAMAGE_TABLE[idx],
+            amount=KNIFE_AMOUNT_TABLE[idx],
+            pierce=KNIFE_PIERCE_TABLE[idx],
+            interval=KNIFE_INTERVAL_TABLE[idx],
+            cooldown=KNIFE_COOLDOWN,
+            speed=14,
+            collision_size=size * 1.5,  # 飞刀使用1.5倍尺寸
+        )
+    elif name == "Axe":
+        stats.update(
+            damage=20 if level == 1 else (40 if level <= 4 else (60 if level <= 7 else 80)),
+            amount=1 + _upgrade_total(weapon_type, "count", level),
+            speed=8,
+            collision_size=size * 1.2,  # 斧子使用1.2倍尺寸，与显示大小匹配
+        )
+    elif name == "Cross":
+        stats.update(
+            damage=40 if level >= 8 else (30 if level >= 5 else (20 if level >= 2 else 10)),
+            amount=3 if level >= 7 else (2 if level >= 4 else 1),
+            pierce=999,  # 无限穿透
+            interval=CROSS_SHOT_INTERVAL,
+            speed=8 * (1.5 if level >= 6 else (1.25 if level >= 3 else 1.0)),
+            collision_size=size * 2.0,  # 十字架使用2倍尺寸，与显示大小匹配
+        )
+    elif name == "KingBible":
+        props = KING_BIBLE_LEVELS[min(level, len(KING_BIBLE_LEVELS)) - 1]
+        stats.update(
+            damage=10 if level <= 3 else (20 if level <= 6 else 30),
+            amount=max(1, props["amount"]),
+            cooldown=KING_BIBLE_COOLDOWN,
+            speed=props["speed"],
+            area=props["area"],
+            collision_size=size * 3,  # 圣经使用3倍尺寸
+        )
+    elif name == "FireWand":
+        stats.update(
+            damage=max(1, 15 + 3 * (level - 1)),
+            amount=1 + _upgrade_total(weapon_type, "count", level),
+            speed=11,
+        )
+    elif name == "Garlic":
+        area = 1.0
+        for upgrade in weapon_type["upgrade_table"][:max(0, level - 1)]:
+            area += upgrade.get("area", 0)  # 与spawn_aura相同的累加顺序
+        stats.update(speed=0, area=area, collision_size=size * area)  # 光环半径即碰撞尺寸
+    return WeaponStats(
+        name=name,
+        level=level,
+        behavior=weapon_type["behavior"],
+        size=size,
+        shape=weapon_type.get("shape", "circle"),
+        color=color,
+        border_color=border_color,
+        **stats,
+    )
+
+
+# 武器名 -> 配置
+WEAPON_TYPES_BY_NAME = {w["name"]: w for w in WEAPON_TYPES}
+
+# 武器名 -> 每级最终属性（下标为等级-1），导入时预先计算
+WEAPON_CATALOG = {
+    w["name"]: tuple(_compile_weapon_stats(w, level) for level in range(1, w["max_level"] + 1))
+    for w in WEAPON_TYPES
+}
+
+
+def weapon_stats(name, level):
+    """Look up the precompiled stats of a weapon, clamping level to [1, max_level]; None for unknown weapons"""
+    levels = WEAPON_CATALOG.get(name)
+    if levels is None:
+        return None
+    level = int(level)
+    if level < 1:
+        level = 1
+    elif level > len(levels):
+        level = len(levels)
+    return levels[level - 1]
+
 BLOOD_PARTICLE_COUNT = 8  # 每次受伤产生的血液粒子数量
 BLOOD_PARTICLE_SIZE = 3   # 血液粒子大小
-class Game(BaseGame):
+
+
+@dataclass
+class AuraContact:
+    """An enemy inside an aura's damage radius or touching its collision circle"""
+    aura: object
+    enemy: object
+    dx: float  # 光环中心指向敌人
+    dy: float
+    dist: float
+    touching: bool  # 通过check_collision的窄相检测
+
+
+@dataclass
+class CollisionPairs:
+    """Typed collision pairs produced once per frame by Game.collision_pairs"""
+    projectile_enemy: list  # (weapon, enemy)，非光环武器，已通过窄相检测
+    aura_enemy: list  # AuraContact
+    player_enemy: list  # 与玩家接触的敌人
+    player_pickup: list  # 与玩家接触的经验
+
+
+# ContactBatch.rows的列：两个实体的位置、碰撞距离（两者碰撞尺寸之和的一半）、光环伤害半径（不是光环为-1）
+CONTACT_ROW_FIELDS = ("ax", "ay", "bx", "by", "reach", "radius")
+
+
+@dataclass
+class ContactBatch:
+    """
+    Candidate pairs from the collision index, gathered for the batched narrowphase (see narrowphase).
+
+    Each pair is (weapon, enemy), (player, enemy) or (player, XP gem);
+    rows holds one plain tuple per pair (CONTACT_ROW_FIELDS), so batches of
+    several games are merged by concatenating the lists.
+    """
+    pairs: list
+    rows: list
+
+
+@dataclass
+class ContactResult:
+    """Result of narrowphase; per-pair values are lists"""
+    dx: list  # a指向b
+    dy: list
+    dist: list
+    touching: list  # 距离小于reach，与check_collision的判定相同
+    in_radius: list  # 距离不超过radius
+
+
+def narrowphase(batch):
+    """
+    Run the circle test of check_collision on every candidate pair at once.
+
+    Args:
+        batch (ContactBatch): Candidate pairs, possibly of several games.
+
+    Returns:
+        ContactResult: Offsets, distances and the test results per pair.
+    """
+    n = len(batch.rows)
+    if n == 0:
+        return ContactResult([], [], [], [], [])
+    data = np.array(batch.rows, dtype=np.float64).reshape(n, len(CONTACT_ROW_FIELDS))
+    ax, ay, bx, by, reach, radius = data.T
+    dx = bx - ax
+    dy = by - ay
+    dist = np.sqrt(dx * dx + dy * dy)
+    return ContactResult(dx.tolist(), dy.tolist(), dist.tolist(), (dist < reach).tolist(), (dist <= radius).tolist())
+
+
+class CombatHits:
+    """
+    Hits on enemies gathered for one subtract_hits call.
+
+    Enemies are numbered in the order of their first hit. The hits are kept
+    as parallel lists in the order they were added, which is the order the
+    old hit-by-hit passes dealt them in, so subtract_hits can report each
+    hit's HP as if they had been dealt one at a time.
+    """
+
     def __init__(self):
+        self.enemies = []
+        self.index = {}  # enemy -> 下标
+        self.target = []  # 每次命中：敌人下标
+        self.damage = []  # 每次命中：伤害
+        self.weapon = []  # 每次命中：武器
+        self.contact = []  # 每次命中：是否为直接碰撞（闪白、伤害数字、背离玩家的击退、可致死）
+
+    def __len__(self):
+        return len(self.target)
+
+    def add(self, weapon, enemy, damage, contact=False):
+        """Record one hit"""
+        i = self.index.get(enemy)
+        if i is None:
+            i = self.index[enemy] = len(self.enemies)
+            self.enemies.append(enemy)
+        self.target.append(i)
+        self.damage.append(damage)
+        self.weapon.append(weapon)
+        self.contact.append(contact)
+
+
+def subtract_hits(hp, target, damage):
+    """
+    Subtract a list of hits from an HP column, in hit order.
+
+    The numbers are those of calling take_damage once per hit: HP is
+    clamped at 0 after every hit, which for non-negative damage is the same
+    as clamping each enemy's running damage total once.
+
+    Args:
+        hp (np.ndarray): (M,) hit points of the enemies that were hit.
+        target (np.ndarray): (H,) index into hp of each hit.
+        damage (np.ndarray): (H,) damage of each hit.
+
+    Returns:
+        tuple: (hp after all hits; hp of the hit enemy right after each
+        hit), both clamped at 0.
+    """
+    dtype = np.result_type(hp, damage)
+    if len(target) == 0:
+        return hp.astype(dtype), np.zeros(0, dtype=dtype)
+    total = np.zeros(len(hp), dtype=dtype)
+    np.add.at(total, target, damage)
+    # 按敌人稳定排序后分组求前缀和，得到每次命中后该敌人累计受到的伤害
+    order = np.argsort(target, kind="stable")
+    grouped = target[order]
+    running = np.cumsum(damage[order])
+    starts = np.r_[True, grouped[1:] != grouped[:-1]]
+    before_group = (running - damage[order])[starts]
+    after = np.empty(len(target), dtype=dtype)
+    after[order] = np.maximum(hp[grouped] - (running - before_group[np.cumsum(starts) - 1]), 0)
+    return np.maximum(hp - total, 0), after
+
+
+@dataclass
+class HitBatch:
+    """The arguments of subtract_hits for one round of hits; the answer is its result (None for a round without hits)"""
+    hp: np.ndarray
+    target: np.ndarray
+    damage: np.ndarray
+
+
+NO_HITS = HitBatch(np.zeros(0), np.zeros(0, dtype=np.intp), np.zeros(0))
+
+
+@dataclass
+class SpawnBatch:
+    """Enemies spawned this frame, with their angles and speeds already drawn (see spawn_positions)"""
+    kind: list
+    speed: list
+    angle: np.ndarray
+    origin_x: np.ndarray  # 每个敌人所在游戏的玩家位置
+    origin_y: np.ndarray
+
+
+NO_SPAWNS = SpawnBatch([], [], np.zeros(0), np.zeros(0), np.zeros(0))
+
+
+def spawn_positions(batch):
+    """
+    Place a batch of spawns SPAWN_DISTANCE from their player along their angles, inside the world.
+
+    Returns:
+        tuple: (x, y) lists.
+    """
+    if not len(batch.angle):
+        return [], []
+    x = np.clip(batch.origin_x + np.cos(batch.angle) * SPAWN_DISTANCE, 0, WORLD_WIDTH)
+    y = np.clip(batch.origin_y + np.sin(batch.angle) * SPAWN_DISTANCE, 0, WORLD_HEIGHT)
+    return x.tolist(), y.tolist()
+
+
+# EnemyBatch.rows的列：位置、是否精英、speed属性、本次更新走的帧数（睡眠区块的敌人一次补走多帧）、
+# 本帧是否计算排斥（由LOD档位决定）、流场追击方向（(0, 0)表示直接追向玩家）、击退状态、所在游戏的玩家位置
+ENEMY_ROW_FIELDS = (
+    "x", "y", "elite", "speed", "steps", "separate", "heading_x", "heading_y",
+    "knockback_timer", "knockback_dx", "knockback_dy", "player_x", "player_y",
+)
+
+
+@dataclass
+class EnemyBatch:
+    """
+    Live enemies gathered for the batched movement step (see move_enemies).
+
+    rows holds one plain tuple per enemy (ENEMY_ROW_FIELDS); batches of
+    several games are merged by concatenating the lists, so the conversion
+    to arrays happens once for all of them.
+    """
+    enemies: list  # 本帧移动的敌人（未在死亡动画中），普通敌人在前
+    rows: list
+
+
+@dataclass
+class EnemyMotion:
+    """Result of move_enemies; per-enemy values are lists, written back one by one"""
+    x: list  # 新位置（被移除的敌人只做了边距修正）
+    y: list
+    dx: list  # 本帧移动方向
+    dy: list
+    despawn: list  # 离玩家太远，本帧不移动
+    knocked: list  # 本帧处于击退中
+    knockback_timer: list
+    pair_i: np.ndarray  # 重叠的敌人对 (i < j)，帧末推开用
+    pair_j: np.ndarray
+    unit_x: np.ndarray  # i指向j的单位向量（距离为0时为0）
+    unit_y: np.ndarray
+
+
+@dataclass
+class EnemySeparation:
+    """Overlapping enemy pairs of one frame, pushed apart by Game.push_apart_enemies"""
+    enemies: list
+    pair_i: np.ndarray
+    pair_j: np.ndarray
+    unit_x: np.ndarray
+    unit_y: np.ndarray
+
+
+def move_enemies(batch, group=None):
+    """
+    Steer and move a batch of enemies in whole-array operations.
+
+    Each enemy heads for its player, along its flow-field heading when it
+    has one, blended with the repulsion of the enemies it overlaps (found with separation.neighbor_pairs), unless it is
+    being knocked back. Only enemies whose separate flag is set take part in
+    the repulsion; the others just head for the player. Enemies catching up
+    several frames at once (from sleeping chunks) walk steps frames' worth.
+    The batch may hold the enemies of several games; group then gives each
+    enemy's game index so games never interact.
+
+    Args:
+        batch (EnemyBatch): Enemies to move.
+        group (np.ndarray, optional): Game index per enemy.
+
+    Returns:
+        EnemyMotion: New positions and directions, and the overlapping pairs.
+    """
+    n = len(batch.rows)
+    data = np.array(batch.rows, dtype=np.float64).reshape(n, len(ENEMY_ROW_FIELDS))
+    (x, y, elite, speed, steps, separate, heading_x, heading_y,
+     knockback_timer, knockback_dx, knockback_dy, player_x, player_y) = data.T
+    # 边界强制反弹修正
+    x = np.clip(x, ENEMY_SAFE_MARGIN, WORLD_WIDTH - ENEMY_SAFE_MARGIN)
+    y = np.clip(y, ENEMY_SAFE_MARGIN, WORLD_HEIGHT - ENEMY_SAFE_MARGIN)
+    elite = elite != 0
+    size = np.where(elite, ELITE_SIZE, ENEMY_SIZE)
+
+    # 敌人之间的排斥：一次性用NumPy网格算出本帧需要分离的敌人对
+    separating = np.flatnonzero(separate)
+    i, j, pair_dx, pair_dy, pair_dist = neighbor_pairs(
+        x[separating], y[separating], size[separating] * ENEMY_REPULSION_RANGE,
+        None if group is None else group[separating],
+    )
+    i = separating[i]
+    j = separating[j]
+    count = np.bincount(i, minlength=n) + np.bincount(j, minlength=n)
+    apart = pair_dist > 0
+    safe_dist = np.where(apart, pair_dist, 1.0)
+    unit_x = np.where(apart, pair_dx / safe_dist, 0.0)
+    unit_y = np.where(apart, pair_dy / safe_dist, 0.0)
+    # 非线性排斥力，越近越强
+    repulsion = 10 * (1.0 - pair_dist / ((ENEMY_SIZE + ENEMY_SIZE) * ENEMY_REPULSION_RANGE)) ** 2
+    force_x = unit_x * repulsion
+    force_y = unit_y * repulsion
+    # i被推离j，j被推离i
+    steer_x = np.bincount(j, force_x, minlength=n) - np.bincount(i, force_x, minlength=n)
+    steer_y = np.bincount(j, force_y, minlength=n) - np.bincount(i, force_y, minlength=n)
+
+    # Calculate direction to player
+    dx = player_x - x
+    dy = player_y - y
+    dist = np.sqrt(dx * dx + dy * dy)
+    # 如果方向为0，直接赋值为(1,1)
+    zero = (dx == 0) & (dy == 0)
+    dx[zero] = 1
+    dy[zero] = 1
+    dist[zero] = math.sqrt(2)
+    # 有流场方向的敌人沿流场走，向量长度仍取到玩家的距离
+    along_flow = (heading_x != 0) | (heading_y != 0)
+    dx = np.where(along_flow, heading_x * dist, dx)
+    dy = np.where(along_flow, heading_y * dist, dy)
+    # Check if enemy should despawn due to distance
+    despawn = dist > DESPAWN_DISTANCE
+
+    # 发生碰撞时排斥力占0.7的权重，再重新归一化；没有碰撞时正常归一化方向
+    colliding = count > 0
+    magnitude = np.sqrt(steer_x * steer_x + steer_y * steer_y)
+    blend = colliding & (magnitude > 0)
+    safe_magnitude = np.where(blend, magnitude, 1.0)
+    blend_x = dx / dist * 0.3 + steer_x / safe_magnitude * 0.7
+    blend_y = dy / dist * 0.3 + steer_y / safe_magnitude * 0.7
+    final = np.sqrt(blend_x * blend_x + blend_y * blend_y)
+    safe_final = np.where(final > 0, final, 1.0)
+    blend_x = np.where(final > 0, blend_x / safe_final, blend_x)
+    blend_y = np.where(final > 0, blend_y / safe_final, blend_y)
+    # 排斥力恰好抵消时保持未归一化的方向（与逐个计算时一致）
+    move_dx = np.where(blend, blend_x, np.where(colliding, dx, dx / dist))
+    move_dy = np.where(blend, blend_y, np.where(colliding, dy, dy / dist))
+
+    # Apply movement
+    speed = speed * ENEMY_SPEED_REDUCTION
+    speed = np.where(elite, speed * ELITE_SPEED_MULTIPLIER, speed)
+    # 处理击退效果
+    knocked = (knockback_timer > 0) & ~despawn
+    walking = ~knocked & ~despawn
+    stride = speed * steps
+    new_x = np.where(knocked, x + knockback_dx * KNOCKBACK_DISTANCE, np.where(walking, x + move_dx * stride, x))
+    new_y = np.where(knocked, y + knockback_dy * KNOCKBACK_DISTANCE, np.where(walking, y + move_dy * stride, y))
+    return EnemyMotion(
+        new_x.tolist(),
+        new_y.tolist(),
+        move_dx.tolist(),
+        move_dy.tolist(),
+        despawn.tolist(),
+        knocked.tolist(),
+        (knockback_timer - 1).astype(np.int64).tolist(),
+        i, j, unit_x, unit_y,
+    )
+
+
+def lod_tiers(tier, dist):
+    """
+    Update enemy LOD tiers from their distances to the player, with hysteresis.
+
+    An enemy changes tier only once it is more than LOD_HYSTERESIS past a
+    boundary in LOD_BOUNDS, so enemies hovering around a boundary keep
+    their tier instead of flickering between two.
+
+    Args:
+        tier (np.ndarray): Current tier per enemy.
+        dist (np.ndarray): Distance to the player per enemy.
+
+    Returns:
+        np.ndarray: The new tiers.
+    """
+    nearest = np.searchsorted(LOD_BOUNDS, dist - LOD_HYSTERESIS)
+    farthest = np.searchsorted(LOD_BOUNDS, dist + LOD_HYSTERESIS)
+    return np.clip(tier, nearest, farthest).astype(tier.dtype)
+
+
+def push_apart_enemies(separation):
+    """
+    Push overlapping enemy pairs apart in one array update, then keep them inside the world.
+
+    The separation may merge the pairs of several games; enemies are
+    updated in place, so no game state is needed.
+    """
+    i, j = separation.pair_i, separation.pair_j
+    if len(i) == 0:
+        return
+    enemies = separation.enemies
+    n = len(enemies)
+    # 本帧中途死亡或被移除的敌人不再参与
+    live = np.fromiter(
+        (not enemy.removed and not enemy.attributes.is_dying for enemy in enemies), dtype=bool, count=n
+    )
+    keep = live[i] & live[j] & ((separation.unit_x != 0) | (separation.unit_y != 0))
+    if not keep.any():
+        return
+    i, j = i[keep], j[keep]
+    # 每对敌人从两侧各推一次
+    step_x = separation.unit_x[keep] * (2 * ENEMY_PUSH)
+    step_y = separation.unit_y[keep] * (2 * ENEMY_PUSH)
+    push_x = np.bincount(j, step_x, minlength=n) - np.bincount(i, step_x, minlength=n)
+    push_y = np.bincount(j, step_y, minlength=n) - np.bincount(i, step_y, minlength=n)
+    touched = np.flatnonzero(np.bincount(i, minlength=n) + np.bincount(j, minlength=n))
+    x = np.fromiter((enemies[k].x for k in touched), dtype=np.float64, count=len(touched))
+    y = np.fromiter((enemies[k].y for k in touched), dtype=np.float64, count=len(touched))
+    # 确保敌人不会移出世界
+    x = np.clip(x + push_x[touched], 0, WORLD_WIDTH).tolist()
+    y = np.clip(y + push_y[touched], 0, WORLD_HEIGHT).tolist()
+    for k, new_x, new_y in zip(touched.tolist(), x, y):
+        enemy = enemies[k]
+        enemy.x = new_x
+        enemy.y = new_y
+
+
+def run_phase(request):
+    """Do the array work a Game.step_phases generator yielded and return its answer"""
+    if isinstance(request, SpawnBatch):
+        return spawn_positions(request)
+    if isinstance(request, EnemyBatch):
+        return move_enemies(request)
+    if isinstance(request, ContactBatch):
+        return narrowphase(request)
+    if isinstance(request, HitBatch):
+        return subtract_hits(request.hp, request.target, request.damage) if len(request.hp) else None
+    push_apart_enemies(request)
+    return None
+
+
+def _off_screen(game, weapon):
+    """True once a projectile is more than WEAPON_SIZE outside the camera's view"""
+    return not game.camera.contains(weapon.x, weapon.y, WEAPON_SIZE)
+
+
+class WeaponSystem:
+    """
+    Per-frame update of the projectiles of one weapon behavior.
+
+    Game keeps one system per WEAPON_TYPES "behavior" and files every
+    weapon particle in its behavior's system when it is added, so each
+    system walks only its own projectiles, once per frame. The base class
+    leaves its projectiles where they spawned, which is what the Whip
+    slash and the FireWand fan shot have always done.
+    """
+
+    def __init__(self):
+        # weapon -> None，保持加入顺序，O(1)删除
+        self.projectiles = {}
+
+    def __len__(self):
+        return len(self.projectiles)
+
+    def __iter__(self):
+        return iter(self.projectiles)
+
+    def add(self, weapon):
+        self.projectiles[weapon] = None
+
+    def discard(self, weapon):
+        self.projectiles.pop(weapon, None)
+
+    def clear(self):
+        self.projectiles = {}
+
+    def update(self, game, expired):
+        """Advance every projectile by one frame, appending the ones that end to expired."""
+
+
+class StraightShotSystem(WeaponSystem):
+    """Knife: straight flight until it leaves the screen"""
+
+    def update(self, game, expired):
+        for weapon in self.projectiles:
+            attributes = weapon.attributes
+            if "vx" not in attributes or "vy" not in attributes:
+                continue
+            # 飞刀每帧前进两步（原来在敌人移动前后的两次遍历里各走一步）
+            for _ in range(2):
+                weapon.x += attributes["vx"]
+                weapon.y += attributes["vy"]
+                if _off_screen(game, weapon):
+                    expired.append(weapon)
+                    break
+
+
+class HomingMissileSystem(WeaponSystem):
+    """MagicWand: chase the target, then fly straight once it has pierced or the target is gone"""
+
+    def update(self, game, expired):
+        for weapon in self.projectiles:
+            attributes = weapon.attributes
+            if "target_id" in attributes:
+                # 查找目标（目标已死亡时为None）
+                target = game.get_particle_by_id(attributes["target_id"])
+                if target:
+                    dx = target.x - weapon.x
+                    dy = target.y - weapon.y
+                    dist = math.sqrt(dx * dx + dy * dy)
+                    if dist > 0:
+                        dx = dx / dist * attributes.get("speed", WEAPON_SPEED)
+                        dy = dy / dist * attributes.get("speed", WEAPON_SPEED)
+                        weapon.x += dx
+                        weapon.y += dy
+                        attributes["angle"] = math.degrees(math.atan2(dy, dx))
+                        attributes["vx"] = dx
+                        attributes["vy"] = dy
+                        attributes["last_vx"] = dx
+                        attributes["last_vy"] = dy
+                else:
+                    vx = attributes.get("vx", 0)
+                    vy = attributes.get("vy", 0)
+                    weapon.x += vx
+                    weapon.y += vy
+                    attributes["last_vx"] = vx
+                    attributes["last_vy"] = vy
+            elif "vx" in attributes and "vy" in attributes:
+                vx = attributes.get("vx", 0)
+                vy = attributes.get("vy", 0)
+                weapon.x += vx
+                weapon.y += vy
+                attributes["last_vx"] = vx
+                attributes["last_vy"] = vy
+            else:
+                continue
+            if _off_screen(game, weapon):
+                expired.append(weapon)
+
+
+class ArcThrowSystem(WeaponSystem):
+    """Axe: parabolic flight with a lifetime"""
+
+    def update(self, game, expired):
+        for weapon in self.projectiles:
+            attributes = weapon.attributes
+            if "vx" not in attributes or "vy" not in attributes:
+                continue
+            # 更新速度（重力影响）
+            attributes["vy"] += attributes["gravity"]
+            weapon.x += attributes["vx"]
+            weapon.y += attributes["vy"]
+            # 更新旋转角度（根据移动方向）
+            attributes["angle"] = math.degrees(math.atan2(attributes["vy"], attributes["vx"]))
+            # 检查生命周期
+            if "lifetime" in attributes:
+                attributes["lifetime"] -= 1
+                if attributes["lifetime"] <= 0:
+                    expired.append(weapon)
+                    continue
+            if _off_screen(game, weapon):
+                expired.append(weapon)
+
+
+class BoomerangSystem(WeaponSystem):
+    """Cross: decelerate against the launch direction, then accelerate back"""
+
+    def update(self, game, expired):
+        for weapon in self.projectiles:
+            attributes = weapon.attributes
+            vx = attributes.get("vx", 0)
+            vy = attributes.get("vy", 0)
+            initial_vx = attributes.get("initial_vx", 0)
+            initial_vy = attributes.get("initial_vy", 0)
+            initial_speed = math.sqrt(initial_vx * initial_vx + initial_vy * initial_vy)
+
+            # 更新自转角度（使用配置的旋转速度）
+            rotation_speed = attributes.get("rotation_speed", 24)
+            attributes["self_rotation"] = (attributes.get("self_rotation", 0) + rotation_speed) % 360
+
+            if initial_speed > 0:
+                # 加速度始终与初始方向相反
+                deceleration = 0.2
+                vx -= initial_vx / initial_speed * deceleration
+                vy -= initial_vy / initial_speed * deceleration
+                # 点积小于0表示方向已改变，增加返回加速度
+                if (vx * initial_vx + vy * initial_vy) < 0:
+                    return_acceleration = 0.3
+                    vx += -initial_vx / initial_speed * return_acceleration
+                    vy += -initial_vy / initial_speed * return_acceleration
+                # 限制最大返回速度
+                max_return_speed = initial_speed * 1.5
+                current_speed = math.sqrt(vx * vx + vy * vy)
+                if current_speed > max_return_speed:
+                    speed_scale = max_return_speed / current_speed
+                    vx *= speed_scale
+                    vy *= speed_scale
+
+            weapon.x += vx
+            weapon.y += vy
+            attributes["vx"] = vx
+            attributes["vy"] = vy
+            # 更新角度（基于当前速度方向）
+            if math.sqrt(vx * vx + vy * vy) > 0:
+                attributes["angle"] = math.degrees(math.atan2(vy, vx))
+            if _off_screen(game, weapon):
+                expired.append(weapon)
+
+
+class OrbitSystem(WeaponSystem):
+    """KingBible: circle the player, pulling in over the last half second"""
+
+    def update(self, game, expired):
+        for weapon in self.projectiles:
+            attributes = weapon.attributes
+            target_player = game.get_particle_by_id(attributes.target_player_id)
+            if target_player is None:
+                expired.append(weapon)
+                continue
+            # 更新角度（旋转速度系数为6）
+            orbit_angle = (attributes.get("orbit_angle", 0) + attributes.get("speed", 1.0) * 6) % 360
+            attributes["orbit_angle"] = orbit_angle
+            orbit_radius = attributes.get("orbit_radius", 60)
+            duration = attributes.get("duration", 0)
+            fade_duration = 30  # 淡出动画持续30帧 (0.5秒)
+            if duration <= fade_duration:
+                # 在最后0.5秒逐渐减小半径和尺寸，使圣经向玩家靠拢
+                fade_progress = duration / fade_duration
+                current_radius = orbit_radius * fade_progress
+                attributes["current_size"] = attributes.get("original_size", 14) * fade_progress
+            else:
+                current_radius = orbit_radius
+            rad = math.radians(orbit_angle)
+            weapon.x = target_player.x + current_radius * math.cos(rad)
+            weapon.y = target_player.y + current_radius * math.sin(rad)
+            # 更新武器角度（用于渲染）
+            attributes["angle"] = orbit_angle
+
+            if "duration" in attributes:
+                attributes["duration"] -= 1
+                if attributes["duration"] <= 0:
+                    expired.append(weapon)
+                    # 圣经消失时开始3秒冷却
+                    target_player.attributes["KingBible_cooldown"] = KING_BIBLE_COOLDOWN
+
+
+class AuraSystem(WeaponSystem):
+    """
+    Garlic: follow the player and damage every enemy inside the radius.
+
+    Each aura remembers, per enemy, the frame from which that enemy can be
+    hit again. The frames live in one column of Game.enemy_slots per aura
+    (see hit_column), indexed by enemy slot, so a dead enemy's entry is
+    reset together with its slot and checking the enemies in range is a
+    single array comparison.
+    """
+
+    def update(self, game, expired):
+        live = set()
+        for weapon in self.projectiles:
+            attributes = weapon.attributes
+            if not attributes.is_aura:
+                continue
+            target_player = game.get_particle_by_id(attributes.target_player_id)
+            if target_player is not None:
+                weapon.x = target_player.x
+                weapon.y = target_player.y
+            # 脉冲计时，只影响渲染
+            attributes["duration"] -= 1
+            if attributes["duration"] <= 0:
+                attributes["duration"] = attributes.get("cooldown", 78)
+            live.add(self.column_name(weapon))
+        # 已消失光环的冷却列
+        table = game.enemy_slots
+        for name in [name for name in table.columns if name[:1] == (AURA_HIT_COLUMN,) and name not in live]:
+            table.drop_column(name)
+
+    @staticmethod
+    def column_name(aura):
+        return (AURA_HIT_COLUMN, aura.attributes.id)
+
+    def hit_column(self, table, aura):
+        """Return the aura's column of next-hit frames in the enemy slot table, creating it if needed."""
+        return table.add_column(self.column_name(aura), np.int64, 0)
+
+
+# 光环命中冷却在敌人槽位表中的列名前缀：(AURA_HIT_COLUMN, 光环id)
+AURA_HIT_COLUMN = "aura_hit"
+
+# 武器行为 -> 系统类，键与WEAPON_TYPES中的"behavior"一致；按此顺序每帧更新
+WEAPON_SYSTEMS = {
+    "horizontal_slash": WeaponSystem,
+    "homing_missile": HomingMissileSystem,
+    "straight_shot": StraightShotSystem,
+    "arc_throw": ArcThrowSystem,
+    "boomerang": BoomerangSystem,
+    "orbit": OrbitSystem,
+    "fan_shot": WeaponSystem,
+    "aura": AuraSystem,
+}
+
+# 武器名 -> 行为
+WEAPON_BEHAVIORS = {w["name"]: w["behavior"] for w in WEAPON_TYPES}
+
+
+# 快照里按值保存的Game属性：计时器、波次、分数、升级菜单和智能体状态
+SNAPSHOT_FIELDS = (
+    "next_id", "game_state", "last_move_dir", "knife_projectile_timer",
+    "selected_upgrade_index", "frame_count", "kill_count", "elite_kill_count",
+    "last_spawn_time", "last_elite_spawn_time", "spawn_cooldown",
+    "elite_spawn_cooldown", "wave_number", "last_wave_time", "wave_interval",
+    "score", "level", "xp", "xp_to_next_level", "last_reset", "game_timer",
+    "wave_timer", "current_wave", "min_enemies_per_wave", "next_spawn_timer",
+    "elite_spawned", "hp_displayed", "hp_transition_timer", "hp_blink_timer",
+    "hp_section", "upgrade_anim_timer", "damage_text_count",
+    "blood_particle_count", "last_quadrant_check", "safe_quadrant",
+    "last_move_x", "last_move_y", "current_game_state",
+)
+_get_snapshot_fields = attrgetter(*SNAPSHOT_FIELDS)
+
+
+class Game(BaseGame):
+    def __init__(self, use_store=False, encode_effects=True, cell_size=GRID_SIZE, collision_backend="grid", seed=None):
         """Initialize the game"""
-        super().__init__(max_num_particles=1000)  # Initialize with max 1000 particles
-        self.particles = []
+        super().__init__(max_num_particles=1000, use_store=use_store, seed=seed)  # Initialize with max 1000 particles
+        # 每个子系统独立的随机数流，同一seed和输入总是得到完全相同的状态
+        self.spawn_rng = self.rngs.numpy("spawn")  # 敌人生成（整波批量抽取）
+        self.weapon_rng = self.rngs.python("weapons")  # 飞刀抖动、随机发射角度
+        self.combat_rng = self.rngs.python("combat")  # 击退兜底方向、经验掉落
+        self.effects_rng = self.rngs.python("effects")  # 血液、升级烟花
+        self.upgrade_rng = self.rngs.python("upgrades")  # 升级选项
+        self.agent_rng = self.rngs.python("agent")  # 自动代理的决策
         self.next_id = 0
         self.game_state = STATE_START_MENU
         self.show_debug_toolbar = False  # 默认关闭debug toolbar
         self.is_agent_mode = False  # 添加agent模式标志
-        
-        # 初始化空间网格
-        self.spatial_grid = {}
+
+        # 血液和伤害数字是纯视觉效果，放在独立的定长效果层里，不进入self.particles
+        self.effects = EffectsLayer(
+            MAX_BLOOD_PARTICLES,
+            MAX_DAMAGE_TEXTS,
+            BLOOD_PARTICLE_LIFETIME,
+            DAMAGE_TEXT_DURATION,
+            DAMAGE_TEXT_RISE,
+        )
+        self.encode_effects = encode_effects  # 是否把效果写入encode()输出
+
+        # 碰撞/邻近查询索引，构造时选择后端：grid（持久空间哈希，实体跨越格子边界时才移动）、
+        # brute（NumPy距离矩阵，少量实体时最快）、kdtree（SciPy cKDTree，上千实体时最快）
+        self.collision = make_collision_backend(collision_backend, cell_size, set(SPATIAL_LAYERS.values()))
+        # 武器行为 -> 系统，每个系统只更新自己的投射物
+        # 敌人 -> 稳定槽位，逐敌人的数组状态（如光环命中冷却）按槽位存放
+        self.enemy_slots = SlotTable()
+        # 新敌人在碰撞索引里，从中档开始，第一次收集时按距离归档
+        self.enemy_slots.add_column(LOD_COLUMN, np.int8, LOD_MID)
+        self.weapon_systems = {behavior: system() for behavior, system in WEAPON_SYSTEMS.items()}
+        # 摄像机跟随玩家；区块划分世界，视口附近的区块每帧全速模拟
+        self.camera = Camera(SCREEN_WIDTH, SCREEN_HEIGHT, WORLD_WIDTH, WORLD_HEIGHT)
+        self.chunks = ChunkGrid(CHUNK_SIZE, WORLD_WIDTH, WORLD_HEIGHT, ACTIVE_CHUNK_MARGIN)
+        # 以玩家为中心的追击流场，覆盖到敌人消失的距离
+        self.flow_field = FlowField(FLOW_CELL_SIZE, DESPAWN_DISTANCE, FLOW_DENSITY_COST)
+        # 波次和补充只排队，每帧按预算生成
+        self.spawn_director = SpawnDirector(SPAWN_BUDGET_PER_FRAME)
         
         # 移动和武器系统
         self.last_move_dir = (1, 0)  # 默认向右
@@ -396,6 +1323,7 @@ class Game(BaseGame):
         self.current_wave = 0
         self.min_enemies_per_wave = MIN_ENEMIES_PER_WAVE
         self.next_spawn_timer = 0
+        self.elite_spawned = False
         
         # 生命值动画系统
         self.hp_displayed = 100  # 平滑显示的HP
@@ -405,6 +1333,8 @@ class Game(BaseGame):
         
         # 升级菜单
         self.upgrade_options = []
+        self.upgrade_anim_timer = 0
+        self.upgrade_fireworks = []
         
         # 鼠标处理
         self.mouse_pos = (0, 0)
@@ -432,31 +1362,148 @@ class Game(BaseGame):
             "Your weapons will automatically orbit around you and attack nearby enemies."
         )
 
+    def record_type(self, kind, attributes):
+        """Return the record class used for a particle kind, or None to keep a plain dict"""
+        if kind in (ENEMY, ENEMY_ELITE):
+            return EnemyRecord
+        if kind == WEAPON:
+            if attributes.get("is_aura"):
+                return AuraRecord
+            if "orbit_radius" in attributes:
+                return OrbitRecord
+            return ProjectileRecord
+        if kind == XP:
+            return XPRecord
+        # 玩家的属性里有动态的冷却键和武器表，保持dict
+        return None
+
+    def clear_particles(self):
+        """Remove all particles and cosmetic effects"""
+        super().clear_particles()
+        self.effects.clear()
+        self.collision.clear()
+        self.enemy_slots.clear()
+        self.flow_field.clear()
+        self.spawn_director.clear()
+        for system in self.weapon_systems.values():
+            system.clear()
+
+    def add_particle(self, particle):
+        """Add a particle and file it in its collision index layer and weapon system"""
+        super().add_particle(particle)
+        layer = SPATIAL_LAYERS.get(particle.kind)
+        if layer is not None:
+            self.collision.insert(particle, layer)
+        if particle.kind == WEAPON:
+            system = self.weapon_system(particle)
+            if system is not None:
+                system.add(particle)
+        elif particle.kind in (ENEMY, ENEMY_ELITE):
+            self.enemy_slots.add(particle)
+        return particle
+
+    def remove_particle(self, particle):
+        """Remove a particle and drop it from the collision index and its weapon system"""
+        if not particle.removed:
+            self.collision.remove(particle)
+            if particle.kind == WEAPON:
+                system = self.weapon_system(particle)
+                if system is not None:
+                    system.discard(particle)
+            elif particle.kind in (ENEMY, ENEMY_ELITE):
+                self.enemy_slots.release(particle)
+        super().remove_particle(particle)
+
+    def weapon_system(self, weapon):
+        """Return the system of a weapon particle's behavior, or None for unknown weapons"""
+        return self.weapon_systems.get(WEAPON_BEHAVIORS.get(weapon.attributes.weapon_name))
+
+    def encode_extras(self):
+        """Encode the cosmetic effects when encode_effects is enabled"""
+        if not self.encode_effects:
+            return []
+        return self.effects.to_strs(BLOOD, DAMAGE_TEXT)
+
+    def decode_extra(self, kind, x, y, attributes):
+        """Route decoded blood and damage-text blocks into the effects layer"""
+        if kind == BLOOD:
+            self.effects.add_blood(
+                int(attributes.get("id", 0)), x, y,
+                attributes.get("vx", 0.0), attributes.get("vy", 0.0),
+                int(attributes.get("size", BLOOD_PARTICLE_SIZE)),
+                lifetime=int(attributes.get("lifetime", BLOOD_PARTICLE_LIFETIME)),
+                alpha=int(attributes.get("alpha", 255)),
+            )
+            return True
+        if kind == DAMAGE_TEXT:
+            text = attributes.get("text", "")
+            self.effects.add_text(
+                int(attributes.get("id", 0)), x, y,
+                str(int(text)) if isinstance(text, float) else str(text),
+                color=str(attributes.get("color", "#FFFFFF")),
+                timer=int(attributes.get("timer", DAMAGE_TEXT_DURATION)),
+                alpha=int(attributes.get("alpha", 255)),
+                scale=attributes.get("scale", 0.5),
+                growing=attributes.get("scale_phase", "grow") == "grow",
+            )
+            return True
+        return False
+
+    def snapshot_extras(self):
+        """Save timers, wave state, upgrade menu, effects, the collision index, weapon systems, enemy slots, the flow field and pending spawns"""
+        return (
+            _get_snapshot_fields(self),
+            list(self.available_upgrades),
+            list(self.upgrade_options),
+            [list(firework) for firework in self.upgrade_fireworks],
+            self.effects.get_state(),
+            self.collision.get_state(lambda particle: particle.slot),
+            {behavior: [weapon.slot for weapon in system] for behavior, system in self.weapon_systems.items()},
+            self.enemy_slots.get_state(lambda particle: particle.slot),
+            self.flow_field.get_state(),
+            self.spawn_director.get_state(),
+        )
+
+    def restore_extras(self, state):
+        """Load the state saved by snapshot_extras"""
+        (values, available_upgrades, upgrade_options, fireworks, effects, spatial, weapon_slots, enemy_slots,
+         flow_field, spawns) = state
+        for name, value in zip(SNAPSHOT_FIELDS, values):
+            setattr(self, name, value)
+        self.available_upgrades = list(available_upgrades)
+        self.upgrade_options = list(upgrade_options)
+        self.upgrade_fireworks = [list(firework) for firework in fireworks]
+        self.effects.set_state(effects)
+        # 按原来的顺序重建，查询顺序与快照时一致
+        self.collision.set_state(spatial, self.particles.__getitem__)
+        for behavior, slots in weapon_slots.items():
+            self.weapon_systems[behavior].projectiles = dict.fromkeys(self.particles[slot] for slot in slots)
+        self.enemy_slots.set_state(enemy_slots, self.particles.__getitem__)
+        self.flow_field.set_state(flow_field)
+        self.spawn_director.set_state(spawns)
+        self.update_camera()
+
+    def make_attributes(self, kind, attributes):
+        """Store the attributes of enemies, weapons, XP and effects in typed slotted records"""
+        if attributes is None or isinstance(attributes, Record):
+            return attributes
+        record_type = self.record_type(kind, attributes)
+        return attributes if record_type is None else record_type(attributes)
+
+    def update_camera(self):
+        """Centre the camera on the player and make the chunks around the view active"""
+        player = self.get_particle(PLAYER)
+        if player is not None:
+            self.camera.follow(player.x, player.y)
+        self.chunks.activate(self.camera)
+
     def update_spatial_grid(self):
-        """更新空间网格"""
-        self.spatial_grid.clear()
-        for particle in self.particles:
-            if particle.kind in [ENEMY, ENEMY_ELITE, WEAPON, PLAYER]:
-                grid_x = int(particle.x // GRID_SIZE)
-                grid_y = int(particle.y // GRID_SIZE)
-                grid_key = (grid_x, grid_y)
-                if grid_key not in self.spatial_grid:
-                    self.spatial_grid[grid_key] = []
-                self.spatial_grid[grid_key].append(particle)
-
-    def get_nearby_particles(self, x, y, radius):
-        """获取指定位置附近的粒子"""
-        grid_x_start = int((x - radius) // GRID_SIZE)
-        grid_x_end = int((x + radius) // GRID_SIZE)
-        grid_y_start = int((y - radius) // GRID_SIZE)
-        grid_y_end = int((y + radius) // GRID_SIZE)
-        
-        nearby = []
-        for gx in range(grid_x_start, grid_x_end + 1):
-            for gy in range(grid_y_start, grid_y_end + 1):
-                if (gx, gy) in self.spatial_grid:
-                    nearby.extend(self.spatial_grid[(gx, gy)])
-        return nearby
+        """更新碰撞索引（网格后端只移动跨越格子边界的实体）"""
+        self.collision.update()
+
+    def get_nearby_particles(self, x, y, radius, layers=None):
+        """获取指定位置附近格子里的粒子（粗筛，可能比radius远）；layers为None时查所有图层"""
+        return self.collision.nearby(x, y, radius, layers)
 
     def get_frame(self):
         """Get the current frame of the game"""
@@ -465,20 +1512,26 @@ class Game(BaseGame):
         # 1. Draw background
         frame.add_rectangle(Rectangle(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT, "#000000"))
         
+        # 2. 世界中的物体按世界坐标绘制，最后统一平移到屏幕坐标；视口外的物体不输出
+        view = self.camera
+        visible = view.contains
+        world_start = len(frame.objects)
       
         # 3. Draw aura effects (except Garlic)
         garlic_weapons = []  # Store Garlic weapons for later rendering
         for weapon in self.get_particles(WEAPON):
-            if weapon.attributes.get("is_aura"):
-                weapon_name = weapon.attributes.get("weapon_name")
+            if weapon.attributes.is_aura:
+                weapon_name = weapon.attributes.weapon_name
                 if weapon_name == "Garlic":
                     garlic_weapons.append(weapon)  # Collect Garlic weapons
                     continue
                 else:
                     radius = weapon.attributes["aura_radius"]
+                    if not visible(weapon.x, weapon.y, radius):
+                        continue
                     base_color = WEAPON_COLORS.get(weapon_name, "#FFFFFF")
                     
-                    weapon_type = next((w for w in WEAPON_TYPES if w["name"] == weapon_name), None)
+                    weapon_type = WEAPON_TYPES_BY_NAME.get(weapon_name)
                     if weapon_type:
                         alpha = 0.3 + 0.1 * (1 - weapon.attributes["duration"] / weapon_type["cooldown"])
                         
@@ -506,6 +1559,8 @@ class Game(BaseGame):
                 radius = weapon.attributes.get("aura_radius")  # Use the radius we calculated in spawn_aura
                 if radius is None:  # Fallback only if radius is not set
                     radius = WEAPON_SIZE * 2
+                if not visible(weapon.x, weapon.y, radius):
+                    continue
 
                 # Draw red border on top
                 frame.add_circle(Circle(
@@ -516,12 +1571,17 @@ class Game(BaseGame):
         
         # 4. Draw XP particles
         for xp in self.get_particles(XP):
-            frame.add_circle(Circle(xp.x, xp.y, XP_SIZE, XP_COLOR))
+            # 合并过的宝石画得更大
+            size = XP_SIZE * min(XP_MAX_DRAW_SCALE, math.sqrt((xp.attributes.value or XP_GEM_VALUE) / XP_GEM_VALUE))
+            if visible(xp.x, xp.y, size):
+                frame.add_circle(Circle(xp.x, xp.y, size, XP_COLOR))
         
         # 5. Draw enemies
         for enemy_type in [ENEMY, ENEMY_ELITE]:
             for enemy in self.get_particles(enemy_type):
-                if enemy.attributes.get("is_dying"):
+                if enemy.attributes.is_dying:
+                    if not visible(enemy.x, enemy.y, ELITE_SIZE):
+                        continue
                     size = enemy.attributes.get("death_anim_size", ENEMY_SIZE if enemy_type == ENEMY else ELITE_SIZE)
                     color = "#FFFFFF" if enemy.attributes.get("death_anim_white") else (ENEMY_COLOR if enemy_type == ENEMY else ELITE_COLOR)
                     frame.add_circle(Circle(enemy.x, enemy.y, max(1, size), color))
@@ -533,27 +1593,29 @@ class Game(BaseGame):
                         color = "#FFFFFF"  # 受伤时显示为白色
                     else:
                         color = ENEMY_COLOR if enemy_type == ENEMY else ELITE_COLOR
+                    if not visible(enemy.x, enemy.y, ELITE_SIZE + 1):
+                        continue
                     size = ENEMY_SIZE if enemy_type == ENEMY else ELITE_SIZE
                     frame.add_circle(Circle(enemy.x, enemy.y, size + 1, "#FFFFFF"))  # 白色边框
                     frame.add_circle(Circle(enemy.x, enemy.y, size, color))  # 主体颜色
         
         # 6. Draw weapons (except auras and Garlic)
         for weapon in self.get_particles(WEAPON):
-            if not weapon.attributes.get("is_aura") and weapon.attributes.get("weapon_name") != "Garlic":
-                weapon_name = weapon.attributes.get("weapon_name", "")
-                weapon_type = next((w for w in WEAPON_TYPES if w["name"] == weapon_name), None)
-                weapon_size = weapon_type["size"] if weapon_type else WEAPON_SIZE
-                shape = weapon_type.get("shape", "circle") if weapon_type else "circle"
+            if not weapon.attributes.is_aura and weapon.attributes.weapon_name != "Garlic":
+                weapon_name = weapon.attributes.weapon_name
+                stats = weapon_stats(weapon_name, weapon.attributes.level or 1)
+                weapon_size = stats.size if stats else WEAPON_SIZE
+                if not visible(weapon.x, weapon.y, weapon_size * 3):
+                    continue
+                shape = stats.shape if stats else "circle"
                 angle = weapon.attributes.get("angle", 0)
                 
                 # Get weapon color
-                if weapon_name == "Knife" and weapon.attributes.get("is_knife"):
-                    main_color = weapon.attributes.get("main_color", "#FFFFFF")
-                    border_color = weapon.attributes.get("border_color", "#8B4513")
-                    shape_color = main_color
-                else:
-                    color_info = WEAPON_COLORS.get(weapon_name, "#FFFFFF")
-                    shape_color = color_info.get("main", color_info) if isinstance(color_info, dict) else color_info
+                shape_color = stats.color if stats else WEAPON_COLOR
+                if weapon_name == "Knife":
+                    # 飞刀颜色固定，直接取武器目录，不再存到每个粒子上
+                    main_color = stats.color
+                    border_color = stats.border_color
                 
                 # Draw weapon based on its shape
                 if weapon_name == "MagicWand":
@@ -597,7 +1659,7 @@ class Game(BaseGame):
                             shape_color,
                             angle  # Use current arm's angle
                         ))
-                elif weapon_name == "Knife" and weapon.attributes.get("is_knife"):
+                elif weapon_name == "Knife":
                     frame.add_triangle(Triangle(weapon.x, weapon.y, weapon_size * 1.4, border_color, angle))
                     frame.add_triangle(Triangle(weapon.x, weapon.y, weapon_size * 1.2, main_color, angle))
                 elif weapon_name == "Axe":
@@ -634,26 +1696,25 @@ class Game(BaseGame):
                 frame.add_rectangle(Rectangle(bar_x, bar_y, int(bar_width * hp_percent), bar_height, 
                     "#FF4444" if hp_percent < 0.3 else ("#FFFF00" if hp_percent < 0.6 else "#00FF00")))
           # Draw blood particles 
-        for blood in self.get_particles(BLOOD):
-            alpha = format(blood.attributes.get("alpha", 255), '02x')
-            color = f"#FF0000{alpha}"  # Red with transparency
-            frame.add_circle(Circle(blood.x, blood.y, blood.attributes.get("size", BLOOD_PARTICLE_SIZE), color))
+        for x, y, size, alpha in self.effects.blood():
+            if not visible(x, y, size):
+                continue
+            color = f"#FF0000{format(alpha, '02x')}"  # Red with transparency
+            frame.add_circle(Circle(x, y, size, color))
         
         # 8. Draw damage numbers (very top layer)
-        for damage_text in self.get_particles(DAMAGE_TEXT):
-            alpha = damage_text.attributes.get("alpha", 255)
-            scale = damage_text.attributes.get("scale", 1.0)
+        for x, y, text, alpha, scale in self.effects.texts():
             base_size = 24  # 基础字号
+            if not visible(x, y, base_size):
+                continue
             current_size = int(base_size * scale)  # 应用缩放
             alpha_hex = format(alpha, '02x')
-            text = damage_text.attributes["text"]
-            x = damage_text.x
-            y = damage_text.y
             # 黑色描边（上下左右各1像素）
             for dx, dy in [(-1,0),(1,0),(0,-1),(0,1)]:
                 frame.add_text(Text(x+dx, y+dy, text, f"#000000{alpha_hex}", current_size))
             # 正常白色文字
             frame.add_text(Text(x, y, text, f"#FFFFFF{alpha_hex}", current_size))
+        frame.translate(-view.x, -view.y, world_start)
         
         # 9. Draw UI based on game state
         if self.game_state == STATE_UPGRADE_MENU:
@@ -686,7 +1747,7 @@ class Game(BaseGame):
         
         # Wave info
         wave_text = f"Wave: {self.current_wave}"
-        enemies_text = f"Enemies: {len(self.get_particles(ENEMY)) + len(self.get_particles(ENEMY_ELITE))}"
+        enemies_text = f"Enemies: {self.count_particles(ENEMY, ENEMY_ELITE)}"
         frame.add_text(Text(10, 130, wave_text, "#FFFFFF", 16))
         frame.add_text(Text(10, 150, enemies_text, "#FFFFFF", 16))
         
@@ -779,8 +1840,8 @@ class Game(BaseGame):
         
     def create_player(self):
         """Create the player particle"""
-        player_x = SCREEN_WIDTH // 2
-        player_y = SCREEN_HEIGHT // 2
+        player_x = WORLD_WIDTH // 2
+        player_y = WORLD_HEIGHT // 2
         # 初始武器为1级圣经（KingBible），其他武器为0级
         weapons = {"KingBible": 1}
         
@@ -790,8 +1851,8 @@ class Game(BaseGame):
             if weapon_name != "KingBible":
                 weapons[weapon_name] = 0
         
-        self.particles.append(
-            Particle(
+        self.add_particle(
+            self.new_particle(
                 PLAYER,
                 player_x,
                 player_y,
@@ -807,6 +1868,7 @@ class Game(BaseGame):
             )
         )
         self.next_id += 1
+        self.update_camera()
         
     def reset_game(self):
         """Completely reset the game for a new playthrough"""
@@ -820,7 +1882,7 @@ class Game(BaseGame):
         self.next_spawn_timer = 0
         self.wave_timer = WAVE_INTERVAL
         self.elite_spawned = False
-        self.particles = []
+        self.clear_particles()
         self.next_id = 0
         self.last_move_dir = [0, 0]
         self.available_upgrades = []
@@ -925,7 +1987,7 @@ class Game(BaseGame):
                         DEBUG_BUTTON_WIDTH, DEBUG_BUTTON_HEIGHT
                     ):
                         print(f"[DEBUG] Plus button clicked for {weapon_name}")
-                        max_level = next((w["max_level"] for w in WEAPON_TYPES if w["name"] == weapon_name), 8)
+                        max_level = WEAPON_TYPES_BY_NAME[weapon_name]["max_level"] if weapon_name in WEAPON_TYPES_BY_NAME else 8
                         if level < max_level:
                             if weapon_name not in weapons:
                                 weapons[weapon_name] = 1
@@ -955,8 +2017,8 @@ class Game(BaseGame):
                 self.last_move_dir = [dx, dy]
             
             # Apply movement
-            player.x = int(max(PLAYER_SIZE // 2, min(SCREEN_WIDTH - PLAYER_SIZE // 2, player.x + dx)))
-            player.y = int(max(PLAYER_SIZE // 2, min(SCREEN_HEIGHT - PLAYER_SIZE // 2, player.y + dy)))
+            player.x = int(max(PLAYER_SIZE // 2, min(WORLD_WIDTH - PLAYER_SIZE // 2, player.x + dx)))
+            player.y = int(max(PLAYER_SIZE // 2, min(WORLD_HEIGHT - PLAYER_SIZE // 2, player.y + dy)))
         
         elif self.game_state == STATE_UPGRADE_MENU:
             # Handle upgrade menu input
@@ -1001,50 +2063,20 @@ class Game(BaseGame):
     def check_collision(self, particle1, particle2, size1=None, size2=None):
         """Check if two particles are colliding"""
     
-        # 优化：只检测屏幕内的粒子
-        if getattr(particle1, 'attributes', {}).get('is_dying') or getattr(particle2, 'attributes', {}).get('is_dying'):
-            return False
-        if not (0 <= particle1.x <= SCREEN_WIDTH and 0 <= particle1.y <= SCREEN_HEIGHT):
-            return False
-        if not (0 <= particle2.x <= SCREEN_WIDTH and 0 <= particle2.y <= SCREEN_HEIGHT):
+        # 敌人记录的is_dying是槽位，直接取属性；玩家的dict没有该属性
+        if getattr(particle1.attributes, "is_dying", None) or getattr(particle2.attributes, "is_dying", None):
             return False
 
-        # 对于武器，获取其实际尺寸
+        # 对于武器，从武器目录获取其实际碰撞尺寸（圣经3倍、飞刀1.5倍、大蒜为光环半径等）
         if particle1.kind == WEAPON:
-            weapon_name = particle1.attributes.get("weapon_name", "")
-            weapon_type = next((w for w in WEAPON_TYPES if w["name"] == weapon_name), None)
-            if weapon_type:
-                if weapon_name == "KingBible":
-                    size1 = weapon_type["size"] * 3  # 圣经使用3倍尺寸
-                elif weapon_name == "Knife":
-                    size1 = weapon_type["size"] * 1.5  # 飞刀使用1.5倍尺寸
-                elif weapon_name == "Axe":
-                    size1 = weapon_type["size"] * 1.2  # 斧子使用1.2倍尺寸，与显示大小匹配
-                elif weapon_name == "Cross":
-                    size1 = weapon_type["size"] * 2.0  # 十字架使用2倍尺寸，与显示大小匹配
-                elif weapon_name == "Garlic" and particle1.attributes.get("is_aura"):
-                    # 对于大蒜光环，使用其实际的aura_radius
-                    size1 = particle1.attributes.get("aura_radius", weapon_type["size"] * 2)
-                else:
-                    size1 = weapon_type["size"]
+            stats = weapon_stats(particle1.attributes.weapon_name, particle1.attributes.level or 1)
+            if stats is not None:
+                size1 = stats.collision_size
 
         if particle2.kind == WEAPON:
-            weapon_name = particle2.attributes.get("weapon_name", "")
-            weapon_type = next((w for w in WEAPON_TYPES if w["name"] == weapon_name), None)
-            if weapon_type:
-                if weapon_name == "KingBible":
-                    size2 = weapon_type["size"] * 3
-                elif weapon_name == "Knife":
-                    size2 = weapon_type["size"] * 1.5
-                elif weapon_name == "Axe":
-                    size2 = weapon_type["size"] * 1.2  # 斧子使用1.2倍尺寸，与显示大小匹配
-                elif weapon_name == "Cross":
-                    size2 = weapon_type["size"] * 2.0  # 十字架使用2倍尺寸，与显示大小匹配
-                elif weapon_name == "Garlic" and particle2.attributes.get("is_aura"):
-                    # 对于大蒜光环，使用其实际的aura_radius
-                    size2 = particle2.attributes.get("aura_radius", weapon_type["size"] * 2)
-                else:
-                    size2 = weapon_type["size"]
+            stats = weapon_stats(particle2.attributes.weapon_name, particle2.attributes.level or 1)
+            if stats is not None:
+                size2 = stats.collision_size
             
         # 基本圆形碰撞检测
         dx = particle1.x - particle2.x
@@ -1063,9 +2095,9 @@ class Game(BaseGame):
         self.upgrade_fireworks = []
         cx, cy = SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2
         for _ in range(14):
-            angle = random.uniform(0, 2 * math.pi)
-            speed = random.uniform(4, 8)
-            color = random.choice(["#FFD700", "#00FFFF", "#FF66FF", "#FFFFFF"])
+            angle = self.effects_rng.uniform(0, 2 * math.pi)
+            speed = self.effects_rng.uniform(4, 8)
+            color = self.effects_rng.choice(["#FFD700", "#00FFFF", "#FF66FF", "#FFFFFF"])
             self.upgrade_fireworks.append([cx, cy, 8, color, angle, speed, 0])
         player = self.get_particle(PLAYER)
         if not player:
@@ -1100,7 +2132,7 @@ class Game(BaseGame):
             "type": "stat_upgrade", 
             "display": "Attack Speed +10%"
         })
-        self.upgrade_options = random.sample(options, min(3, len(options)))
+        self.upgrade_options = self.upgrade_rng.sample(options, min(3, len(options)))
         print("生成升级选项: {}".format(self.upgrade_options))
         
     def apply_upgrade(self, upgrade):
@@ -1115,22 +2147,21 @@ class Game(BaseGame):
             # 武器升级
             name = upgrade["name"]
             level = weapons.get(name, 1)
-            if level < next((w["max_level"] for w in WEAPON_TYPES if w["name"] == name), 8):
+            if level < (WEAPON_TYPES_BY_NAME[name]["max_level"] if name in WEAPON_TYPES_BY_NAME else 8):
                 # Update weapon level
                 weapons[name] = level + 1
                 print("升级武器 {} 到等级 {}".format(name, level+1))
                 
                 # Remove existing weapon particles of this type
-                weapons_to_remove = [w for w in self.get_particles(WEAPON) 
-                                   if w.attributes.get("weapon_name") == name and 
-                                   w.attributes.get("target_player_id") == player.attributes["id"]]
+                weapons_to_remove = [w for w in self.weapon_systems.get(WEAPON_BEHAVIORS.get(name), ())
+                                   if w.attributes.weapon_name == name and 
+                                   w.attributes.target_player_id == player.attributes["id"]]
                 for weapon in weapons_to_remove:
-                    if weapon in self.particles:
-                        self.remove_particle(weapon)
+                    self.remove_particle(weapon)
                 
                 # Reset cooldown for this weapon
                 cooldown_key = f"{name}_cooldown"
-                weapon_type = next((w for w in WEAPON_TYPES if w["name"] == name), None)
+                weapon_type = WEAPON_TYPES_BY_NAME.get(name)
                 if weapon_type:
                     player.attributes[cooldown_key] = 0  # Reset cooldown to trigger immediate respawn
                     
@@ -1167,16 +2198,16 @@ class Game(BaseGame):
         self.last_reset = 0
         self.clear_particles()
         self.next_id = 0
-        player_x = SCREEN_WIDTH // 2
-        player_y = SCREEN_HEIGHT // 2
+        player_x = WORLD_WIDTH // 2
+        player_y = WORLD_HEIGHT // 2
         # 只在新游戏时加1级圣经，调试工具可自由设为0
         if not hasattr(self, 'player_initialized') or not self.player_initialized:
             weapons = {"KingBible": 1}
             self.player_initialized = True
         else:
             weapons = {w["name"]: 0 for w in WEAPON_TYPES}
-        self.particles.append(
-            Particle(
+        self.add_particle(
+            self.new_particle(
                 PLAYER,
                 player_x,
                 player_y,
@@ -1192,6 +2223,7 @@ class Game(BaseGame):
             )
         )
         self.next_id += 1
+        self.update_camera()
 
         # Reset visual effect states
         self.hp_displayed = 100
@@ -1213,7 +2245,7 @@ class Game(BaseGame):
         """Spawn a wave of enemies"""
         
         min_enemies = min(self.min_enemies_per_wave, MAX_ENEMIES)
-        current_enemies = len(self.get_particles(ENEMY)) + len(self.get_particles(ENEMY_ELITE))
+        current_enemies = self.count_particles(ENEMY, ENEMY_ELITE) + self.spawn_director.pending()
         
         # Don't spawn if we already have maximum enemies
         if current_enemies >= MAX_ENEMIES:
@@ -1229,13 +2261,12 @@ class Game(BaseGame):
             
         print(f"Wave {self.current_wave}: Spawning {enemies_to_spawn} enemies")
         
-        # Spawn the calculated number of enemies
-        for _ in range(enemies_to_spawn):
-            self.spawn_enemy()
+        # Queue the calculated number of enemies; they arrive over the next frames
+        self.spawn_director.request(enemies_to_spawn, ENEMY)
         
         # Spawn one elite enemy per wave
         if not self.elite_spawned:
-            self.spawn_elite_enemy()
+            self.spawn_director.request(1, ENEMY_ELITE)
             self.elite_spawned = True
             
         # Increase minimum enemies for next wave
@@ -1252,86 +2283,107 @@ class Game(BaseGame):
 
     def spawn_elite_enemy(self):
         """Spawn an elite enemy with higher stats"""
-        player = self.get_particle(PLAYER)
-        if not player:
-            return
-        angle = random.uniform(0, 2 * math.pi)
-        spawn_x = player.x + math.cos(angle) * SPAWN_DISTANCE
-        spawn_y = player.y + math.sin(angle) * SPAWN_DISTANCE
-        spawn_x = max(-ELITE_SIZE, min(SCREEN_WIDTH + ELITE_SIZE, spawn_x))
-        spawn_y = max(-ELITE_SIZE, min(SCREEN_HEIGHT + ELITE_SIZE, spawn_y))
-        elite_health = 30
-        elite_speed = random.randint(ENEMY_SPEED_MIN, ENEMY_SPEED_MAX) * ELITE_SPEED_MULTIPLIER
-        self.particles.append(
-            Particle(
-                ENEMY_ELITE,
-                spawn_x,
-                spawn_y,
-                attributes={
-                    "speed": elite_speed,
-                    "base_hp": elite_health,
-                    "max_hp": elite_health,
-                    "damage": 10,
-                    "id": self.next_id,
-                    "blink_timer": 0,
-                    "wave": self.current_wave,
-                    "xp_value": 30,
-                    "white_effect_timer": 0  # 初始化受伤变白效果计时器
-                }
-            )
-        )
-        self.next_id += 1
-        print(f"Spawned elite enemy for wave {self.current_wave} with {elite_health} HP")
-        
+        if self.spawn_enemies(1, ENEMY_ELITE):
+            print(f"Spawned elite enemy for wave {self.current_wave} with {ENEMY_KIND_STATS[ENEMY_ELITE]['health']} HP")
+
     def spawn_enemy(self):
-        if len(self.get_particles(ENEMY)) + len(self.get_particles(ENEMY_ELITE)) >= MAX_ENEMIES:
-            return
+        """Spawn one regular enemy right away"""
+        return self.spawn_enemies(1, ENEMY)
+
+    def spawn_enemies(self, count, kind=ENEMY):
+        """
+        Spawn up to count enemies of one kind around the player.
+
+        The angles and speeds of the whole batch are drawn in one call and
+        the positions computed together; the MAX_ENEMIES cap is checked
+        once for the batch, and enemies over it are not spawned.
+
+        Args:
+            count (int): Number of enemies to spawn.
+            kind (str): ENEMY or ENEMY_ELITE.
+
+        Returns:
+            int: Number of enemies spawned.
+        """
+        batch = self.plan_spawns([(kind, count)])
+        self.place_spawns(batch, spawn_positions(batch))
+        return len(batch.kind)
+
+    def plan_spawns(self, requests):
+        """
+        Draw the angles and speeds of a frame's spawns.
+
+        Args:
+            requests (iterable): (kind, count) pairs, as SpawnDirector.take
+                returns them.
+
+        Returns:
+            SpawnBatch: The enemies to spawn; requests over the MAX_ENEMIES
+            cap are dropped, and nothing spawns without a player.
+        """
         player = self.get_particle(PLAYER)
-        if not player:
-            return
-        angle = random.uniform(0, 2 * math.pi)
-        spawn_x = player.x + math.cos(angle) * SPAWN_DISTANCE
-        spawn_y = player.y + math.sin(angle) * SPAWN_DISTANCE
-        spawn_x = max(-ENEMY_SIZE, min(SCREEN_WIDTH + ENEMY_SIZE, spawn_x))
-        spawn_y = max(-ENEMY_SIZE, min(SCREEN_HEIGHT + ENEMY_SIZE, spawn_y))
-        enemy_health = 10
-        enemy_speed = random.randint(ENEMY_SPEED_MIN, ENEMY_SPEED_MAX)
-        self.particles.append(
-            Particle(
-                ENEMY,
-                spawn_x,
-                spawn_y,
-                attributes={
-                    "speed": enemy_speed,
-                    "base_hp": enemy_health,
-                    "max_hp": enemy_health,
-                    "damage": 5,
-                    "id": self.next_id,
-                    "blink_timer": 0,
-                    "wave": self.current_wave,
-                    "xp_value": 10,
-                    "white_effect_timer": 0  # 初始化受伤变白效果计时器
-                }
-            )
+        room = MAX_ENEMIES - self.count_particles(ENEMY, ENEMY_ELITE)
+        kinds = []
+        speeds = []
+        angles = []
+        for kind, count in requests:
+            count = min(count, room)
+            if count <= 0 or player is None:
+                continue
+            room -= count
+            multiplier = ENEMY_KIND_STATS[kind]["speed_multiplier"]
+            angles.append(self.spawn_rng.uniform(0, 2 * math.pi, count))
+            speeds += (self.spawn_rng.integers(ENEMY_SPEED_MIN, ENEMY_SPEED_MAX, size=count, endpoint=True) * multiplier).tolist()
+            kinds += [kind] * count
+        if not kinds:
+            return NO_SPAWNS
+        n = len(kinds)
+        return SpawnBatch(
+            kinds,
+            speeds,
+            np.concatenate(angles),
+            np.full(n, player.x, dtype=np.float64),
+            np.full(n, player.y, dtype=np.float64),
         )
-        self.next_id += 1
+
+    def place_spawns(self, batch, positions):
+        """Create the enemies of a SpawnBatch at the positions spawn_positions gave for it"""
+        for kind, x, y, speed in zip(batch.kind, *positions, batch.speed):
+            stats = ENEMY_KIND_STATS[kind]
+            self.add_particle(
+                self.new_particle(
+                    kind,
+                    x,
+                    y,
+                    attributes={
+                        "speed": speed,
+                        "base_hp": stats["health"],
+                        "max_hp": stats["health"],
+                        "damage": stats["damage"],
+                        "id": self.next_id,
+                        "blink_timer": 0,
+                        "wave": self.current_wave,
+                        "xp_value": stats["xp_value"],
+                        "white_effect_timer": 0  # 初始化受伤变白效果计时器
+                    }
+                )
+            )
+            self.next_id += 1
 
     def spawn_weapon(self, player_x, player_y, weapon_name, level, angle):
         # 禁止用spawn_weapon发射Knife，强制用spawn_straight_shot
         if weapon_name == "Knife":
             print("[DEBUG] 禁止用spawn_weapon发射Knife，请用spawn_straight_shot")
             return
-        w = next((w for w in WEAPON_TYPES if w["name"] == weapon_name), None)
-        if not w or level <= 0:
+        stats = weapon_stats(weapon_name, level)
+        if stats is None or level <= 0:
             return
-        damage = w["base_damage"] + sum(u.get("damage", 0) for u in w["upgrade_table"][:max(0,level-1)])
-        if damage <= 0:
-            damage = 1
+        damage = stats.damage
         distance = 50
         x = int(player_x + distance * math.cos(math.radians(angle)))
         y = int(player_y + distance * math.sin(math.radians(angle)))
-        shape = w.get("shape", "circle")
-        size = w["size"]
+        shape = stats.shape
+        size = stats.size
         special_attrs = {}
         if shape == "rectangle":
             special_attrs["width"] = size * 3
@@ -1351,8 +2403,8 @@ class Game(BaseGame):
             rad = math.radians(angle)
             attributes["vx"] = math.cos(rad) * WEAPON_SPEED
             attributes["vy"] = math.sin(rad) * WEAPON_SPEED
-        self.particles.append(
-            Particle(
+        self.add_particle(
+            self.new_particle(
                 WEAPON,
                 x,
                 y,
@@ -1361,34 +2413,84 @@ class Game(BaseGame):
         )
         self.next_id += 1
 
-    def spawn_xp(self, x, y):
-        self.particles.append(
-            Particle(
+    def spawn_xp(self, x, y, value=XP_GEM_VALUE):
+        self.add_particle(
+            self.new_particle(
                 XP,
                 int(x),
                 int(y),
                 attributes={
                     "id": self.next_id,
                     "speed": 0,  # Initial speed is 0
-                    "moving_to_player": False  # Flag to track if XP is moving to player
+                    "moving_to_player": False,  # Flag to track if XP is moving to player
+                    "value": value,  # 拾取时获得的经验值，合并后是所有被合并宝石之和
                 }
             )
         )
         self.next_id += 1
 
+    def merge_xp(self):
+        """
+        Collapse clusters of XP gems into single gems carrying their summed value.
+
+        Gems are binned into square cells of XP_MERGE_RADIUS; every cell
+        holding XP_MERGE_DENSITY gems or more becomes one gem at the
+        value-weighted centre of the cell's gems. When there are more than
+        XP_MAX_GEMS gems, every cell with two or more gems merges, and the
+        cells double in size until the count is under the cap. Gems already
+        flying to the player are left alone. Total XP on the field never
+        changes.
+
+        Returns:
+            int: Number of gems removed.
+        """
+        gems = [xp for xp in self.particles_by_kind.get(XP, ()) if not xp.attributes.moving_to_player]
+        n = len(gems)
+        if n < 2:
+            return 0
+        x = np.fromiter((xp.x for xp in gems), dtype=np.float64, count=n)
+        y = np.fromiter((xp.y for xp in gems), dtype=np.float64, count=n)
+        value = np.fromiter((xp.attributes.value or XP_GEM_VALUE for xp in gems), dtype=np.float64, count=n)
+        excess = self.count_particles(XP) - XP_MAX_GEMS
+        cell_size = XP_MERGE_RADIUS
+        threshold = 2 if excess > 0 else XP_MERGE_DENSITY
+        while True:
+            cells = np.stack([np.floor(x / cell_size), np.floor(y / cell_size)], axis=1)
+            _, cell, counts = np.unique(cells, axis=0, return_inverse=True, return_counts=True)
+            cell = cell.ravel()
+            merging = counts[cell] >= threshold
+            removed = int(np.sum(counts[counts >= threshold] - 1))
+            if excess <= 0 or removed >= excess or cell_size >= max(WORLD_WIDTH, WORLD_HEIGHT):
+                break
+            cell_size *= 2
+        if not merging.any():
+            return 0
+
+        # 每个格子保留第一颗宝石，位置取按价值加权的中心
+        total = np.bincount(cell, value)
+        center_x = np.bincount(cell, value * x) / total
+        center_y = np.bincount(cell, value * y) / total
+        keeper = {}
+        for i in np.flatnonzero(merging).tolist():
+            c = int(cell[i])
+            xp = gems[i]
+            if c not in keeper:
+                keeper[c] = xp
+                xp.x = int(center_x[c])
+                xp.y = int(center_y[c])
+                xp.attributes.value = int(total[c])
+            else:
+                self.remove_particle(xp)
+        return removed
+
     def spawn_homing_missile(self, player, weapon_name, level):
         enemies = self.get_particles(ENEMY) + self.get_particles(ENEMY_ELITE)
         if not enemies:
             return
-        weapon_type = next((w for w in WEAPON_TYPES if w["name"] == weapon_name), None)
-        base_amount = weapon_type["amount"] if weapon_type else 1
-        amount = base_amount + sum(u.get("amount", 0) for u in weapon_type["upgrade_table"][:max(0,level-1)])
-        if amount < 1:
-            amount = 1
-        base_pierce = weapon_type["pierce"] if weapon_type else 0
-        pierce = base_pierce + sum(u.get("pierce", 0) for u in weapon_type["upgrade_table"][:max(0,level-1)])
-        pierce_count = pierce + 1
-        base_speed = 10 * 0.6
+        stats = weapon_stats(weapon_name, level)
+        amount = stats.amount
+        pierce_count = stats.pierce
+        base_speed = stats.speed
         used_targets = set()
         for i in range(amount):
             available_enemies = [e for e in enemies if e.attributes["id"] not in used_targets]
@@ -1397,17 +2499,17 @@ class Game(BaseGame):
                 used_targets.add(nearest.attributes["id"])
                 angle = math.degrees(math.atan2(nearest.y - player.y, nearest.x - player.x))
             else:
-                angle = random.uniform(0, 360)
+                angle = self.weapon_rng.uniform(0, 360)
             rad = math.radians(angle)
             vx = math.cos(rad) * base_speed
             vy = math.sin(rad) * base_speed
-            self.particles.append(
-                Particle(
+            self.add_particle(
+                self.new_particle(
                     WEAPON,
                     player.x,
                     player.y,
                     attributes={
-                        "damage": 8 + 2 * (level-1),
+                        "damage": stats.damage,
                         "speed": base_speed,
                         "angle": angle,
                         "id": self.next_id,
@@ -1425,15 +2527,12 @@ class Game(BaseGame):
         if level <= 0:
             return
         # 1. 计算伤害和穿透力
-        knife_damage_table = [10, 10, 15, 15, 15, 15, 20, 20]
-        knife_pierce_table = [0, 0, 0, 0, 1, 1, 1, 2]
-        knife_amount_table = [1, 2, 3, 4, 4, 5, 6, 6]
-        idx = min(level, 8) - 1
-        damage = knife_damage_table[idx]
-        pierce = knife_pierce_table[idx]
+        stats = weapon_stats(weapon_name, level)
+        damage = stats.damage
+        pierce = stats.pierce
         # 如果没有指定amount，使用等级表中的值
         if amount is None:
-            amount = knife_amount_table[idx]
+            amount = stats.amount
         # 2. 计算发射角度
         if angle is None:
             if self.last_move_dir[0] == 0 and self.last_move_dir[1] == 0:
@@ -1452,16 +2551,16 @@ class Game(BaseGame):
         for i in range(amount):
             shot_angle = base_angle + i * angle_step
             rad = math.radians(shot_angle)
-            vx = math.cos(rad) * 14
-            vy = math.sin(rad) * 14
+            vx = math.cos(rad) * stats.speed
+            vy = math.sin(rad) * stats.speed
             # 创建粒子
-            particle = Particle(
+            particle = self.new_particle(
                 WEAPON,
                 player.x,
                 player.y,
                 attributes={
                     "damage": damage,
-                    "speed": 14,
+                    "speed": stats.speed,
                     "angle": shot_angle,
                     "id": self.next_id,
                     "weapon_name": weapon_name,
@@ -1469,18 +2568,11 @@ class Game(BaseGame):
                     "vx": vx,
                     "vy": vy,
                     "shape": "triangle",
-                    "pierce_count": pierce,
-                    "main_color": "#FFFFFF",  # 固定为白色主体
-                    "border_color": "#8B4513",  # 固定为褐色描边
-                    "is_knife": True,  # 标记为飞刀，防止其他逻辑修改颜色
-                    "color_locked": True,  # 添加颜色锁定标记
-                    "original_main_color": "#FFFFFF",  # 保存原始颜色
-                    "original_border_color": "#8B4513",  # 保存原始颜色
-                    "shape_color": "#FFFFFF"  # 设置shape_color为主体色
+                    "pierce_count": pierce
                 }
             )
-            print(f"[DEBUG] 创建飞刀粒子 ID:{self.next_id} 颜色:{particle.attributes.get('main_color')}")
-            self.particles.append(particle)
+            print(f"[DEBUG] 创建飞刀粒子 ID:{self.next_id}")
+            self.add_particle(particle)
             self.next_id += 1
 
     def spawn_arc_throw(self, player, weapon_name, level, i, count):
@@ -1509,8 +2601,9 @@ class Game(BaseGame):
         angle = base_angle - 15 + (30 // max(1, count-1)) * i if count > 1 else base_angle
         
         # 基础速度和伤害（参考附件数值）
-        base_speed = 8  # 基础速度
-        damage = 20 if level == 1 else (40 if level <= 4 else (60 if level <= 7 else 80))
+        stats = weapon_stats(weapon_name, level)
+        base_speed = stats.speed
+        damage = stats.damage
             
         # 转换角度为弧度
         rad = math.radians(angle)
@@ -1519,14 +2612,13 @@ class Game(BaseGame):
         vy = -8  # 固定向上的初速度
         
         # 获取武器类型和形状
-        weapon_type = next((w for w in WEAPON_TYPES if w["name"] == weapon_name), None)
-        shape = weapon_type.get("shape", "cross") if weapon_type else "cross"
-        size = weapon_type["size"] if weapon_type else WEAPON_SIZE
+        shape = stats.shape
+        size = stats.size
         
         print(f"[DEBUG] Spawning Axe at ({player.x}, {player.y}) with vx={vx:.1f}, vy={vy:.1f}, angle={angle}")
         
         # 创建武器粒子
-        particle = Particle(
+        particle = self.new_particle(
             WEAPON,
             player.x,
             player.y,
@@ -1547,7 +2639,7 @@ class Game(BaseGame):
             }
         )
         print(f"[DEBUG] Created Axe particle with ID {self.next_id}")
-        self.particles.append(particle)
+        self.add_particle(particle)
         self.next_id += 1
 
     def spawn_boomerang(self, player, weapon_name, level, angle=None):
@@ -1570,30 +2662,16 @@ class Game(BaseGame):
             else:
                 angle = 0
 
-        # 根据等级获取属性
-        base_damage = 10
-        if level >= 2:
-            base_damage = 20
-        if level >= 5:
-            base_damage = 30
-        if level >= 8:
-            base_damage = 40
-
-        # 计算速度倍率
-        speed_multiplier = 1.0
-        if level >= 3:
-            speed_multiplier = 1.25
-        if level >= 6:
-            speed_multiplier = 1.5
-
-        # 基础速度
-        base_speed = 8 * speed_multiplier
+        # 根据等级获取属性（速度随等级提升）
+        stats = weapon_stats(weapon_name, level)
+        base_damage = stats.damage
+        base_speed = stats.speed
 
         rad = math.radians(angle)
         
         # 创建武器粒子
-        self.particles.append(
-            Particle(
+        self.add_particle(
+            self.new_particle(
                 WEAPON,
                 player.x,
                 player.y,
@@ -1613,9 +2691,9 @@ class Game(BaseGame):
                     "original_speed": base_speed,
                     "has_hit": False,  # 是否已击中敌人
                     "is_returning": False,  # 是否在返回
-                    "pierce_count": 999,  # 无限穿透
+                    "pierce_count": stats.pierce,  # 无限穿透
                     "duration": 300,  # 5秒持续时间
-                    "self_rotation": random.uniform(0, 360),  # 随机初始角度
+                    "self_rotation": self.weapon_rng.uniform(0, 360),  # 随机初始角度
                     "rotation_speed": 24  # 每帧旋转24度
                 }
             )
@@ -1626,36 +2704,32 @@ class Game(BaseGame):
     def spawn_orbiting_book(self, player, weapon_name, level, i, count):
         if level <= 0:
             return
-        lvl = min(level, len(KING_BIBLE_LEVELS)) - 1
-        props = KING_BIBLE_LEVELS[lvl]
-        damage = self.get_kingbible_damage(level)
-        base_radius = 60
-        radius = base_radius * props["area"]
-        amount = max(1, props["amount"])
+        stats = weapon_stats(weapon_name, level)
+        damage = stats.damage
+        radius = KING_BIBLE_BASE_RADIUS * stats.area
+        amount = stats.amount
         if i == 0:
             weapons_to_remove = []
-            for weapon in self.get_particles(WEAPON):
-                if (weapon.attributes.get("weapon_name") == "KingBible" and 
-                    weapon.attributes.get("target_player_id") == player.attributes.get("id")):
+            for weapon in self.weapon_systems["orbit"]:
+                if (weapon.attributes.weapon_name == "KingBible" and 
+                    weapon.attributes.target_player_id == player.attributes.get("id")):
                     weapons_to_remove.append(weapon)
             for weapon in weapons_to_remove:
-                if weapon in self.particles:
-                    self.remove_particle(weapon)
+                self.remove_particle(weapon)
         angle = (360 // amount) * i if amount > 1 else 0
         pos_x = player.x + radius * math.cos(math.radians(angle))
         pos_y = player.y + radius * math.sin(math.radians(angle))
         
-        # 获取武器类型和形状
-        weapon_type = next((w for w in WEAPON_TYPES if w["name"] == weapon_name), None)
-        shape = weapon_type.get("shape", "circle") if weapon_type else "circle"
+        # 获取武器形状
+        shape = stats.shape
         
-        weapon = Particle(
+        weapon = self.new_particle(
             WEAPON,
             pos_x,
             pos_y,
             attributes={
                 "damage": damage,
-                "speed": props["speed"],
+                "speed": stats.speed,
                 "angle": angle,
                 "id": self.next_id,
                 "weapon_name": weapon_name,
@@ -1664,14 +2738,14 @@ class Game(BaseGame):
                 "orbit_angle": angle,
                 "duration": int(4.0 * 60),  # 4秒持续时间
                 "total_duration": int(4.0 * 60),  # 保存总持续时间
-                "original_size": weapon_type["size"],  # 保存原始尺寸
-                "current_size": weapon_type["size"],  # 当前尺寸（用于淡出动画）
+                "original_size": stats.size,  # 保存原始尺寸
+                "current_size": stats.size,  # 当前尺寸（用于淡出动画）
                 "target_player_id": player.attributes["id"],
                 "hit_cooldown": {},
                 "shape": shape
             }
         )
-        self.particles.append(weapon)
+        self.add_particle(weapon)
         self.next_id += 1
         return weapon
 
@@ -1681,17 +2755,15 @@ class Game(BaseGame):
         spread = 60
         base_angle = -spread//2 + (spread//max(1, count-1))*i if count > 1 else 0
         print(f"生成扇形武器 {weapon_name} (level {level}, 角度 {base_angle})")
-        damage = 15 + 3 * (level-1)
-        if damage <= 0:
-            damage = 1
-        self.particles.append(
-            Particle(
+        stats = weapon_stats(weapon_name, level)
+        self.add_particle(
+            self.new_particle(
                 WEAPON,
                 player.x,
                 player.y,
                 attributes={
-                    "damage": damage,
-                    "speed": 11,
+                    "damage": stats.damage,
+                    "speed": stats.speed,
                     "angle": base_angle,
                     "id": self.next_id,
                     "weapon_name": weapon_name,
@@ -1708,52 +2780,29 @@ class Game(BaseGame):
         if level <= 0:
             return
             
-        # Get weapon configuration
-        weapon_type = next((w for w in WEAPON_TYPES if w["name"] == weapon_name), None)
-        if not weapon_type:
+        # Get precompiled stats for this level
+        stats = weapon_stats(weapon_name, level)
+        if stats is None:
             return
-            
-        # Calculate base damage and area
-        base_damage = weapon_type["base_damage"]
-        base_size = weapon_type["size"]  # Base size for aura
-        
-        # Calculate level-based stats
-        damage = base_damage
-        area_multiplier = 1.0  # Start with base multiplier (100%)
-        pool_limit = weapon_type["pool_limit"]
-        
-        # Apply upgrades based on level
-        print(f"[DEBUG] Garlic Level {level} - Processing upgrades:")
-        upgrades_to_process = min(level - 1, len(weapon_type["upgrade_table"]))  # Make sure we don't exceed the upgrade table
-        for i in range(upgrades_to_process):
-            upgrade = weapon_type["upgrade_table"][i]
-            print(f"[DEBUG] Processing upgrade {i+1}: {upgrade}")
-            if "damage" in upgrade:
-                damage += upgrade["damage"]
-            if "area" in upgrade:
-                old_multiplier = area_multiplier
-                area_multiplier += upgrade["area"]  # Add area upgrade multipliers (20% = 0.2)
-                print(f"[DEBUG] Area multiplier updated: {old_multiplier} -> {area_multiplier}")
-            if "pool_limit" in upgrade:
-                if upgrade["pool_limit"] == -1:
-                    pool_limit = -1  # Unlimited targets
-                else:
-                    pool_limit += upgrade["pool_limit"]
+        damage = stats.damage
+        base_size = stats.size  # Base size for aura
+        area_multiplier = stats.area
+        pool_limit = stats.pool_limit
         
         # Calculate final aura radius with area multiplier
-        aura_radius = base_size * area_multiplier
+        aura_radius = stats.collision_size
         print(f"[DEBUG] Final Garlic stats - Base Size: {base_size}, Area Multiplier: {area_multiplier}, Final Radius: {aura_radius}")
         
         # Remove existing Garlic auras for this player
-        existing_garlic = [w for w in self.get_particles(WEAPON) 
-                          if w.attributes.get("weapon_name") == "Garlic" and 
-                          w.attributes.get("target_player_id") == player.attributes["id"]]
+        existing_garlic = [w for w in self.weapon_systems["aura"] 
+                          if w.attributes.weapon_name == "Garlic" and 
+                          w.attributes.target_player_id == player.attributes["id"]]
         for old_garlic in existing_garlic:
             self.remove_particle(old_garlic)
         
         # Create the aura particle
-        self.particles.append(
-            Particle(
+        self.add_particle(
+            self.new_particle(
                 WEAPON,
                 player.x,
                 player.y,
@@ -1768,14 +2817,13 @@ class Game(BaseGame):
                     "area_multiplier": area_multiplier,  # Store area multiplier
                     "aura_radius": aura_radius,  # Use the scaled radius
                     "pool_limit": pool_limit,
-                    "hit_cooldown": {},  # Dictionary to track per-enemy hit cooldowns
-                    "duration": weapon_type["cooldown"],  # Duration until next damage tick
-                    "knockback": weapon_type["knockback"],
+                    "duration": stats.cooldown,  # Duration until next damage tick
+                    "knockback": stats.knockback,
                     "affected_enemies": set(),  # Track currently affected enemies
                     "target_player_id": player.attributes["id"],  # Link to player
-                    "shape": weapon_type["shape"],
+                    "shape": stats.shape,
                     "is_aura": True,  # Flag to identify as an aura effect
-                    "cooldown": weapon_type["cooldown"],  # Store original cooldown value
+                    "cooldown": stats.cooldown,  # Store original cooldown value
                     "breath_timer": 0  # 添加呼吸效果计时器
                 }
             )
@@ -1787,11 +2835,9 @@ class Game(BaseGame):
         if level <= 0:
             return
         angle = 0
-        damage = 10 + 3 * (level-1)
-        if damage <= 0:
-            damage = 1
-        self.particles.append(
-            Particle(
+        damage = weapon_stats(weapon_name, level).damage
+        self.add_particle(
+            self.new_particle(
                 WEAPON,
                 player.x,
                 player.y,
@@ -1809,6 +2855,30 @@ class Game(BaseGame):
         self.next_id += 1
 
     def step(self, actions=None):
+        """Advance the game by one frame"""
+        phases = self.step_phases(actions)
+        try:
+            request = next(phases)
+            while True:
+                request = phases.send(run_phase(request))
+        except StopIteration:
+            pass
+
+    def step_phases(self, actions=None):
+        """
+        Generator form of step, for stepping several games in lockstep.
+
+        Yields the frame's array work instead of doing it, in this order
+        (see run_phase for the answer each one expects): a SpawnBatch, an
+        EnemyBatch, a ContactBatch, two HitBatches and an EnemySeparation. Every
+        phase is yielded each frame, even when empty, so games stay in step.
+        A game that is not playing, or ends mid-frame, stops early.
+        """
+        yield from self._update_frame(actions)
+        # 帧末统一压缩被删除的粒子（O(删除数)）
+        self.flush_removals()
+
+    def _update_frame(self, actions=None):
         # Process input first
         # Note: This is now handled in run.py, so we don't process input here
         # actions = self.handle_input(actions)
@@ -1831,8 +2901,8 @@ class Game(BaseGame):
         # 每900帧（15秒）输出一次游戏状态（进一步减少日志）
         if self.game_timer % 900 == 0:
             weapons = player.attributes.get("weapons", {})
-            weapon_count = len(self.get_particles(WEAPON))
-            enemy_count = len(self.get_particles(ENEMY)) + len(self.get_particles(ENEMY_ELITE))
+            weapon_count = self.count_particles(WEAPON)
+            enemy_count = self.count_particles(ENEMY, ENEMY_ELITE)
             print(f"游戏状态 - 时间: {self.format_time(self.game_timer)}, 敌人数: {enemy_count}, 武器数: {weapon_count}")
             
         # Update wave timer
@@ -1841,20 +2911,22 @@ class Game(BaseGame):
             print(f"生成新一波敌人 - 波次: {self.current_wave + 1}")
             self.spawn_enemy_wave()
             
-        # Handle enemy spawning within wave if below minimum
-        current_enemies = len(self.get_particles(ENEMY)) + len(self.get_particles(ENEMY_ELITE))
+        # Handle enemy spawning within wave if below minimum (queued enemies count as present)
+        current_enemies = self.count_particles(ENEMY, ENEMY_ELITE) + self.spawn_director.pending()
         if current_enemies < self.min_enemies_per_wave and current_enemies < MAX_ENEMIES:
             # 快速补充到最小敌人数
-            for _ in range(self.min_enemies_per_wave - current_enemies):
-                if len(self.get_particles(ENEMY)) + len(self.get_particles(ENEMY_ELITE)) < MAX_ENEMIES:
-                    self.spawn_enemy()
+            self.spawn_director.request(min(self.min_enemies_per_wave, MAX_ENEMIES) - current_enemies, ENEMY)
             if self.next_spawn_timer <= 0:
-                self.spawn_enemy()
+                self.spawn_director.request(1, ENEMY)
                 # Set timer for next spawn (faster spawn rate: 0.5-1 second)
-                self.next_spawn_timer = random.randint(30, 60)
+                self.next_spawn_timer = int(self.spawn_rng.integers(30, 60, endpoint=True))
             else:
                 self.next_spawn_timer -= 1
 
+        # 按每帧预算生成排队的敌人；出生位置由step（或VecGame，把多局游戏合并）批量计算
+        spawns = self.plan_spawns(self.spawn_director.take())
+        self.place_spawns(spawns, (yield spawns))
+
         # Process player movement
         if actions:
             dx = 0
@@ -1871,12 +2943,13 @@ class Game(BaseGame):
             if dx != 0 and dy != 0:
                 dx *= 0.7071
                 dy *= 0.7071
-            player.x = int(max(PLAYER_SIZE // 2, min(SCREEN_WIDTH - PLAYER_SIZE // 2, player.x + dx)))
-            player.y = int(max(PLAYER_SIZE // 2, min(SCREEN_HEIGHT - PLAYER_SIZE // 2, player.y + dy)))
+            player.x = int(max(PLAYER_SIZE // 2, min(WORLD_WIDTH - PLAYER_SIZE // 2, player.x + dx)))
+            player.y = int(max(PLAYER_SIZE // 2, min(WORLD_HEIGHT - PLAYER_SIZE // 2, player.y + dy)))
             # 记录移动方向
             if dx != 0 or dy != 0:
                 norm = math.sqrt(dx*dx + dy*dy)
                 self.last_move_dir = (dx/norm, dy/norm)
+        self.update_camera()
 
         # Update animation timers
         if self.hp_transition_timer > 0:
@@ -1906,7 +2979,7 @@ class Game(BaseGame):
         # Update enemy blink timers and knockback effects
         for enemy_type in [ENEMY, ENEMY_ELITE]:
             for enemy in self.get_particles(enemy_type):
-                if enemy.attributes.get("is_dying"):
+                if enemy.attributes.is_dying:
                     continue  # 死亡动画期间不移动不受击退
                 if "blink_timer" in enemy.attributes and enemy.attributes["blink_timer"] > 0:
                     enemy.attributes["blink_timer"] -= 1
@@ -1918,50 +2991,11 @@ class Game(BaseGame):
                         knockback_force = knockback_remaining * knockback_remaining
                         enemy.x += enemy.attributes["knockback_dx"] * knockback_force * KNOCKBACK_DISTANCE
                         enemy.y += enemy.attributes["knockback_dy"] * knockback_force * KNOCKBACK_DISTANCE
-                        enemy.x = max(0, min(SCREEN_WIDTH, enemy.x))
-                        enemy.y = max(0, min(SCREEN_HEIGHT, enemy.y))
-        
-        # Update and process damage text particles
-        damage_texts_to_remove = []
-        for particle in self.get_particles(DAMAGE_TEXT):
-            if "timer" in particle.attributes:
-                particle.attributes["timer"] -= 1
-                if particle.attributes["timer"] <= 0:
-                    damage_texts_to_remove.append(particle)
-                else:
-                    # Move the text upward as it fades
-                    progress = 1 - (particle.attributes["timer"] / DAMAGE_TEXT_DURATION)
-                    particle.y -= DAMAGE_TEXT_RISE / DAMAGE_TEXT_DURATION
-                    
-                    # Make it fade out by adjusting alpha
-                    # 在最后0.3秒开始淡出
-                    fade_start = 0.7  # 0.7秒后开始淡出
-                    if progress > fade_start:
-                        fade_progress = (progress - fade_start) / (1 - fade_start)
-                        alpha = int(255 * (1 - fade_progress))
-                    else:
-                        alpha = 255
-                    particle.attributes["alpha"] = alpha
-
-                    # 处理尺寸动画
-                    if particle.attributes["scale_phase"] == "grow":
-                        # 在前0.2秒内从50%变到100%
-                        grow_duration = DAMAGE_TEXT_DURATION / 5  # 0.2秒
-                        grow_progress = min(1.0, (DAMAGE_TEXT_DURATION - particle.attributes["timer"]) / grow_duration)
-                        particle.attributes["scale"] = 0.5 + (0.5 * grow_progress)
-                        if grow_progress >= 1.0:
-                            particle.attributes["scale_phase"] = "shrink"
-                    else:  # shrink phase
-                        # 在0.2秒后的0.5秒内从100%变回50%
-                        shrink_start = DAMAGE_TEXT_DURATION / 5  # 0.2秒
-                        shrink_duration = DAMAGE_TEXT_DURATION / 1  # 0.5秒
-                        shrink_progress = ((DAMAGE_TEXT_DURATION - particle.attributes["timer"]) - shrink_start) / shrink_duration
-                        shrink_progress = min(1.0, max(0.0, shrink_progress))
-                        particle.attributes["scale"] = 1.0 - (0.5 * shrink_progress)
-
-        # Remove expired damage texts
-        for text in damage_texts_to_remove:
-            self.remove_particle(text)
+                        enemy.x = max(0, min(WORLD_WIDTH, enemy.x))
+                        enemy.y = max(0, min(WORLD_HEIGHT, enemy.y))
+        
+        # Update cosmetic effects (blood, damage numbers)
+        self.effects.update()
 
         # Automatic weapon spawning with cooldown
         weapons = player.attributes.get("weapons", {})
@@ -1969,16 +3003,14 @@ class Game(BaseGame):
             name = w["name"]
             level = weapons.get(name, 0)
             if level > 0:
+                stats = weapon_stats(name, level)
                 cooldown_key = f"{name}_cooldown"
                 current_cooldown = player.attributes.get(cooldown_key, 0)
                 # 飞刀特殊处理
                 if name == "Knife":
                     # 飞刀等级表
-                    knife_amount_table = [1, 2, 3, 4, 4, 5, 6, 6]
-                    knife_interval_table = [6, 6, 6, 5, 5, 4, 3, 2]  # 间隔帧数（0.1s~0.04s）
-                    idx = min(level, 8) - 1
-                    amount = knife_amount_table[idx]
-                    interval = knife_interval_table[idx]
+                    amount = stats.amount
+                    interval = stats.interval
                     # 发射序列状态
                     if "knife_shot_seq" not in player.attributes:
                         player.attributes["knife_shot_seq"] = None
@@ -1992,7 +3024,7 @@ class Game(BaseGame):
                             "shots_left": amount,
                             "base_angle": None  # 记录本轮齐射基准角度
                         }
-                        player.attributes[cooldown_key] = 60  # 1秒冷却
+                        player.attributes[cooldown_key] = stats.cooldown  # 1秒冷却
                         continue
                     # 处理发射序列
                     if seq is not None:
@@ -2016,7 +3048,7 @@ class Game(BaseGame):
                                 else:
                                     shot_angle = base_angle
                                 # 加入随机扰动
-                                shot_angle += random.uniform(-2, 2)
+                                shot_angle += self.weapon_rng.uniform(-2, 2)
                                 # 发射单个飞刀
                                 self.spawn_straight_shot(player, name, level, angle=shot_angle, amount=1)
                                 seq["shots_left"] -= 1
@@ -2035,41 +3067,30 @@ class Game(BaseGame):
                     # 根据武器类型调用不同的生成函数
                     if name == "MagicWand":
                         self.spawn_homing_missile(player, name, level)
-                        player.attributes[cooldown_key] = w["cooldown"]
+                        player.attributes[cooldown_key] = stats.cooldown
                     elif name == "KingBible":
-                        # 获取武器类型配置
-                        weapon_type = next((w for w in WEAPON_TYPES if w["name"] == name), None)
-                        if not weapon_type:
-                            continue
-                            
                         # 检查是否已经有圣经在场上
-                        existing_bibles = [w for w in self.get_particles(WEAPON) 
-                                         if w.attributes.get("weapon_name") == "KingBible" and 
-                                         w.attributes.get("target_player_id") == player.attributes["id"]]
+                        existing_bibles = [w for w in self.weapon_systems["orbit"] 
+                                         if w.attributes.weapon_name == "KingBible" and 
+                                         w.attributes.target_player_id == player.attributes["id"]]
                         
                         # 如果没有圣经在场上，且冷却时间结束，则生成新的
                         if not existing_bibles and current_cooldown <= 0:
                             # 获取当前等级的属性
-                            lvl = min(level, len(KING_BIBLE_LEVELS)) - 1
-                            props = KING_BIBLE_LEVELS[lvl]
-                            amount = max(1, props["amount"])
+                            amount = stats.amount
                             for i in range(amount):
                                 self.spawn_orbiting_book(player, name, level, i, amount)
                             # 不在这里设置冷却时间，而是在粒子消失时设置
                             print("圣经粒子生成完成")
                     elif name == "FireWand":
                         # 获取当前等级的属性
-                        amount = 1 + sum(u.get("count", 0) for u in w["upgrade_table"][:max(0,level-1)])
+                        amount = stats.amount
                         for i in range(amount):
                             self.spawn_fan_shot(player, name, level, i, amount)
-                        player.attributes[cooldown_key] = w["cooldown"]
+                        player.attributes[cooldown_key] = stats.cooldown
                     elif name == "Cross":
                         # 获取当前等级的属性
-                        amount = 1
-                        if level >= 4:
-                            amount = 2
-                        if level >= 7:
-                            amount = 3
+                        amount = stats.amount
                             
                         # 发射序列状态
                         if "cross_shot_seq" not in player.attributes:
@@ -2080,12 +3101,12 @@ class Game(BaseGame):
                             # 冷却到0，初始化发射序列
                             player.attributes["cross_shot_seq"] = {
                                 "amount": amount,
-                                "interval": 6,  # 0.1秒间隔（6帧）
+                                "interval": stats.interval,  # 0.1秒间隔（6帧）
                                 "next_shot": 0,
                                 "shots_left": amount,
                                 "base_angle": None  # 记录本轮齐射基准角度
                             }
-                            player.attributes[cooldown_key] = w["cooldown"]  # 设置总冷却时间
+                            player.attributes[cooldown_key] = stats.cooldown  # 设置总冷却时间
                             continue
                             
                         # 处理发射序列
@@ -2108,7 +3129,7 @@ class Game(BaseGame):
                                     if nearest_enemy:
                                         angle = math.degrees(math.atan2(nearest_enemy.y - player.y, nearest_enemy.x - player.x))
                                     else:
-                                        angle = random.uniform(0, 360)  # 如果没有敌人，随机方向
+                                        angle = self.weapon_rng.uniform(0, 360)  # 如果没有敌人，随机方向
                                         
                                     # 发射单个十字架
                                     self.spawn_boomerang(player, name, level, angle)
@@ -2125,519 +3146,74 @@ class Game(BaseGame):
                         continue
                     elif name == "Garlic":
                         # Check if we need to create or recreate the Garlic aura
-                        existing_garlic = next((w for w in self.get_particles(WEAPON) 
-                                              if w.attributes.get("weapon_name") == "Garlic" and 
-                                              w.attributes.get("target_player_id") == player.attributes["id"]), None)
+                        existing_garlic = next((w for w in self.weapon_systems["aura"] 
+                                              if w.attributes.weapon_name == "Garlic" and 
+                                              w.attributes.target_player_id == player.attributes["id"]), None)
                         if not existing_garlic:
                             self.spawn_aura(player, name, level)
-                            player.attributes[cooldown_key] = w["cooldown"]
+                            player.attributes[cooldown_key] = stats.cooldown
                     elif name == "Whip":
                         self.spawn_whip(player, name, level)
-                        player.attributes[cooldown_key] = w["cooldown"]
+                        player.attributes[cooldown_key] = stats.cooldown
                     elif name == "Axe":
-                        amount = 1 + sum(u.get("count", 0) for u in w["upgrade_table"][:max(0,level-1)])
+                        amount = stats.amount
                         for i in range(amount):
                             self.spawn_arc_throw(player, name, level, i, amount)
-                        player.attributes[cooldown_key] = w["cooldown"]
+                        player.attributes[cooldown_key] = stats.cooldown
                 # 冷却递减
                 if current_cooldown > 0:
                     player.attributes[cooldown_key] -= 1
                 continue
         # ... existing code ...
 
-        # Move and update weapons
+        # 各武器行为系统只遍历自己的投射物，每帧一次
         weapons_to_remove = []
-        for weapon in self.get_particles(WEAPON):
-            wname = weapon.attributes.get("weapon_name", "")
-            
-            # Handle Garlic aura damage
-            if wname == "Garlic" and weapon.attributes.get("is_aura"):
-                # Update weapon position to follow player
-                target_player = next((p for p in self.get_particles(PLAYER) if p.attributes["id"] == weapon.attributes["target_player_id"]), None)
-                if target_player:
-                    weapon.x = target_player.x
-                    weapon.y = target_player.y
-                
-                # Process duration and cooldown
-                weapon.attributes["duration"] -= 1
-                if weapon.attributes["duration"] <= 0:
-                    # Reset duration using stored cooldown
-                    weapon.attributes["duration"] = weapon.attributes.get("cooldown", 78)  # Default to 78 if not stored
-                    # Clear hit cooldowns when the aura refreshes
-                    weapon.attributes["hit_cooldown"] = {}
-                    
-                    # Check for enemies in range
-                    radius = weapon.attributes.get("aura_radius")  # Use the radius we calculated in spawn_aura
-                    print(f"[DEBUG] Garlic aura damage tick - Radius: {radius}, Level: {weapon.attributes.get('level')}")
-                    
-                    for enemy_type in [ENEMY, ENEMY_ELITE]:
-                        for enemy in self.get_particles(enemy_type):
-                            if enemy.attributes.get("is_dying"):
-                                continue
-                            
-                            # Calculate distance to enemy
-                            dx = enemy.x - weapon.x
-                            dy = enemy.y - weapon.y
-                            dist = math.sqrt(dx * dx + dy * dy)
-                            
-                            # If enemy is in range
-                            if dist <= radius:
-                                enemy_id = enemy.attributes.get("id", -1)
-                                hit_cooldown = weapon.attributes.get("hit_cooldown", {})
-                                
-                                # Check if we can damage this enemy
-                                if enemy_id not in hit_cooldown or hit_cooldown[enemy_id] <= 0:
-                                    # Apply damage and knockback
-                                    damage = weapon.attributes.get("damage", 5)
-                                    self.apply_damage(weapon, enemy, damage)
-                        
-                                    # Apply knockback
-                                    knockback = weapon.attributes.get("knockback", 0)
-                                    if knockback > 0 and dist > 0:
-                                        # Calculate knockback direction (away from aura center)
-                                        kdx = dx / dist
-                                        kdy = dy / dist
-                                        enemy.attributes["knockback_dx"] = kdx
-                                        enemy.attributes["knockback_dy"] = kdy
-                                        enemy.attributes["knockback_timer"] = 5  # 5 frames of knockback
-                                    
-                                    # Set cooldown for this enemy (1.3s = 78 frames at 60fps)
-                                    hit_cooldown[enemy_id] = 78
-                                
-                                # Update the hit cooldown dictionary
-                                weapon.attributes["hit_cooldown"] = hit_cooldown
-                continue
-            
-            # Handle other weapons
-            if wname == "Knife" and "vx" in weapon.attributes and "vy" in weapon.attributes:
-                # 保护武器颜色
-                self.protect_weapon_colors(weapon)
-                weapon.x += weapon.attributes["vx"]
-                weapon.y += weapon.attributes["vy"]
-                if (weapon.x < -WEAPON_SIZE or weapon.x > SCREEN_WIDTH + WEAPON_SIZE or
-                    weapon.y < -WEAPON_SIZE or weapon.y > SCREEN_HEIGHT + WEAPON_SIZE):
-                    weapons_to_remove.append(weapon)
-                continue
-            # 其余武器移动逻辑...（保持原有）
-
-        # Remove expired weapons
+        for system in self.weapon_systems.values():
+            system.update(self, weapons_to_remove)
         for weapon in weapons_to_remove:
-            if weapon in self.particles:  # Check if weapon still exists
-                self.remove_particle(weapon)
-                
+            self.remove_particle(weapon)  # 重复删除是安全的（no-op）
+        weapons_to_remove = []
+
         # Move enemies towards player and check for despawning
         enemies_to_remove = []
+        # 敌人 -> 本帧移动方向，玩家碰撞后用它把敌人弹开
+        enemy_moves = {}
+        
+        # 敌人移动：收集成数组后由step（或VecGame，把多局游戏合并）调用move_enemies批量计算
+        batch = self.gather_enemies(player)
+        motion = yield batch
+        separation = self.apply_enemy_motion(batch, motion, enemies_to_remove, enemy_moves)
+        # 世界比屏幕大，被甩在远处的敌人移除，给玩家附近的新敌人腾出名额
+        for enemy in enemies_to_remove:
+            self.remove_particle(enemy)
 
 
-        for weapon in self.get_particles(WEAPON):
-            wname = weapon.attributes.get("weapon_name", "")
-            # 魔杖粒子跟踪目标，击中第一个敌人后转为直线运动
-            if wname == "MagicWand" and "target_id" in weapon.attributes:
-                # 查找目标
-                target = None
-                for enemy_type in [ENEMY, ENEMY_ELITE]:
-                    for enemy in self.get_particles(enemy_type):
-                        if enemy.attributes.get("id") == weapon.attributes["target_id"]:
-                            target = enemy
-                            break
-                if target:
-                    dx = target.x - weapon.x
-                    dy = target.y - weapon.y
-                    dist = math.sqrt(dx * dx + dy * dy)
-                    if dist > 0:
-                        dx = dx / dist * weapon.attributes.get("speed", WEAPON_SPEED)
-                        dy = dy / dist * weapon.attributes.get("speed", WEAPON_SPEED)
-                        weapon.x += dx
-                        weapon.y += dy
-                        weapon.attributes["angle"] = math.degrees(math.atan2(dy, dx))
-                        weapon.attributes["vx"] = dx
-                        weapon.attributes["vy"] = dy
-                        weapon.attributes["last_vx"] = dx
-                        weapon.attributes["last_vy"] = dy
-                else:
-                    vx = weapon.attributes.get("vx", 0)
-                    vy = weapon.attributes.get("vy", 0)
-                    weapon.x += vx
-                    weapon.y += vy
-                    weapon.attributes["last_vx"] = vx
-                    weapon.attributes["last_vy"] = vy
-                if (weapon.x < -WEAPON_SIZE or weapon.x > SCREEN_WIDTH + WEAPON_SIZE or
-                    weapon.y < -WEAPON_SIZE or weapon.y > SCREEN_HEIGHT + WEAPON_SIZE):
-                    weapons_to_remove.append(weapon)
-                continue
-            if wname == "MagicWand" and "target_id" not in weapon.attributes and "vx" in weapon.attributes and "vy" in weapon.attributes:
-                vx = weapon.attributes.get("vx", 0)
-                vy = weapon.attributes.get("vy", 0)
-                weapon.x += vx
-                weapon.y += vy
-                weapon.attributes["last_vx"] = vx
-                weapon.attributes["last_vy"] = vy
-                if (weapon.x < -WEAPON_SIZE or weapon.x > SCREEN_WIDTH + WEAPON_SIZE or
-                    weapon.y < -WEAPON_SIZE or weapon.y > SCREEN_HEIGHT + WEAPON_SIZE):
-                    weapons_to_remove.append(weapon)
-                continue
-            # 十字架的移动逻辑
-            if wname == "Cross":
-                # 获取当前状态
-                has_hit = weapon.attributes.get("has_hit", False)
-                
-                # 获取当前速度和加速度
-                vx = weapon.attributes.get("vx", 0)
-                vy = weapon.attributes.get("vy", 0)
-                
-                # 获取初始速度和方向
-                initial_vx = weapon.attributes.get("initial_vx", 0)
-                initial_vy = weapon.attributes.get("initial_vy", 0)
-                initial_speed = math.sqrt(initial_vx * initial_vx + initial_vy * initial_vy)
-                
-                # 更新自转角度（使用配置的旋转速度）
-                self_rotation = weapon.attributes.get("self_rotation", 0)
-                rotation_speed = weapon.attributes.get("rotation_speed", 24)  # 使用配置的旋转速度，默认24
-                self_rotation = (self_rotation + rotation_speed) % 360
-                weapon.attributes["self_rotation"] = self_rotation
-                
-                if initial_speed > 0:
-                    # 计算当前速度
-                    current_speed = math.sqrt(vx * vx + vy * vy)
-                    
-                    # 计算加速度（始终与初始方向相反）
-                    deceleration = 0.2  # 加速度大小
-                    ax = -(initial_vx / initial_speed) * deceleration
-                    ay = -(initial_vy / initial_speed) * deceleration
-                    
-                    # 应用加速度
-                    vx += ax
-                    vy += ay
-                    
-                    # 检查速度方向是否已经改变（点积小于0表示方向已改变）
-                    direction_changed = (vx * initial_vx + vy * initial_vy) < 0
-                    
-                    if direction_changed:
-                        # 如果方向已改变，增加返回加速度
-                        return_acceleration = 0.3  # 返回时的加速度大小
-                        vx += -initial_vx / initial_speed * return_acceleration
-                        vy += -initial_vy / initial_speed * return_acceleration
-                    
-                    # 限制最大返回速度
-                    max_return_speed = initial_speed * 1.5
-                    current_speed = math.sqrt(vx * vx + vy * vy)
-                    if current_speed > max_return_speed:
-                        speed_scale = max_return_speed / current_speed
-                        vx *= speed_scale
-                        vy *= speed_scale
-                
-                # 更新位置和速度
-                weapon.x += vx
-                weapon.y += vy
-                weapon.attributes["vx"] = vx
-                weapon.attributes["vy"] = vy
-                
-                # 更新角度（基于当前速度方向）
-                if math.sqrt(vx * vx + vy * vy) > 0:
-                    weapon.attributes["angle"] = math.degrees(math.atan2(vy, vx))
-                
-                # 检查是否超出屏幕
-                if (weapon.x < -WEAPON_SIZE or weapon.x > SCREEN_WIDTH + WEAPON_SIZE or
-                    weapon.y < -WEAPON_SIZE or weapon.y > SCREEN_HEIGHT + WEAPON_SIZE):
-                    weapons_to_remove.append(weapon)
-                continue
-                
-            # 圣经的旋转移动
-            if wname == "KingBible":
-                # 获取目标玩家
-                target_player = None
-                for p in self.get_particles(PLAYER):
-                    if p.attributes.get("id") == weapon.attributes.get("target_player_id"):
-                        target_player = p
-                        break
-                if target_player:
-                    # 更新旋转角度
-                    orbit_angle = weapon.attributes.get("orbit_angle", 0)
-                    orbit_radius = weapon.attributes.get("orbit_radius", 60)
-                    speed = weapon.attributes.get("speed", 1.0)
-                    
-                    # 更新角度
-                    orbit_angle = (orbit_angle + speed * 6) % 360  # 增加旋转速度系数到6
-                    weapon.attributes["orbit_angle"] = orbit_angle
-                    
-                    # 计算新位置
-                    rad = math.radians(orbit_angle)
-                    # 获取当前持续时间进度
-                    duration = weapon.attributes.get("duration", 0)
-                    total_duration = weapon.attributes.get("total_duration", 240)  # 4秒 = 240帧
-                    fade_duration = 30  # 淡出动画持续30帧 (0.5秒)
-                    
-                    if duration <= fade_duration:
-                        # 在最后0.5秒进行淡出动画
-                        fade_progress = duration / fade_duration
-                        # 逐渐减小半径，使圣经向玩家靠拢
-                        current_radius = orbit_radius * fade_progress
-                        # 同时缩小尺寸
-                        weapon.attributes["current_size"] = weapon.attributes.get("original_size", 14) * fade_progress
-                    else:
-                        current_radius = orbit_radius
-                    
-                    weapon.x = target_player.x + current_radius * math.cos(rad)
-                    weapon.y = target_player.y + current_radius * math.sin(rad)
-                    
-                    # 更新武器角度（用于渲染）
-                    weapon.attributes["angle"] = orbit_angle
-                    
-                    # 检查持续时间
-                    if "duration" in weapon.attributes:
-                        weapon.attributes["duration"] -= 1
-                        if weapon.attributes["duration"] <= 0:
-                            if weapon not in weapons_to_remove:  # 避免重复添加
-                                weapons_to_remove.append(weapon)
-                                # 如果是圣经粒子，在消失时设置冷却时间
-                                if weapon.attributes.get("weapon_name") == "KingBible":
-                                    # 找到对应的玩家
-                                    for player in self.get_particles(PLAYER):
-                                        if player.attributes.get("id") == weapon.attributes.get("target_player_id"):
-                                            # 设置3秒冷却（180帧）
-                                            player.attributes["KingBible_cooldown"] = 180
-                                            break
-                            continue  # 跳过后续处理
-                else:
-                    weapons_to_remove.append(weapon)
-                continue
-        # 魔杖粒子碰撞穿透处理，击中第一个敌人后移除target_id
-        for weapon in self.get_particles(WEAPON):
-            if weapon.attributes.get("weapon_name") == "MagicWand":
-                for enemy_type in [ENEMY, ENEMY_ELITE]:
-                    for enemy in self.get_particles(enemy_type):
-                        # 根据敌人类型确定碰撞尺寸
-                        enemy_size = ELITE_SIZE if enemy.kind == ENEMY_ELITE else ENEMY_SIZE
-                        if self.check_collision(weapon, enemy, WEAPON_SIZE, enemy_size):
-                            # 先造成伤害
-                            self.apply_damage(weapon, enemy, weapon.attributes.get("damage", 1))
-                            # 只在首次穿透时移除target_id并设置vx/vy
-                            if "target_id" in weapon.attributes and not weapon.attributes.get("has_pierced"):
-                                weapon.attributes["has_pierced"] = True
-                                weapon.attributes.pop("target_id")
-                                weapon.attributes["vx"] = weapon.attributes.get("last_vx", 0)
-                                weapon.attributes["vy"] = weapon.attributes.get("last_vy", 0)
-                            # 穿透计数
-                            if "pierce_count" in weapon.attributes:
-                                weapon.attributes["pierce_count"] -= 1
-                                if weapon.attributes["pierce_count"] <= 0:
-                                    weapons_to_remove.append(weapon)
-                            else:
-                                weapons_to_remove.append(weapon)
-                            break
+        # 宽相：所有移动结束后每帧只做一次，候选对的窄相由step（或VecGame）批量计算，生成带类型的碰撞对，下面各系统共用
+        contacts = self.gather_contacts(player)
+        pairs = self.collision_pairs(contacts, (yield contacts))
 
-        # Remove expired weapons
+        # 魔杖粒子碰撞穿透处理，击中第一个敌人后移除target_id；命中留到战斗阶段结算
+        hits = CombatHits()
+        self.resolve_magic_wand_hits(pairs, weapons_to_remove, hits)
         for weapon in weapons_to_remove:
-            if weapon in self.particles:  # Check if weapon still exists
-                self.remove_particle(weapon)
-                
-        # Move enemies towards player and check for despawning
-        enemies_to_remove = []
-        
-        # Process all types of enemies (regular and elite)
-        for enemy_type in [ENEMY, ENEMY_ELITE]:
-            for enemy in self.get_particles(enemy_type):
-                if enemy.attributes.get("is_dying"):
-                    continue  # 死亡动画期间不移动
-                    
-                # 边界强制反弹修正
-                safe_margin = 10
-                if enemy.x < safe_margin:
-                    enemy.x = safe_margin
-                if enemy.y < safe_margin:
-                    enemy.y = safe_margin
-                if enemy.x > SCREEN_WIDTH - safe_margin:
-                    enemy.x = SCREEN_WIDTH - safe_margin
-                if enemy.y > SCREEN_HEIGHT - safe_margin:
-                    enemy.y = SCREEN_HEIGHT - safe_margin
-                    
-                # Calculate direction to player
-                dx = player.x - enemy.x
-                dy = player.y - enemy.y
-                dist = math.sqrt(dx * dx + dy * dy)
-                
-                # 如果方向为0，直接赋值为(1,1)
-                if dx == 0 and dy == 0:
-                    dx, dy = 1, 1
-                    dist = math.sqrt(2)
-                    
-                # Check if enemy should despawn due to distance
-                if dist > DESPAWN_DISTANCE:
-                    enemies_to_remove.append(enemy)
-                    continue
-                    
-                # 处理敌人之间的碰撞
-                total_repulsion_x = 0
-                total_repulsion_y = 0
-                collision_count = 0
-                
-                # 检查与其他敌人的碰撞
-                for other_type in [ENEMY, ENEMY_ELITE]:
-                    for other in self.get_particles(other_type):
-                        if other == enemy or other.attributes.get("is_dying"):
-                            continue
-                            
-                        # 检查碰撞
-                        is_colliding, cdx, cdy, cdist = self.check_enemy_collision(enemy, other)
-                        if is_colliding:
-                            collision_count += 1
-                            # 计算排斥力（越近排斥力越大）
-                            if cdist > 0:
-                                # 使用非线性排斥力，让近距离排斥更强
-                                repulsion = 10 * (1.0 - cdist / ((ENEMY_SIZE + ENEMY_SIZE) * 1.2)) ** 2
-                                # 归一化方向向量
-                                total_repulsion_x -= (cdx / cdist) * repulsion
-                                total_repulsion_y -= (cdy / cdist) * repulsion
-                
-                # 如果发生碰撞，应用排斥力
-                if collision_count > 0:
-                    # 归一化总排斥力
-                    repulsion_magnitude = math.sqrt(total_repulsion_x**2 + total_repulsion_y**2)
-                    if repulsion_magnitude > 0:
-                        total_repulsion_x /= repulsion_magnitude
-                        total_repulsion_y /= repulsion_magnitude
-                        
-                        # 增加排斥力的影响权重
-                        dx = dx/dist * 0.3 + total_repulsion_x * 0.7
-                        dy = dy/dist * 0.3 + total_repulsion_y * 0.7
-                        
-                        # 重新归一化最终方向
-                        final_magnitude = math.sqrt(dx**2 + dy**2)
-                        if final_magnitude > 0:
-                            dx /= final_magnitude
-                            dy /= final_magnitude
-                else:
-                    # 没有碰撞时正常归一化方向
-                    dx /= dist
-                    dy /= dist
-                
-                # Apply movement
-                speed = enemy.attributes.get("speed", 1) * ENEMY_SPEED_REDUCTION
-                if enemy.kind == ENEMY_ELITE:
-                    speed *= ELITE_SPEED_MULTIPLIER
-                
-                # 处理击退效果
-                knockback_timer = enemy.attributes.get("knockback_timer", 0)
-                if knockback_timer > 0:
-                    knockback_dx = enemy.attributes.get("knockback_dx", 0)
-                    knockback_dy = enemy.attributes.get("knockback_dy", 0)
-                    enemy.x += knockback_dx * KNOCKBACK_DISTANCE
-                    enemy.y += knockback_dy * KNOCKBACK_DISTANCE
-                    enemy.attributes["knockback_timer"] = knockback_timer - 1
-                else:
-                    # 正常移动（考虑碰撞后的方向）
-                    enemy.x += dx * speed
-                    enemy.y += dy * speed
-
-                # Check for collisions with player
-                if not player.attributes.get("is_invincible", False):
-                    # 根据敌人类型确定碰撞尺寸
-                    enemy_size = ELITE_SIZE if enemy.kind == ENEMY_ELITE else ENEMY_SIZE
-                    if self.check_collision(player, enemy, PLAYER_SIZE, enemy_size):
-                        # Apply damage to player
-                        damage = enemy.attributes.get("damage", 1)
-                        if enemy.kind == ENEMY_ELITE:
-                            damage *= 2  # Elite enemies deal double damage
-                        
-                       
-                        is_alive = self.apply_damage(enemy, player, damage)
-                        if not is_alive:
-                            self.game_state = STATE_GAME_OVER
-                            return
-                            
-                        # 添加流血效果
-                        self.spawn_blood_effect(player.x, player.y)
-                        # Make player invincible briefly
-                        player.attributes["is_invincible"] = True
-                        player.attributes["invincible_timer"] = 10  # 1 second at 60fps
-                        # Set player damage effect
-                        player.attributes["damage_effect_timer"] = 10  # 2 frames of red flash
-                        # Move enemy away slightly to prevent continuous damage
-                        enemy.x = enemy.x - dx * 10
-                        enemy.y = enemy.y - dy * 10
-
-                # Check for collisions with weapons
-                for weapon in self.get_particles(WEAPON):
-                    # 根据敌人类型确定碰撞尺寸
-                    enemy_size = ELITE_SIZE if enemy.kind == ENEMY_ELITE else ENEMY_SIZE
-                    if self.check_collision(weapon, enemy, WEAPON_SIZE, enemy_size):
-                        # 保护武器颜色
-                        self.protect_weapon_colors(weapon)
-                        
-                        # Apply damage to enemy using health system
-                        weapon_damage = weapon.attributes["damage"]
-                        
-                        # Store old HP value for damage calculation
-                        old_hp = enemy.health_system.current_hp if enemy.health_system else 0
-                        
-                        # 将闪烁效果改为变白效果
-                        enemy.attributes["white_effect_timer"] = 6  # 0.1秒 = 6帧
-                        
-                        # Apply damage using health system
-                        is_alive = self.apply_damage(weapon, enemy, weapon_damage)
-                        
-                        # 再次保护武器颜色
-                        self.protect_weapon_colors(weapon)
-                        
-                        # Calculate actual damage dealt
-                        if enemy.health_system:
-                            actual_damage = old_hp - enemy.health_system.current_hp
-                        else:
-                            actual_damage = weapon_damage
-                        
-                        # Apply knockback effect
-                        knockback_dx = enemy.x - player.x
-                        knockback_dy = enemy.y - player.y
-                        
-                        # Normalize direction vector
-                        knockback_dist = math.sqrt(knockback_dx * knockback_dx + knockback_dy * knockback_dy)
-                        if knockback_dist > 0:
-                            knockback_dx /= knockback_dist
-                            knockback_dy /= knockback_dist
-                        else:
-                            knockback_dx = random.uniform(-1, 1)
-                            knockback_dy = random.uniform(-1, 1)
-                        
-                        # Set knockback attributes
-                        enemy.attributes["knockback_timer"] = KNOCKBACK_DURATION
-                        enemy.attributes["knockback_dx"] = knockback_dx
-                        enemy.attributes["knockback_dy"] = knockback_dy
-                        
-                        # Create damage text particle
-                        self.spawn_damage_text(enemy.x, enemy.y, actual_damage)
-                        
-                        # If enemy died, handle it
-                        if not is_alive:
-                            self.score += 10
-                            
-                            # 50% chance to drop XP (or always drop for elites)
-                            if enemy.kind == ENEMY_ELITE or random.random() < XP_DROP_CHANCE:
-                                self.spawn_xp(enemy.x, enemy.y)
-                            # 开始死亡动画
-                            enemy.attributes["is_dying"] = True
-                            enemy.attributes["death_anim_timer"] = 30
-                            enemy.attributes["death_anim_size"] = enemy_size
-                            enemy.attributes["death_anim_white"] = True  # 改为True，使死亡时也显示闪白效果
+            self.remove_particle(weapon)
 
+        # 玩家与敌人的碰撞
+        if not self.resolve_player_hits(player, pairs, enemy_moves):
+            self.game_state = STATE_GAME_OVER
+            return
 
-        # Note: Debug toolbar should only be drawn in draw_debug_toolbar method, not in step
+        # 战斗阶段：本帧的命中按原来的先后分两轮用数组结算（伤害、死亡、击退、伤害数字、得分和经验掉落）
+        yield from self.resolve_combat(player, pairs, hits)
 
         # 经验拾取判定
-        xp_to_remove = []
-        for xp in self.get_particles(XP):
-            if self.check_collision(player, xp, PLAYER_SIZE, XP_SIZE):
-                xp_value = 10  # 默认经验值
-                self.xp += xp_value
-                player.attributes["xp"] = self.xp
-                if self.xp >= self.xp_to_next_level:
-                    self.level += 1
-                    self.xp -= self.xp_to_next_level
-                    self.xp_to_next_level = 100 + self.level * 50
-                    print("玩家升级! 新等级: {}".format(self.level))
-                    self.show_upgrade_menu()
-                xp_to_remove.append(xp)
-        for xp in xp_to_remove:
-            self.remove_particle(xp)
+        self.collect_xp(player, pairs)
+
+        # 宝石超过上限时立即合并，否则定期合并扎堆的宝石
+        if self.count_particles(XP) > XP_MAX_GEMS or self.game_timer % XP_MERGE_INTERVAL == 0:
+            self.merge_xp()
+
+        # Note: Debug toolbar should only be drawn in draw_debug_toolbar method, not in step
 
         # XP吸附效果
         for xp in self.get_particles(XP):
@@ -2664,7 +3240,7 @@ class Game(BaseGame):
                 xp.attributes["moving_to_player"] = False
 
         # 死亡动画处理
-        dying_enemies = [e for e in self.particles if e.kind in [ENEMY, ENEMY_ELITE] and e.attributes.get("is_dying")]
+        dying_enemies = [e for e in self.get_particles(ENEMY) + self.get_particles(ENEMY_ELITE) if e.attributes.is_dying]
         for enemy in dying_enemies:
             timer = enemy.attributes.get("death_anim_timer", 0)
             if timer > 0:
@@ -2678,202 +3254,10 @@ class Game(BaseGame):
                 # 颜色闪白
                 enemy.attributes["death_anim_white"] = True
             else:
-                if enemy in self.particles:
-                    self.remove_particle(enemy)
+                self.remove_particle(enemy)
 
-        for weapon in self.get_particles(WEAPON):
-            wname = weapon.attributes.get("weapon_name", "")
-            # Knife粒子只做直线运动，彻底避免被其他逻辑影响
-            if wname == "Knife" and "vx" in weapon.attributes and "vy" in weapon.attributes:
-                # 保护武器颜色
-                self.protect_weapon_colors(weapon)
-                weapon.x += weapon.attributes["vx"]
-                weapon.y += weapon.attributes["vy"]
-                if (weapon.x < -WEAPON_SIZE or weapon.x > SCREEN_WIDTH + WEAPON_SIZE or
-                    weapon.y < -WEAPON_SIZE or weapon.y > SCREEN_HEIGHT + WEAPON_SIZE):
-                    weapons_to_remove.append(weapon)
-                continue
-            # 斧子的抛物线移动
-            if wname == "Axe" and "vx" in weapon.attributes and "vy" in weapon.attributes:
-                # 更新速度（重力影响）
-                weapon.attributes["vy"] += weapon.attributes["gravity"]
-                
-                # 更新位置
-                weapon.x += weapon.attributes["vx"]
-                weapon.y += weapon.attributes["vy"]
-                
-                # 更新旋转角度（根据移动方向）
-                current_angle = math.degrees(math.atan2(weapon.attributes["vy"], weapon.attributes["vx"]))
-                weapon.attributes["angle"] = current_angle
-                
-                # 检查生命周期
-                if "lifetime" in weapon.attributes:
-                    weapon.attributes["lifetime"] -= 1
-                    if weapon.attributes["lifetime"] <= 0:
-                        weapons_to_remove.append(weapon)
-                        continue
-                
-                # 检查是否超出屏幕边界
-                if (weapon.x < -WEAPON_SIZE or weapon.x > SCREEN_WIDTH + WEAPON_SIZE or
-                    weapon.y < -WEAPON_SIZE or weapon.y > SCREEN_HEIGHT + WEAPON_SIZE):
-                    weapons_to_remove.append(weapon)
-                continue
-            # 其他武器的移动逻辑...
-
-        # 更新血液粒子
-        blood_to_remove = []
-        for blood in self.get_particles(BLOOD):
-            # 更新位置
-            blood.x += blood.attributes["vx"]
-            blood.y += blood.attributes["vy"]
-            
-            # 减少生命周期
-            blood.attributes["lifetime"] -= 1
-            if blood.attributes["lifetime"] <= 0:
-                blood_to_remove.append(blood)
-            else:
-                # 逐渐降低不透明度
-                progress = 1 - blood.attributes["lifetime"] / BLOOD_PARTICLE_LIFETIME
-                blood.attributes["alpha"] = int(255 * (1 - progress))
-                # 减小速度（模拟阻力）
-                blood.attributes["vx"] *= 0.9
-                blood.attributes["vy"] *= 0.9
-                # 添加一点重力效果
-                blood.attributes["vy"] += 0.2
-        
-        # 移除过期的血液粒子
-        for blood in blood_to_remove:
-            if blood in self.particles:
-                self.remove_particle(blood)
-
-        # Handle aura weapons (Garlic)
-        for weapon in self.get_particles(WEAPON):
-            if weapon.attributes.get("is_aura"):
-                # Update aura position to follow player
-                for player in self.get_particles(PLAYER):
-                    if player.attributes["id"] == weapon.attributes["target_player_id"]:
-                        weapon.x = player.x
-                        weapon.y = player.y
-                        break
-                
-                # Process duration
-                weapon.attributes["duration"] -= 1
-                if weapon.attributes["duration"] <= 0:
-                    # Reset duration for next tick
-                    weapon_type = next((w for w in WEAPON_TYPES if w["name"] == weapon.attributes["weapon_name"]), None)
-                    if weapon_type:
-                        weapon.attributes["duration"] = weapon_type["cooldown"]
-                    
-                    # Check for enemies in range
-                    radius = weapon.attributes.get("aura_radius")  # Use the radius we calculated in spawn_aura
-                    if radius is None:  # Fallback only if radius is not set
-                        radius = WEAPON_SIZE * 2
-                    
-                    for enemy_type in [ENEMY, ENEMY_ELITE]:
-                        for enemy in self.get_particles(enemy_type):
-                            if enemy.attributes.get("is_dying"):
-                                continue
-                            
-                            # Calculate distance to enemy
-                            dx = enemy.x - weapon.x
-                            dy = enemy.y - weapon.y
-                            dist = math.sqrt(dx * dx + dy * dy)
-                            
-                            # If enemy is in range
-                            if dist <= radius:
-                                enemy_id = enemy.attributes.get("id", -1)
-                                hit_cooldown = weapon.attributes.get("hit_cooldown", {})
-                                
-                                # Update cooldown for this enemy
-                                if enemy_id in hit_cooldown:
-                                    hit_cooldown[enemy_id] = max(0, hit_cooldown[enemy_id] - 1)
-                                
-                                # Check if we can damage this enemy
-                                if enemy_id not in hit_cooldown or hit_cooldown[enemy_id] <= 0:
-                                    # Apply damage and knockback
-                                    damage = weapon.attributes.get("damage", 5)
-                                    self.apply_damage(weapon, enemy, damage)
-                                    
-                                    # Apply knockback
-                                    knockback = weapon.attributes.get("knockback", 0.5)
-                                    if knockback > 0 and dist > 0:
-                                        # Calculate knockback direction (away from aura center)
-                                        kdx = dx / dist
-                                        kdy = dy / dist
-                                        enemy.attributes["knockback_dx"] = kdx
-                                        enemy.attributes["knockback_dy"] = kdy
-                                        enemy.attributes["knockback_timer"] = 5  # 5 frames of knockback
-                                    
-                                    # Set cooldown for this enemy (1.3s = 78 frames at 60fps)
-                                    hit_cooldown[enemy_id] = 78
-                                
-                                # Update the hit cooldown dictionary
-                                weapon.attributes["hit_cooldown"] = hit_cooldown
-                continue
-            
-            # Handle other weapon types...
-
-        # 优化：使用空间网格进行碰撞检测
-        for weapon in self.get_particles(WEAPON):
-            if weapon.attributes.get("is_aura"):
-                continue
-                
-            weapon_size = weapon.attributes.get("size", WEAPON_SIZE)
-            # 获取武器附近的粒子
-            nearby_enemies = self.get_nearby_particles(weapon.x, weapon.y, weapon_size * 2)
-            
-            for enemy in nearby_enemies:
-                if enemy.kind not in [ENEMY, ENEMY_ELITE] or enemy.attributes.get("is_dying"):
-                    continue
-                    
-                enemy_size = ELITE_SIZE if enemy.kind == ENEMY_ELITE else ENEMY_SIZE
-                if self.check_collision(weapon, enemy, weapon_size, enemy_size):
-                    # 处理武器和敌人的碰撞
-                    damage = weapon.attributes.get("damage", 1)
-                    self.apply_damage(weapon, enemy, damage)
-                    
-                    # 处理击退效果
-                    if not enemy.attributes.get("is_dying"):
-                        knockback = weapon.attributes.get("knockback", 1.0)
-                        if knockback > 0:
-                            dx = enemy.x - weapon.x
-                            dy = enemy.y - weapon.y
-                            dist = math.sqrt(dx * dx + dy * dy)
-                            if dist > 0:
-                                enemy.attributes["knockback_timer"] = KNOCKBACK_DURATION
-                                enemy.attributes["knockback_dx"] = dx / dist
-                                enemy.attributes["knockback_dy"] = dy / dist
-
-        # 优化：使用空间网格处理敌人之间的碰撞
-        for enemy1 in self.get_particles(ENEMY) + self.get_particles(ENEMY_ELITE):
-            if enemy1.attributes.get("is_dying"):
-                continue
-                
-            enemy1_size = ELITE_SIZE if enemy1.kind == ENEMY_ELITE else ENEMY_SIZE
-            nearby_enemies = self.get_nearby_particles(enemy1.x, enemy1.y, enemy1_size * 2)
-            
-            for enemy2 in nearby_enemies:
-                if (enemy2.kind not in [ENEMY, ENEMY_ELITE] or 
-                    enemy2.attributes.get("is_dying") or 
-                    enemy2 is enemy1):
-                    continue
-                    
-                enemy2_size = ELITE_SIZE if enemy2.kind == ENEMY_ELITE else ENEMY_SIZE
-                is_colliding, dx, dy, dist = self.check_enemy_collision(enemy1, enemy2)
-                
-                if is_colliding and dist > 0:
-                    # 应用排斥力
-                    repulsion = 0.5  # 排斥力强度
-                    enemy1.x -= (dx / dist) * repulsion
-                    enemy1.y -= (dy / dist) * repulsion
-                    enemy2.x += (dx / dist) * repulsion
-                    enemy2.y += (dy / dist) * repulsion
-                    
-                    # 确保敌人不会移出屏幕
-                    enemy1.x = max(0, min(SCREEN_WIDTH, enemy1.x))
-                    enemy1.y = max(0, min(SCREEN_HEIGHT, enemy1.y))
-                    enemy2.x = max(0, min(SCREEN_WIDTH, enemy2.x))
-                    enemy2.y = max(0, min(SCREEN_HEIGHT, enemy2.y))
+        # 把重叠的敌人互相推开（一次数组更新，由step或VecGame执行）
+        yield separation
 
     def agent_action(self, last_action=None):
         """Set agent mode and handle agent actions"""
@@ -2882,7 +3266,7 @@ class Game(BaseGame):
         
         # Handle menu states
         if self.game_state != STATE_PLAYING:
-            return self._handle_menu_states()
+            return self.resolve_menus()
 
         # Get player and health info
         player = self.get_particle(PLAYER)
@@ -2903,8 +3287,18 @@ class Game(BaseGame):
         # Convert movement to actions
         return self._movement_to_actions(move_x, move_y)
 
-    def _handle_menu_states(self):
-        """Handle different menu states with appropriate actions."""
+    def resolve_menus(self):
+        """
+        Answer the open menu the way the built-in agent does.
+
+        Starts the game from the start menu, picks a random upgrade (with
+        the agent's RNG stream) in the upgrade menu and restarts after game
+        over; outside menus it does nothing. Drivers that supply their own
+        movement actions call this to get past menus.
+
+        Returns:
+            list: A no-op action.
+        """
         if self.game_state == STATE_START_MENU:
             button_x = SCREEN_WIDTH // 2 - BUTTON_WIDTH // 2
             button_y = SCREEN_HEIGHT // 2 - 30
@@ -2912,7 +3306,7 @@ class Game(BaseGame):
             return [False, False, False, False, False]
         elif self.game_state == STATE_UPGRADE_MENU:
             if self.upgrade_options:
-                upgrade_index = random.randint(0, len(self.upgrade_options) - 1)
+                upgrade_index = self.agent_rng.randint(0, len(self.upgrade_options) - 1)
                 cx, cy = SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2
                 button_y = cy - 50 + upgrade_index * (BUTTON_HEIGHT + 20)
                 button_x = cx - BUTTON_WIDTH // 2
@@ -3018,9 +3412,9 @@ class Game(BaseGame):
         
         # 检查是否在四个角落区域
         is_left = player.x < corner_margin
-        is_right = player.x > SCREEN_WIDTH - corner_margin
+        is_right = player.x > WORLD_WIDTH - corner_margin
         is_top = player.y < corner_margin
-        is_bottom = player.y > SCREEN_HEIGHT - corner_margin
+        is_bottom = player.y > WORLD_HEIGHT - corner_margin
         
         # 检查是否在角落区域且被敌人包围
         if (is_left or is_right) and (is_top or is_bottom):
@@ -3127,12 +3521,12 @@ class Game(BaseGame):
             # 根据玩家在角落的位置调整突围方向
             if player_x < 150:  # 在左边缘
                 break_x = max(break_x, 0.5)  # 强制向右
-            elif player_x > SCREEN_WIDTH - 150:  # 在右边缘
+            elif player_x > WORLD_WIDTH - 150:  # 在右边缘
                 break_x = min(break_x, -0.5)  # 强制向左
                 
             if player_y < 150:  # 在上边缘
                 break_y = max(break_y, 0.5)  # 强制向下
-            elif player_y > SCREEN_HEIGHT - 150:  # 在下边缘
+            elif player_y > WORLD_HEIGHT - 150:  # 在下边缘
                 break_y = min(break_y, -0.5)  # 强制向上
             
             # 归一化突围向量
@@ -3332,12 +3726,424 @@ class Game(BaseGame):
 
     def get_kingbible_damage(self, level):
         """Calculate the damage for the 'KingBible' weapon based on its level."""
-        if level <= 3:
-            return 10
-        elif level <= 6:
-            return 20
-        else:
-            return 30
+        return weapon_stats("KingBible", level).damage
+
+    def gather_contacts(self, player):
+        """
+        Collect the candidate collision pairs of the frame into a ContactBatch.
+
+        This is the frame's broadphase, done once for every system that
+        needs collisions. Syncs the collision index with the post-movement positions and
+        queries it once for all weapons, then once around the player for
+        enemies and XP gems. Enemies in their death animation never collide
+        and are left out.
+        """
+        self.collision.update()
+        weapons = self.particles_by_kind.get(WEAPON, ())
+        sizes = []
+        radii = []
+        queries = []
+        for weapon in weapons:
+            attributes = weapon.attributes
+            stats = weapon_stats(attributes.weapon_name, attributes.level or 1)
+            size = stats.collision_size if stats is not None else WEAPON_SIZE
+            reach = (size + ELITE_SIZE) / 2
+            radius = -1
+            if attributes.is_aura:
+                radius = attributes.get("aura_radius")
+                if radius is None:  # Fallback only if radius is not set
+                    radius = WEAPON_SIZE * 2
+                reach = max(radius, reach)
+            sizes.append(size)
+            radii.append(radius)
+            queries.append(reach)
+        candidates = self.collision.nearby_many([(weapon.x, weapon.y) for weapon in weapons], queries, LAYER_ENEMIES)
+
+        pairs = []
+        rows = []
+        for weapon, size, radius, enemies in zip(weapons, sizes, radii, candidates):
+            for enemy in enemies:
+                if enemy.attributes.is_dying:
+                    continue
+                enemy_size = ELITE_SIZE if enemy.kind == ENEMY_ELITE else ENEMY_SIZE
+                pairs.append((weapon, enemy))
+                rows.append((weapon.x, weapon.y, enemy.x, enemy.y, (size + enemy_size) / 2, radius))
+        for enemy in self.collision.nearby(player.x, player.y, (PLAYER_SIZE + ELITE_SIZE) / 2, LAYER_ENEMIES):
+            if enemy.attributes.is_dying:
+                continue
+            enemy_size = ELITE_SIZE if enemy.kind == ENEMY_ELITE else ENEMY_SIZE
+            pairs.append((player, enemy))
+            rows.append((player.x, player.y, enemy.x, enemy.y, (PLAYER_SIZE + enemy_size) / 2, -1))
+        for xp in self.collision.nearby(player.x, player.y, (PLAYER_SIZE + XP_SIZE) / 2, LAYER_PICKUPS):
+            pairs.append((player, xp))
+            rows.append((player.x, player.y, xp.x, xp.y, (PLAYER_SIZE + XP_SIZE) / 2, -1))
+        return ContactBatch(pairs, rows)
+
+    def collision_pairs(self, contacts, result):
+        """Sort the pairs that passed the narrowphase into typed CollisionPairs"""
+        projectile_enemy = []
+        aura_enemy = []
+        player_enemy = []
+        player_pickup = []
+        for (a, b), dx, dy, dist, touching, in_radius in zip(
+            contacts.pairs, result.dx, result.dy, result.dist, result.touching, result.in_radius,
+        ):
+            if a.kind == WEAPON:
+                if a.attributes.is_aura:
+                    if touching or in_radius:
+                        aura_enemy.append(AuraContact(a, b, dx, dy, dist, touching))
+                elif touching:
+                    projectile_enemy.append((a, b))
+            elif touching:
+                if b.kind == XP:
+                    player_pickup.append(b)
+                else:
+                    player_enemy.append(b)
+        return CollisionPairs(projectile_enemy, aura_enemy, player_enemy, player_pickup)
+
+    def resolve_magic_wand_hits(self, pairs, weapons_to_remove, hits):
+        """MagicWand pierce: each wand hits at most one enemy per frame; the hit goes into hits"""
+        hit_wands = set()
+        for weapon, enemy in pairs.projectile_enemy:
+            if weapon.attributes.weapon_name != "MagicWand" or weapon in hit_wands:
+                continue
+            hit_wands.add(weapon)
+            # 先记录伤害（已在死亡动画中的敌人不再受伤，但仍消耗穿透）
+            if not enemy.attributes.is_dying:
+                hits.add(weapon, enemy, weapon.attributes.get("damage", 1))
+            # 只在首次穿透时移除target_id并设置vx/vy
+            if "target_id" in weapon.attributes and not weapon.attributes.get("has_pierced"):
+                weapon.attributes["has_pierced"] = True
+                weapon.attributes.pop("target_id")
+                weapon.attributes["vx"] = weapon.attributes.get("last_vx", 0)
+                weapon.attributes["vy"] = weapon.attributes.get("last_vy", 0)
+            # 穿透计数
+            if "pierce_count" in weapon.attributes:
+                weapon.attributes["pierce_count"] -= 1
+                if weapon.attributes["pierce_count"] <= 0:
+                    weapons_to_remove.append(weapon)
+            else:
+                weapons_to_remove.append(weapon)
+
+    def resolve_player_hits(self, player, pairs, enemy_moves):
+        """Damage the player from touching enemies; returns False if the player died"""
+        for enemy in pairs.player_enemy:
+            if player.attributes.get("is_invincible", False):
+                break
+            # Apply damage to player
+            damage = enemy.attributes.get("damage", 1)
+            if enemy.kind == ENEMY_ELITE:
+                damage *= 2  # Elite enemies deal double damage
+
+            is_alive = self.apply_damage(enemy, player, damage)
+            if not is_alive:
+                return False
+
+            # 添加流血效果
+            self.spawn_blood_effect(player.x, player.y)
+            # Make player invincible briefly
+            player.attributes["is_invincible"] = True
+            player.attributes["invincible_timer"] = 10  # 1 second at 60fps
+            # Set player damage effect
+            player.attributes["damage_effect_timer"] = 10  # 2 frames of red flash
+            # Move enemy away slightly to prevent continuous damage
+            dx, dy = enemy_moves.get(enemy, (0, 0))
+            enemy.x = enemy.x - dx * 10
+            enemy.y = enemy.y - dy * 10
+        return True
+
+    def resolve_combat(self, player, pairs, hits):
+        """
+        Resolve the frame's weapon hits on enemies in two rounds of array subtraction.
+
+        The rounds keep the order of the old hit-by-hit passes. The first
+        round is the MagicWand pierce hits already in hits plus the contact
+        hits of projectiles and touching auras. Every contact hit flashes the
+        enemy white, knocks it away from the player and shows the damage it
+        dealt; the first one that leaves an enemy at 0 HP kills it (score,
+        kill counts, an XP drop, always for elites, and the death animation)
+        and the enemy's later contact hits of the frame are dropped. The
+        second round is the aura hits and the second projectile hits on
+        enemies that are not dying: they take HP and replace the knockback,
+        but as before an enemy they bring to 0 HP only dies on its next
+        contact hit.
+
+        A generator: it yields each round's HitBatch, NO_HITS for a round
+        without hits, and expects subtract_hits' result back (see run_phase).
+        """
+        self.collect_contact_hits(pairs, hits)
+        dealt = yield from self.deal_hits(hits)
+        if dealt is not None:
+            self.apply_contact_hits(player, hits, *dealt)
+
+        later = CombatHits()
+        self.collect_aura_hits(pairs, later)
+        self.collect_projectile_hits(pairs, later)
+        dealt = yield from self.deal_hits(later)
+        if dealt is not None:
+            for i, weapon, value in zip(later.target, later.weapon, dealt[1]):
+                if value <= 0:
+                    self.on_particle_death(later.enemies[i], weapon)
+
+    def deal_hits(self, hits):
+        """
+        Subtract one round of hits from the enemies' HP.
+
+        A generator: it yields the round's HitBatch and writes the answer
+        back to the enemies' health systems.
+
+        Returns:
+            tuple: (each enemy's HP before the round; the hit enemy's HP
+            right after each hit), as lists, or None for a round without hits.
+        """
+        if not hits:
+            yield NO_HITS
+            return None
+        hp = np.array([enemy.health_system.current_hp for enemy in hits.enemies])
+        remaining, after = yield HitBatch(hp, np.array(hits.target), np.array(hits.damage))
+        for enemy, value in zip(hits.enemies, remaining.tolist()):
+            health = enemy.health_system
+            health.current_hp = value
+            if value <= 0:
+                health.is_alive = False
+        return hp.tolist(), after.tolist()
+
+    def apply_contact_hits(self, player, hits, hp, after):
+        """
+        Play out the first combat round hit by hit: flashes, knockback, damage numbers and deaths.
+
+        Args:
+            player (Particle): The player; contact hits push enemies away from it.
+            hits (CombatHits): The round's hits.
+            hp (list): Each enemy's HP before the round.
+            after (list): The hit enemy's HP right after each hit.
+        """
+        for i, weapon, contact, value in zip(hits.target, hits.weapon, hits.contact, after):
+            enemy = hits.enemies[i]
+            if enemy.attributes.is_dying:
+                continue  # 本帧已被更早的碰撞命中杀死
+            actual_damage = hp[i] - value
+            hp[i] = value
+            if value <= 0:
+                self.on_particle_death(enemy, weapon)
+            if not contact:
+                continue
+
+            # 将闪烁效果改为变白效果
+            enemy.attributes["white_effect_timer"] = 6  # 0.1秒 = 6帧
+
+            # 击退方向：背离玩家，与玩家重合时随机方向
+            knockback_dx = enemy.x - player.x
+            knockback_dy = enemy.y - player.y
+            knockback_dist = math.sqrt(knockback_dx * knockback_dx + knockback_dy * knockback_dy)
+            if knockback_dist > 0:
+                knockback_dx /= knockback_dist
+                knockback_dy /= knockback_dist
+            else:
+                knockback_dx = self.combat_rng.uniform(-1, 1)
+                knockback_dy = self.combat_rng.uniform(-1, 1)
+            enemy.attributes["knockback_timer"] = KNOCKBACK_DURATION
+            enemy.attributes["knockback_dx"] = knockback_dx
+            enemy.attributes["knockback_dy"] = knockback_dy
+
+            self.spawn_damage_text(enemy.x, enemy.y, actual_damage)
+
+            if value > 0:
+                continue
+            self.score += 10
+            self.kill_count += 1
+            if enemy.kind == ENEMY_ELITE:
+                self.elite_kill_count += 1
+            # 50% chance to drop XP (or always drop for elites)
+            if enemy.kind == ENEMY_ELITE or self.combat_rng.random() < XP_DROP_CHANCE:
+                self.spawn_xp(enemy.x, enemy.y, enemy.attributes.get("xp_value", XP_GEM_VALUE))
+            # 开始死亡动画
+            enemy.attributes["is_dying"] = True
+            enemy.attributes["death_anim_timer"] = 30
+            enemy.attributes["death_anim_size"] = ELITE_SIZE if enemy.kind == ENEMY_ELITE else ENEMY_SIZE
+            enemy.attributes["death_anim_white"] = True
+
+    def collect_contact_hits(self, pairs, hits):
+        """Projectiles and touching auras hit every enemy they touch"""
+        contacts = pairs.projectile_enemy + [(c.aura, c.enemy) for c in pairs.aura_enemy if c.touching]
+        for weapon, enemy in contacts:
+            if weapon.removed or enemy.attributes.is_dying:
+                continue
+            hits.add(weapon, enemy, weapon.attributes["damage"], contact=True)
+
+    def collect_aura_hits(self, pairs, hits):
+        """
+        Aura damage: each enemy inside an aura's radius is hit once per aura cooldown.
+
+        The enemies in range come from the broadphase's radius query. Whether
+        each one may be hit is one comparison against the aura's next-hit
+        column (AuraSystem.hit_column), indexed by enemy slot.
+        """
+        contacts_by_aura = {}
+        for contact in pairs.aura_enemy:
+            if not contact.enemy.attributes.is_dying:
+                contacts_by_aura.setdefault(contact.aura, []).append(contact)
+        auras = self.weapon_systems["aura"]
+        now = self.game_timer
+        for aura, contacts in contacts_by_aura.items():
+            if aura.removed:
+                continue
+            radius = aura.attributes.get("aura_radius")
+            if radius is None:  # Fallback only if radius is not set
+                radius = WEAPON_SIZE * 2
+            contacts = [contact for contact in contacts if contact.dist <= radius]
+            if not contacts:
+                continue
+            slots = self.enemy_slots.slots_of([contact.enemy for contact in contacts])
+            next_hit = auras.hit_column(self.enemy_slots, aura)
+            ready = next_hit[slots] <= now
+            if not ready.any():
+                continue
+            # 1.3秒（78帧）后才能再次命中同一敌人
+            next_hit[slots[ready]] = now + aura.attributes.get("cooldown", 78)
+            damage = aura.attributes.get("damage", 5)
+            knockback = aura.attributes.get("knockback", 0)
+            for contact, hit in zip(contacts, ready.tolist()):
+                if not hit:
+                    continue
+                enemy = contact.enemy
+                hits.add(aura, enemy, damage)
+                if knockback > 0 and contact.dist > 0:
+                    # 击退方向：远离光环中心
+                    enemy.attributes["knockback_dx"] = contact.dx / contact.dist
+                    enemy.attributes["knockback_dy"] = contact.dy / contact.dist
+                    enemy.attributes["knockback_timer"] = 5  # 5 frames of knockback
+
+    def collect_projectile_hits(self, pairs, hits):
+        """Second projectile hit: extra damage and knockback away from the weapon"""
+        for weapon, enemy in pairs.projectile_enemy:
+            if weapon.removed or enemy.attributes.is_dying:
+                continue
+            hits.add(weapon, enemy, weapon.attributes.get("damage", 1))
+            knockback = weapon.attributes.get("knockback", 1.0)
+            if knockback > 0:
+                dx = enemy.x - weapon.x
+                dy = enemy.y - weapon.y
+                dist = math.sqrt(dx * dx + dy * dy)
+                if dist > 0:
+                    enemy.attributes["knockback_timer"] = KNOCKBACK_DURATION
+                    enemy.attributes["knockback_dx"] = dx / dist
+                    enemy.attributes["knockback_dy"] = dy / dist
+
+    def collect_xp(self, player, pairs):
+        """Pick up the XP gems touching the player"""
+        for xp in pairs.player_pickup:
+            if xp.removed:
+                continue
+            self.xp += xp.attributes.value or XP_GEM_VALUE
+            player.attributes["xp"] = self.xp
+            if self.xp >= self.xp_to_next_level:
+                self.level += 1
+                self.xp -= self.xp_to_next_level
+                self.xp_to_next_level = 100 + self.level * 50
+                print("玩家升级! 新等级: {}".format(self.level))
+                self.show_upgrade_menu()
+            self.remove_particle(xp)
+
+    def gather_enemies(self, player):
+        """
+        Collect the enemies that move this frame into an EnemyBatch.
+
+        Enemies in active chunks move every frame. The others sleep and
+        catch up CHUNK_SLEEP_INTERVAL frames at once on every
+        CHUNK_SLEEP_INTERVAL-th frame, staggered by enemy slot so the
+        sleepers' work is spread evenly over the frames.
+
+        Also updates each enemy's LOD tier (see lod_tiers): near enemies
+        separate every frame, mid enemies every LOD_MID_SEPARATION_INTERVAL
+        frames (staggered by slot), far and sleeping enemies never. Far
+        enemies are taken out of the collision index, so the broadphase
+        never sees them, and go back in when they come closer.
+
+        Enemies further than FLOW_DIRECT_RADIUS from the player take their
+        heading from the pursuit flow field, rebuilt around the player every
+        FLOW_FIELD_INTERVAL frames.
+        """
+        live = [
+            enemy
+            for kind in (ENEMY, ENEMY_ELITE)
+            for enemy in self.particles_by_kind.get(kind, ())
+            if not enemy.attributes.is_dying
+        ]
+        n = len(live)
+        x = np.fromiter((enemy.x for enemy in live), dtype=np.float64, count=n)
+        y = np.fromiter((enemy.y for enemy in live), dtype=np.float64, count=n)
+        slots = self.enemy_slots.slots_of(live)
+        column = self.enemy_slots.columns[LOD_COLUMN]
+        old_tier = column[slots]
+        dist = np.hypot(x - player.x, y - player.y)
+        tier = lod_tiers(old_tier, dist)
+        column[slots] = tier
+        for k in np.flatnonzero((tier == LOD_FAR) != (old_tier == LOD_FAR)).tolist():
+            if tier[k] == LOD_FAR:
+                self.collision.remove(live[k])
+            else:
+                self.collision.insert(live[k], LAYER_ENEMIES)
+
+        timer = self.game_timer
+        active = self.chunks.active_mask(x, y)
+        moving = active | ((slots + timer) % CHUNK_SLEEP_INTERVAL == 0)
+        steps = np.where(active, 1, CHUNK_SLEEP_INTERVAL)
+        separate = active & (
+            (tier == LOD_NEAR) | ((tier == LOD_MID) & ((slots + timer) % LOD_MID_SEPARATION_INTERVAL == 0))
+        )
+        moving = np.flatnonzero(moving)
+
+        flow = self.flow_field
+        if not flow.built or timer % FLOW_FIELD_INTERVAL == 0:
+            flow.update(player.x, player.y, x, y)
+        heading_x, heading_y = flow.sample(x[moving], y[moving])
+        direct = dist[moving] < FLOW_DIRECT_RADIUS
+        heading_x[direct] = 0.0
+        heading_y[direct] = 0.0
+
+        player_x = player.x
+        player_y = player.y
+        enemies = []
+        rows = []
+        for k, enemy_x, enemy_y, enemy_steps, enemy_separate, enemy_heading_x, enemy_heading_y in zip(
+            moving.tolist(), x[moving].tolist(), y[moving].tolist(), steps[moving].tolist(), separate[moving].tolist(),
+            heading_x.tolist(), heading_y.tolist(),
+        ):
+            enemy = live[k]
+            record = enemy.attributes
+            enemies.append(enemy)
+            rows.append((
+                enemy_x, enemy_y, enemy.kind == ENEMY_ELITE, record.get("speed", 1), enemy_steps, enemy_separate,
+                enemy_heading_x, enemy_heading_y,
+                record.knockback_timer or 0, record.knockback_dx or 0, record.knockback_dy or 0,
+                player_x, player_y,
+            ))
+        return EnemyBatch(enemies, rows)
+
+    def apply_enemy_motion(self, batch, motion, enemies_to_remove, enemy_moves):
+        """
+        Write move_enemies' result back to the enemies.
+
+        Fills enemies_to_remove with the enemies too far from the player and
+        enemy_moves with each moving enemy's direction.
+
+        Returns:
+            EnemySeparation: The overlapping pairs, pushed apart at the end of the frame.
+        """
+        enemies = batch.enemies
+        for enemy, x, y, dx, dy, despawn, knocked, timer in zip(
+            enemies, motion.x, motion.y, motion.dx, motion.dy, motion.despawn, motion.knocked, motion.knockback_timer,
+        ):
+            enemy.x = x
+            enemy.y = y
+            if despawn:
+                enemies_to_remove.append(enemy)
+                continue
+            if knocked:
+                enemy.attributes.knockback_timer = timer
+            enemy_moves[enemy] = (dx, dy)
+        return EnemySeparation(enemies, motion.pair_i, motion.pair_j, motion.unit_x, motion.unit_y)
 
     def check_enemy_collision(self, enemy1, enemy2):
         """Check for collisions between two enemy particles."""
@@ -3359,35 +4165,21 @@ class Game(BaseGame):
     def spawn_blood_effect(self, x, y):
         """Generate blood effects at the specified position."""
         # 限制同时存在的血液粒子数量
-        blood_particles = [p for p in self.particles if p.kind == BLOOD]
-        if len(blood_particles) >= MAX_BLOOD_PARTICLES:
+        blood_count = self.effects.blood_count
+        if blood_count >= MAX_BLOOD_PARTICLES:
             return
             
         # 计算可以生成的新粒子数量
-        available_slots = MAX_BLOOD_PARTICLES - len(blood_particles)
+        available_slots = MAX_BLOOD_PARTICLES - blood_count
         count = min(BLOOD_PARTICLE_COUNT, available_slots)
         
         for _ in range(count):
-            angle = random.uniform(0, 2 * math.pi)
-            speed = random.uniform(BLOOD_PARTICLE_SPEED * 0.5, BLOOD_PARTICLE_SPEED)
+            angle = self.effects_rng.uniform(0, 2 * math.pi)
+            speed = self.effects_rng.uniform(BLOOD_PARTICLE_SPEED * 0.5, BLOOD_PARTICLE_SPEED)
             vx = math.cos(angle) * speed
             vy = math.sin(angle) * speed
             
-            self.particles.append(
-                Particle(
-                    BLOOD,
-                    x,
-                    y,
-                    attributes={
-                        "id": self.next_id,
-                        "vx": vx,
-                        "vy": vy,
-                        "lifetime": BLOOD_PARTICLE_LIFETIME,
-                        "size": BLOOD_PARTICLE_SIZE,
-                        "alpha": 255
-                    }
-                )
-            )
+            self.effects.add_blood(self.next_id, x, y, vx, vy, BLOOD_PARTICLE_SIZE)
             self.next_id += 1
 
     def _create_threat_map(self, player, enemies, predicted_threats):
@@ -3447,47 +4239,13 @@ class Game(BaseGame):
             actions[3] = True  # Down
         return actions
 
-    def protect_weapon_colors(self, weapon):
-        """Protect the colors of weapons to ensure they are not modified."""
-        if weapon.attributes.get("weapon_name") == "Knife" and weapon.attributes.get("is_knife"):
-            # 恢复飞刀的颜色
-            weapon.attributes["main_color"] = "#FFFFFF"
-            weapon.attributes["border_color"] = "#8B4513"
-            weapon.attributes["shape_color"] = "#FFFFFF"
-            weapon.attributes["color_locked"] = True
-            weapon.attributes["is_knife"] = True
-            weapon.attributes["original_main_color"] = "#FFFFFF"
-            weapon.attributes["original_border_color"] = "#8B4513"
-
     def spawn_damage_text(self, x, y, damage_amount):
         """Generate damage text at the specified position."""
         if int(damage_amount) <= 0:
             return  # 伤害为0不显示跳字
             
-        # 限制同时存在的伤害文本数量
-        damage_texts = [p for p in self.particles if p.kind == DAMAGE_TEXT]
-        if len(damage_texts) >= MAX_DAMAGE_TEXTS:
-            # 找到最旧的伤害文本并移除
-            oldest_text = min(damage_texts, key=lambda p: p.attributes.get("timer", 0))
-            self.remove_particle(oldest_text)
-            
-        # 如果没有可合并的，创建新的伤害文本
-        self.particles.append(
-            Particle(
-                DAMAGE_TEXT,
-                x,
-                y,
-                attributes={
-                    "text": str(int(damage_amount)),
-                    "timer": DAMAGE_TEXT_DURATION,
-                    "id": self.next_id,
-                    "alpha": 255,
-                    "scale": 0.5,
-                    "scale_phase": "grow",
-                    "color": "#FFFFFF"
-                }
-            )
-        )
+        # 效果层满时会替换最旧的伤害文本
+        self.effects.add_text(self.next_id, x, y, str(int(damage_amount)))
         self.next_id += 1
 
     def _is_safe_to_collect_xp(self, player, game_state):
@@ -3589,9 +4347,9 @@ class Game(BaseGame):
         
         # 检查是否在四个角落区域
         is_left = player.x < corner_margin
-        is_right = player.x > SCREEN_WIDTH - corner_margin
+        is_right = player.x > WORLD_WIDTH - corner_margin
         is_top = player.y < corner_margin
-        is_bottom = player.y > SCREEN_HEIGHT - corner_margin
+        is_bottom = player.y > WORLD_HEIGHT - corner_margin
         
         # 检查是否在角落区域且被敌人包围
         if (is_left or is_right) and (is_top or is_bottom):
@@ -3698,12 +4456,12 @@ class Game(BaseGame):
             # 根据玩家在角落的位置调整突围方向
             if player_x < 150:  # 在左边缘
                 break_x = max(break_x, 0.5)  # 强制向右
-            elif player_x > SCREEN_WIDTH - 150:  # 在右边缘
+            elif player_x > WORLD_WIDTH - 150:  # 在右边缘
                 break_x = min(break_x, -0.5)  # 强制向左
                 
             if player_y < 150:  # 在上边缘
                 break_y = max(break_y, 0.5)  # 强制向下
-            elif player_y > SCREEN_HEIGHT - 150:  # 在下边缘
+            elif player_y > WORLD_HEIGHT - 150:  # 在下边缘
                 break_y = min(break_y, -0.5)  # 强制向上
             
             # 归一化突围向量
@@ -3979,8 +4737,8 @@ class Game(BaseGame):
 
     def _get_quadrant(self, x, y):
         """获取坐标所在的象限"""
-        mid_x = SCREEN_WIDTH / 2
-        mid_y = SCREEN_HEIGHT / 2
+        mid_x = WORLD_WIDTH / 2
+        mid_y = WORLD_HEIGHT / 2
         if x < mid_x:
             if y < mid_y:
                 return 0  # 左上
@@ -4059,8 +4817,8 @@ class Game(BaseGame):
 
     def _calculate_quadrant_centers(self):
         """计算每个象限的中心点"""
-        mid_x = SCREEN_WIDTH / 2
-        mid_y = SCREEN_HEIGHT / 2
+        mid_x = WORLD_WIDTH / 2
+        mid_y = WORLD_HEIGHT / 2
         margin = 100  # 距离边缘的安全距离
         
         return [
@@ -4073,8 +4831,8 @@ class Game(BaseGame):
     def _adjust_edge_movement(self, player, move_x, move_y):
         """调整边缘移动，避免不必要地靠近边缘"""
         # 计算到地图中心的距离
-        center_x = SCREEN_WIDTH / 2
-        center_y = SCREEN_HEIGHT / 2
+        center_x = WORLD_WIDTH / 2
+        center_y = WORLD_HEIGHT / 2
         dx_to_center = center_x - player.x
         dy_to_center = center_y - player.y
         dist_to_center = math.sqrt(dx_to_center * dx_to_center + dy_to_center * dy_to_center)
@@ -4087,9 +4845,9 @@ class Game(BaseGame):
         # 计算到边缘的距离
         edge_margin = 100  # 边缘安全距离
         dist_to_left = player.x
-        dist_to_right = SCREEN_WIDTH - player.x
+        dist_to_right = WORLD_WIDTH - player.x
         dist_to_top = player.y
-        dist_to_bottom = SCREEN_HEIGHT - player.y
+        dist_to_bottom = WORLD_HEIGHT - player.y
         
         # 如果太靠近边缘，调整移动方向
         if dist_to_left < edge_margin and move_x < 0:
@@ -4150,7 +4908,7 @@ class Game(BaseGame):
                             move_y /= length
                 else:
                     # 如果距离为0，随机选择一个方向
-                    angle = random.uniform(0, 2 * math.pi)
+                    angle = self.agent_rng.uniform(0, 2 * math.pi)
                     move_x = math.cos(angle)
                     move_y = math.sin(angle)
         
@@ -4161,9 +4919,9 @@ class Game(BaseGame):
         edge_margin = 100  # 边缘判定距离
         return (
             player.x < edge_margin or 
-            player.x > SCREEN_WIDTH - edge_margin or 
+            player.x > WORLD_WIDTH - edge_margin or 
             player.y < edge_margin or 
-            player.y > SCREEN_HEIGHT - edge_margin
+            player.y > WORLD_HEIGHT - edge_margin
         )
 
     def _smooth_movement(self, new_x, new_y):
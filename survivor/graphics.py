@@ -86,6 +86,12 @@ class Frame:
     def add_cross(self, cross: Cross):
         self.objects.append(cross)
 
+    def translate(self, dx, dy, start=0):
+        """Shift the objects added since index start by (dx, dy), e.g. from world to screen coordinates"""
+        for obj in self.objects[start:]:
+            obj.x += dx
+            obj.y += dy
+
     def serialize(self):
         serialized_objects = [vars(obj) for obj in self.objects]
         return json.dumps(serialized_objects)
@@ -1,17 +1,13 @@
-class HealthSystem:
-    def __init__(self, base_hp=20, max_hp=None):
-        """
-        Initialize the health system for a character.
-        
-        Args:
-            base_hp (int): The base health points for the character, default is 100.
-            max_hp (int): The maximum health points, defaults to base_hp if not specified.
-        """
-        self.base_hp = base_hp
-        self.max_hp = max_hp if max_hp is not None else base_hp
-        self.current_hp = self.max_hp
-        self.is_alive = True
-    
+class HealthMixin:
+    """
+    Health behaviour shared by HealthSystem and by particle records that
+    store their hit points inline.
+
+    Subclasses provide the base_hp, max_hp, current_hp and is_alive
+    attributes.
+    """
+    __slots__ = ()
+
     def take_damage(self, damage_amount):
         """
         Apply damage to the character.
@@ -79,4 +75,39 @@ class HealthSystem:
         Reset health to maximum.
         """
         self.current_hp = self.max_hp
-        self.is_alive = True 
\ No newline at end of file
+        self.is_alive = True 
+
+
+class HealthSystem(HealthMixin):
+    __slots__ = ("base_hp", "max_hp", "current_hp", "is_alive")
+
+    def __init__(self, base_hp=20, max_hp=None):
+        """
+        Initialize the health system for a character.
+        
+        Args:
+            base_hp (int): The base health points for the character, default is 100.
+            max_hp (int): The maximum health points, defaults to base_hp if not specified.
+        """
+        self.base_hp = base_hp
+        self.max_hp = max_hp if max_hp is not None else base_hp
+        self.current_hp = self.max_hp
+        self.is_alive = True
+
+    def get_state(self):
+        """
+        Capture the health values for a game snapshot.
+
+        Returns:
+            tuple: (base_hp, max_hp, current_hp, is_alive).
+        """
+        return self.base_hp, self.max_hp, self.current_hp, self.is_alive
+
+    def set_state(self, state):
+        """
+        Load health values captured by get_state.
+
+        Args:
+            state (tuple): (base_hp, max_hp, current_hp, is_alive).
+        """
+        self.base_hp, self.max_hp, self.current_hp, self.is_alive = state
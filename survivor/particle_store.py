@@ -0,0 +1,150 @@
+import numpy as np
+
+
+class ParticleStore:
+    """
+    Columnar (structure-of-arrays) storage for particle state.
+
+    Every particle bound to the store owns one row. Float columns hold the
+    position, velocity, hit points and speed; integer columns hold the
+    per-frame timers. Rows are recycled through a free list, so a row index
+    stays valid for the whole lifetime of its particle and bulk systems can
+    work on whole columns (``store.x[rows] += store.vx[rows]``).
+    """
+
+    FLOAT_COLUMNS = ("x", "y", "vx", "vy", "hp", "speed")
+    # Frame counts, always whole numbers; RowAttributes rejects fractional writes
+    # instead of letting the int32 column truncate them
+    TIMER_COLUMNS = (
+        "knockback_timer",
+        "white_effect_timer",
+        "blink_timer",
+        "death_anim_timer",
+        "lifetime",
+    )
+    # Attribute keys that live in a column instead of the attribute dict
+    ATTRIBUTE_COLUMNS = ("vx", "vy", "speed") + TIMER_COLUMNS
+
+    def __init__(self, capacity=256):
+        """
+        Initialize an empty store.
+
+        Args:
+            capacity (int): Number of rows to preallocate. The store grows
+                automatically when more rows are needed.
+        """
+        self.capacity = max(1, int(capacity))
+        self.size = 0  # High-water mark: rows [0, size) have been handed out
+        self._free = []
+        self.kind_codes = {}
+        self.kind_names = []
+        self.kind = np.full(self.capacity, -1, dtype=np.int16)
+        self.alive = np.zeros(self.capacity, dtype=bool)
+        for name in self.FLOAT_COLUMNS:
+            setattr(self, name, np.zeros(self.capacity, dtype=np.float64))
+        for name in self.TIMER_COLUMNS:
+            setattr(self, name, np.zeros(self.capacity, dtype=np.int32))
+
+    def columns(self):
+        """Return the names of all per-row columns."""
+        return ("kind", "alive") + self.FLOAT_COLUMNS + self.TIMER_COLUMNS
+
+    def kind_code(self, kind):
+        """Return the integer code for a particle kind, registering it if new."""
+        code = self.kind_codes.get(kind)
+        if code is None:
+            code = len(self.kind_names)
+            self.kind_codes[kind] = code
+            self.kind_names.append(kind)
+        return code
+
+    def alloc(self, kind):
+        """
+        Reserve a zeroed row for a particle of the given kind.
+
+        Returns:
+            int: The row index.
+        """
+        if self._free:
+            row = self._free.pop()
+        else:
+            if self.size == self.capacity:
+                self._grow(self.capacity * 2)
+            row = self.size
+            self.size += 1
+        for name in self.FLOAT_COLUMNS + self.TIMER_COLUMNS:
+            getattr(self, name)[row] = 0
+        self.kind[row] = self.kind_code(kind)
+        self.alive[row] = True
+        return row
+
+    def release(self, row):
+        """Return a row to the free list."""
+        if not self.alive[row]:
+            return
+        self.alive[row] = False
+        self.kind[row] = -1
+        self._free.append(row)
+
+    def clear(self):
+        """Release every row."""
+        self.size = 0
+        self._free = []
+        self.kind[:] = -1
+        self.alive[:] = False
+
+    def get_state(self):
+        """
+        Copy every column and the row bookkeeping for a game snapshot.
+
+        Returns:
+            tuple: Opaque state for set_state.
+        """
+        return (
+            self.size,
+            list(self._free),
+            dict(self.kind_codes),
+            list(self.kind_names),
+            {name: getattr(self, name).copy() for name in self.columns()},
+        )
+
+    def set_state(self, state):
+        """Load a state captured by get_state; the state is left untouched."""
+        size, free, kind_codes, kind_names, columns = state
+        self.size = size
+        self._free = list(free)
+        self.kind_codes = dict(kind_codes)
+        self.kind_names = list(kind_names)
+        for name, values in columns.items():
+            column = getattr(self, name)
+            if len(column) == len(values):
+                np.copyto(column, values)
+            else:
+                setattr(self, name, values.copy())
+        self.capacity = len(self.kind)
+
+    def rows(self, kind=None):
+        """
+        Get the indices of all live rows, optionally restricted to one kind.
+
+        Args:
+            kind (str, optional): Particle kind to filter on.
+
+        Returns:
+            np.ndarray: Row indices in ascending order.
+        """
+        if kind is None:
+            return np.flatnonzero(self.alive[:self.size])
+        code = self.kind_codes.get(kind)
+        if code is None:
+            return np.empty(0, dtype=np.intp)
+        return np.flatnonzero(self.kind[:self.size] == code)
+
+    def _grow(self, new_capacity):
+        for name in self.columns():
+            old = getattr(self, name)
+            fill = -1 if name == "kind" else 0
+            new = np.full(new_capacity, fill, dtype=old.dtype)
+            new[:self.capacity] = old
+            setattr(self, name, new)
+        self.capacity = new_capacity
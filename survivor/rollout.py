@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Run many survivor episodes on a process pool.
+
+Usage: python rollout.py [episodes] [workers] [max_frames]
+"""
+import contextlib
+import io
+import multiprocessing
+import sys
+import time
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from games.survivor import (
+    ENEMY,
+    ENEMY_ELITE,
+    MAX_ENEMIES,
+    PLAYER,
+    STATE_GAME_OVER,
+    STATE_PLAYING,
+    STATE_UPGRADE_MENU,
+    Game,
+)
+
+# 每帧观测：玩家特征，后面是最多OBS_ENEMIES个敌人的(x, y, 是否精英)，空位为NaN
+OBS_PLAYER_FEATURES = ("x", "y", "hp", "level", "score")
+OBS_ENEMIES = MAX_ENEMIES
+OBS_SIZE = len(OBS_PLAYER_FEATURES) + 3 * OBS_ENEMIES
+
+
+@dataclass
+class EpisodeResult:
+    """Metrics of one finished episode"""
+    index: int  # 在seeds中的下标，也是ObservationBuffer中的行
+    seed: int
+    frames: int  # 存活帧数
+    kills: int
+    elite_kills: int
+    level: int
+    score: int
+    game_over: bool  # False表示帧数预算用完
+    steps_per_second: float
+
+
+class ObservationBuffer:
+    """
+    Shared-memory array of per-frame observations, shape (episodes, max_frames, OBS_SIZE).
+
+    Workers attach to the block by name and write their episode's rows in
+    place, so observations never go through pickling. The creating process
+    owns the block: call close() and unlink() (or use it as a context
+    manager) when done. Rows past an episode's frame count stay NaN.
+    """
+
+    def __init__(self, num_episodes, max_frames, name=None):
+        """
+        Create a new block, or attach to an existing one by name.
+
+        Args:
+            num_episodes (int): Number of episodes (rows).
+            max_frames (int): Frames per episode.
+            name (str, optional): Name of an existing block to attach to.
+        """
+        self.shape = (num_episodes, max_frames, OBS_SIZE)
+        size = int(np.prod(self.shape)) * np.dtype(np.float32).itemsize
+        self.owner = name is None
+        self.memory = shared_memory.SharedMemory(name=name, create=self.owner, size=size)
+        self.array = np.ndarray(self.shape, dtype=np.float32, buffer=self.memory.buf)
+        if self.owner:
+            self.array.fill(np.nan)
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def close(self):
+        """Detach from the block in this process."""
+        self.array = None
+        self.memory.close()
+
+    def unlink(self):
+        """Free the block; only the creating process should call this."""
+        self.memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        if self.owner:
+            self.unlink()
+
+
+def observe_frame(game, out):
+    """Write the game's current observation into out, a float array of OBS_SIZE."""
+    out.fill(np.nan)
+    player = game.get_particle(PLAYER)
+    if player is not None:
+        hp = player.health_system.current_hp if player.health_system else 0
+        out[:len(OBS_PLAYER_FEATURES)] = (player.x, player.y, hp, game.level, game.score)
+    enemies = [
+        (enemy.x, enemy.y, enemy.kind == ENEMY_ELITE)
+        for kind in (ENEMY, ENEMY_ELITE)
+        for enemy in game.particles_by_kind.get(kind, ())
+    ][:OBS_ENEMIES]
+    if enemies:
+        start = len(OBS_PLAYER_FEATURES)
+        out[start:start + 3 * len(enemies)] = np.array(enemies, dtype=np.float32).ravel()
+
+
+def run_episode(index, seed, agent=None, max_frames=3600, observations=None):
+    """
+    Play one episode to game over or the frame budget.
+
+    Args:
+        index (int): Episode index, the row written in observations.
+        seed (int): Game seed.
+        agent (callable, optional): agent(game, last_action) -> action list.
+            None uses the built-in Game.agent_action.
+        max_frames (int): Frame budget.
+        observations (np.ndarray, optional): (max_frames, OBS_SIZE) rows to
+            fill with one observation per frame.
+
+    Returns:
+        EpisodeResult: The episode's metrics.
+    """
+    game = Game(seed=seed)
+    game.reset_game()
+    game.game_state = STATE_PLAYING
+    action = [False, False, False, False, False]
+    frames = 0
+    start = time.perf_counter()
+    while frames < max_frames and game.game_state != STATE_GAME_OVER:
+        if agent is None:
+            action = game.agent_action(action)
+        elif game.game_state == STATE_UPGRADE_MENU:
+            game.resolve_menus()
+        else:
+            action = agent(game, action)
+        game.step(action)
+        if observations is not None:
+            observe_frame(game, observations[frames])
+        frames += 1
+    elapsed = time.perf_counter() - start
+    return EpisodeResult(
+        index,
+        seed,
+        frames,
+        game.kill_count,
+        game.elite_kill_count,
+        game.level,
+        game.score,
+        game.game_state == STATE_GAME_OVER,
+        frames / elapsed if elapsed > 0 else 0.0,
+    )
+
+
+def _worker(task):
+    """Pool entry point: run one episode, attaching to the observation buffer if any."""
+    index, seed, agent, max_frames, buffer_name, num_episodes, quiet = task
+    buffer = None if buffer_name is None else ObservationBuffer(num_episodes, max_frames, name=buffer_name)
+    try:
+        # 游戏逻辑打印很多日志，工作进程里默认丢弃
+        output = contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext()
+        with output:
+            return run_episode(
+                index, seed, agent, max_frames, None if buffer is None else buffer.array[index]
+            )
+    finally:
+        if buffer is not None:
+            buffer.close()
+
+
+def rollout(seeds, agent=None, max_frames=3600, workers=None, observations=None, quiet=True):
+    """
+    Run one episode per seed on a process pool, yielding results as episodes finish.
+
+    Args:
+        seeds (list): Game seeds, one episode each.
+        agent (callable, optional): Picklable agent(game, last_action) -> action
+            list; None uses the built-in Game.agent_action.
+        max_frames (int): Frame budget per episode.
+        workers (int, optional): Number of processes; defaults to the CPU
+            count. 1 runs the episodes in this process.
+        observations (ObservationBuffer, optional): Shared buffer of shape
+            (len(seeds), max_frames, OBS_SIZE) to record every frame into.
+        quiet (bool): Discard the game's console output.
+
+    Yields:
+        EpisodeResult: One per seed, in completion order.
+    """
+    if observations is not None and observations.shape != (len(seeds), max_frames, OBS_SIZE):
+        raise ValueError("observation buffer shape does not match seeds and max_frames")
+    buffer_name = None if observations is None else observations.name
+    tasks = [
+        (index, seed, agent, max_frames, buffer_name, len(seeds), quiet)
+        for index, seed in enumerate(seeds)
+    ]
+    if workers == 1:
+        for task in tasks:
+            yield _worker(task)
+        return
+    with multiprocessing.Pool(workers) as pool:
+        yield from pool.imap_unordered(_worker, tasks)
+
+
+def main():
+    episodes = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    max_frames = int(sys.argv[3]) if len(sys.argv) > 3 else 3600
+    print("运行 {} 局, 每局最多 {} 帧".format(episodes, max_frames))
+    start = time.perf_counter()
+    total_frames = 0
+    for result in rollout(list(range(episodes)), max_frames=max_frames, workers=workers):
+        total_frames += result.frames
+        print("seed {:>4}: {:>5} 帧, 击杀 {:>4}, 等级 {:>2}, 分数 {:>5}, {:.0f} 步/秒{}".format(
+            result.seed, result.frames, result.kills, result.level, result.score,
+            result.steps_per_second, " (死亡)" if result.game_over else "",
+        ))
+    elapsed = time.perf_counter() - start
+    print("总计 {} 帧, {:.1f} 秒, {:.0f} 步/秒".format(total_frames, elapsed, total_frames / elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,56 +1,61 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-import sys
+import argparse
 import time
 import importlib
 
-def run(game_name, fps=60):
-    """运行游戏的核心逻辑，但不显示UI"""
+from throughput import StepTimer
+
+def run(game_name, fps=60, turbo=False, max_frames=None, max_seconds=None, clock=time.perf_counter):
+    """运行游戏的核心逻辑，但不显示UI
+
+    turbo模式下不等待帧率，尽可能快地运行；max_frames/max_seconds限制运行长度，
+    clock是可替换的计时函数（返回秒）。结束时打印吞吐量统计。
+    """
     # 导入游戏模块
     module_name = "games." + game_name
     game_module = importlib.import_module(module_name)
     game_state = game_module.Game()
     game_state.reset_level()
-    
+
     # 设置游戏状态为正在游戏
     game_state.game_state = "playing"
-    
-    print("开始运行游戏 {}...".format(game_name))
-    
+
+    print("开始运行游戏 {}{}...".format(game_name, " (turbo)" if turbo else ""))
+
     last_action = [False, False, False, False, False]
     frame_time = 1.0 / fps
-    
+    timer = StepTimer(max_frames, max_seconds, clock)
+
     try:
-        while True:
-            start_time = time.time()
-            
+        while not timer.done():
+            start_time = clock()
+
             # 更新游戏状态
-            game_state.step(last_action)
-            
+            timer.step(game_state, last_action)
+
             # 如果是代理控制，获取代理动作
             new_action = game_state.agent_action(last_action)
             last_action = new_action
-            
+
             # 控制帧率
-            elapsed = time.time() - start_time
-            sleep_time = max(0, frame_time - elapsed)
-            time.sleep(sleep_time)
+            if not turbo:
+                elapsed = clock() - start_time
+                sleep_time = max(0, frame_time - elapsed)
+                time.sleep(sleep_time)
     except KeyboardInterrupt:
         print("\n游戏已停止")
-    
+
     print("游戏结束")
+    return timer.report(game_state)
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        game_name = sys.argv[1]
-    else:
-        game_name = "survivor"
-    
-    fps = 60
-    if len(sys.argv) > 2:
-        try:
-            fps = int(sys.argv[2])
-        except ValueError:
-            pass
-    
-    run(game_name, fps) 
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("game_name", nargs="?", default="survivor", help="The name of the game to run")
+    parser.add_argument("fps", nargs="?", type=int, default=60, help="Target frame rate")
+    parser.add_argument("-t", "--turbo", action="store_true", help="Step as fast as possible")
+    parser.add_argument("-f", "--frames", type=int, help="Stop after this many frames")
+    parser.add_argument("-s", "--seconds", type=float, help="Stop after this many seconds")
+    args = parser.parse_args()
+
+    run(args.game_name, args.fps, args.turbo, args.frames, args.seconds)
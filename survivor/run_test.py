@@ -1,10 +1,14 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 import importlib
+import sys
 import time
 import random
 
-def run_test():
+from throughput import StepTimer
+
+def run_test(num_frames=600, turbo=False, max_seconds=None, clock=time.perf_counter):
+    """运行游戏逻辑测试；turbo模式下不等待帧率，结束时打印吞吐量统计"""
     # 导入游戏模块
     module_name = "games.survivor"
     game_module = importlib.import_module(module_name)
@@ -59,10 +63,11 @@ def run_test():
                     game_state.spawn_aura(player, name, level)
     
     # 运行游戏逻辑一段时间
-    num_frames = 600  # 运行10秒
     actions = [False, False, False, False, False]
+    timer = StepTimer(num_frames, max_seconds, clock)
     
-    for frame in range(num_frames):
+    while not timer.done():
+        frame = timer.frames
         # 随机移动方向
         if frame % 30 == 0:  # 每半秒改变一次方向
             move_left = random.choice([True, False])
@@ -72,7 +77,7 @@ def run_test():
             actions = [move_left, move_right, move_up, move_down, False]
         
         # 更新游戏逻辑
-        game_state.step(actions)
+        timer.step(game_state, actions)
         
         # 每隔一段时间输出状态
         if frame % 60 == 0:
@@ -86,9 +91,13 @@ def run_test():
                     hp = enemy.health_system.current_hp
                     print(f"  敌人 {i+1} HP: {hp}")
         
-        time.sleep(1 / 60)  # 保持60帧的帧率
+        if not turbo:
+            time.sleep(1 / 60)  # 保持60帧的帧率
     
     print("测试完成！")
+    return timer.report(game_state)
 
 if __name__ == "__main__":
-    run_test() 
\ No newline at end of file
+    # python run_test.py [帧数] [turbo]
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+    run_test(frames, turbo=len(sys.argv) > 2 and sys.argv[2] == "turbo") 
\ No newline at end of file
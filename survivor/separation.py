@@ -0,0 +1,84 @@
+import numpy as np
+
+# Neighbour cell offsets; with cells at least as wide as the largest
+# interaction range, every close pair lies in the same or an adjacent cell
+_OFFSETS = [(ox, oy) for ox in (-1, 0, 1) for oy in (-1, 0, 1)]
+
+
+def neighbor_pairs(x, y, reach, group=None):
+    """
+    Find every pair of points closer than the sum of their reaches.
+
+    Points are binned into square cells (cell index, argsort, bincount) as
+    wide as the largest possible interaction range, so each point is only
+    tested against the points in its own and the eight neighbouring cells.
+    All work is done on whole arrays. With group, every group gets its own
+    block of cells, so points from different groups (for example different
+    games batched together) never pair up.
+
+    Args:
+        x (np.ndarray): X coordinates, shape (N,).
+        y (np.ndarray): Y coordinates, shape (N,).
+        reach (np.ndarray): Per-point reach; i and j interact when their
+            distance is below reach[i] + reach[j].
+        group (np.ndarray, optional): Non-negative integer group per point;
+            only points of the same group interact.
+
+    Returns:
+        tuple: (i, j, dx, dy, dist) arrays with one entry per interacting
+        pair, i < j, dx = x[j] - x[i] and dy = y[j] - y[i].
+    """
+    n = len(x)
+    empty = np.empty(0, dtype=np.intp)
+    if n < 2:
+        return empty, empty, np.empty(0), np.empty(0), np.empty(0)
+    cell_size = 2.0 * float(reach.max())
+    if cell_size <= 0:
+        return empty, empty, np.empty(0), np.empty(0), np.empty(0)
+
+    cx = np.floor(x / cell_size).astype(np.int64)
+    cy = np.floor(y / cell_size).astype(np.int64)
+    # One cell of padding on every side so neighbour lookups stay in range
+    cx -= cx.min() - 1
+    cy -= cy.min() - 1
+    rows = int(cy.max()) + 2
+    cols = int(cx.max()) + 2
+    if group is not None:
+        # 每组占一段独立的列（含两侧填充），相邻格子不会跨组
+        cx += np.asarray(group, dtype=np.int64) * cols
+        cols *= int(np.max(group)) + 1
+    num_cells = cols * rows
+    cell = cx * rows + cy
+
+    order = np.argsort(cell, kind="stable")
+    counts = np.bincount(cell, minlength=num_cells)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    pair_i = []
+    pair_j = []
+    for ox, oy in _OFFSETS:
+        neighbor = cell + ox * rows + oy
+        count = counts[neighbor]
+        total = int(count.sum())
+        if total == 0:
+            continue
+        # For point p, candidates are order[starts[neighbor[p]] + 0..count[p]-1]
+        i = np.repeat(np.arange(n), count)
+        offsets = np.arange(total) - np.repeat(np.cumsum(count) - count, count)
+        j = order[np.repeat(starts[neighbor], count) + offsets]
+        keep = i < j
+        pair_i.append(i[keep])
+        pair_j.append(j[keep])
+    if not pair_i:
+        return empty, empty, np.empty(0), np.empty(0), np.empty(0)
+    i = np.concatenate(pair_i)
+    j = np.concatenate(pair_j)
+
+    dx = x[j] - x[i]
+    dy = y[j] - y[i]
+    dist = np.sqrt(dx * dx + dy * dy)
+    close = dist < reach[i] + reach[j]
+    i, j, dx, dy, dist = i[close], j[close], dx[close], dy[close], dist[close]
+    # Keep pairs sorted by (i, j) so results do not depend on cell layout
+    pair_order = np.lexsort((j, i))
+    return i[pair_order], j[pair_order], dx[pair_order], dy[pair_order], dist[pair_order]
@@ -0,0 +1,135 @@
+import numpy as np
+
+
+class SlotTable:
+    """
+    Stable integer slots for a changing set of entities, with per-slot columns.
+
+    An entity gets a free slot when it is added and keeps it until it is
+    released, so per-entity state can live in NumPy columns indexed by slot
+    instead of dicts keyed by id. Releasing an entity resets its row in every
+    column to the column's fill value: nothing outlives its entity, and the
+    columns only grow with the peak number of live entities. Columns are
+    reallocated when the table grows, so fetch them from self.columns each
+    time instead of keeping a reference across frames.
+    """
+
+    def __init__(self, capacity=64):
+        """
+        Initialize an empty table.
+
+        Args:
+            capacity (int): Number of slots to preallocate; the table doubles
+                when it runs out.
+        """
+        self.capacity = max(1, int(capacity))
+        self.slots = {}  # entity -> slot
+        self.free = list(range(self.capacity - 1, -1, -1))  # 栈顶是最小的空闲槽位
+        self.columns = {}  # name -> np.ndarray, indexed by slot
+        self.fills = {}  # name -> value of an unused row
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __contains__(self, entity):
+        return entity in self.slots
+
+    def add(self, entity):
+        """
+        Give an entity a slot.
+
+        Returns:
+            int: The slot; an entity that already has one keeps it.
+        """
+        slot = self.slots.get(entity)
+        if slot is not None:
+            return slot
+        if not self.free:
+            self._grow(self.capacity * 2)
+        slot = self.slots[entity] = self.free.pop()
+        return slot
+
+    def release(self, entity):
+        """Free an entity's slot and reset its row in every column; unknown entities are ignored."""
+        slot = self.slots.pop(entity, None)
+        if slot is None:
+            return
+        for name, column in self.columns.items():
+            column[slot] = self.fills[name]
+        self.free.append(slot)
+
+    def clear(self):
+        """Release every entity, keeping the columns."""
+        self.slots = {}
+        self.free = list(range(self.capacity - 1, -1, -1))
+        for name, column in self.columns.items():
+            column[:] = self.fills[name]
+
+    def slots_of(self, entities):
+        """Return the slots of a sequence of entities as an index array."""
+        slots = self.slots
+        return np.fromiter((slots[entity] for entity in entities), dtype=np.intp, count=len(entities))
+
+    def add_column(self, name, dtype=np.float64, fill=0):
+        """
+        Create a column, or return the existing one with that name.
+
+        Args:
+            name (hashable): Column name.
+            dtype: NumPy dtype of the column.
+            fill: Value of rows that belong to no entity.
+
+        Returns:
+            np.ndarray: The column, indexed by slot.
+        """
+        column = self.columns.get(name)
+        if column is None:
+            column = self.columns[name] = np.full(self.capacity, fill, dtype=dtype)
+            self.fills[name] = fill
+        return column
+
+    def drop_column(self, name):
+        """Delete a column; missing columns are ignored."""
+        self.columns.pop(name, None)
+        self.fills.pop(name, None)
+
+    def _grow(self, capacity):
+        old = self.capacity
+        for name, column in self.columns.items():
+            grown = np.full(capacity, self.fills[name], dtype=column.dtype)
+            grown[:old] = column
+            self.columns[name] = grown
+        self.free.extend(range(capacity - 1, old - 1, -1))
+        self.capacity = capacity
+
+    def get_state(self, index_of):
+        """
+        Capture the slot assignment and every column for a game snapshot.
+
+        Args:
+            index_of (callable): Maps an entity to a value restore can map back.
+
+        Returns:
+            tuple: Opaque state for set_state.
+        """
+        return (
+            self.capacity,
+            [(index_of(entity), slot) for entity, slot in self.slots.items()],
+            list(self.free),
+            {name: (column.copy(), self.fills[name]) for name, column in self.columns.items()},
+        )
+
+    def set_state(self, state, entity_at):
+        """
+        Load a state captured by get_state; the state is left untouched.
+
+        Args:
+            state (tuple): Output of get_state.
+            entity_at (callable): Maps a saved index back to an entity.
+        """
+        capacity, slots, free, columns = state
+        self.capacity = capacity
+        self.slots = {entity_at(index): slot for index, slot in slots}
+        self.free = list(free)
+        self.columns = {name: column.copy() for name, (column, _) in columns.items()}
+        self.fills = {name: fill for name, (_, fill) in columns.items()}
@@ -0,0 +1,291 @@
+import heapq
+import math
+
+
+class SpatialHash:
+    """
+    Persistent uniform-grid index of entities, split into layers.
+
+    Entities (anything with ``x`` and ``y``) stay in their cell between
+    frames; update() only moves the ones whose position crossed a cell
+    boundary since the last call. Cells are dict keys, so any coordinate,
+    including far off screen or negative, maps to a valid cell. Each cell
+    keeps its entities in insertion order, which keeps queries
+    deterministic.
+    """
+
+    def __init__(self, cell_size=100, layers=()):
+        """
+        Initialize an empty index.
+
+        Args:
+            cell_size (float): Width and height of one cell.
+            layers (iterable): Layer names to create up front. Unknown layers
+                are created on first insert.
+        """
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive")
+        self.cell_size = cell_size
+        # layer -> {(cell_x, cell_y): {entity: None}}
+        self.layers = {layer: {} for layer in layers}
+        # entity -> (layer, cell) it is currently filed under
+        self.entries = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, entity):
+        return entity in self.entries
+
+    def cell_of(self, x, y):
+        """Return the (cell_x, cell_y) key containing a position."""
+        size = self.cell_size
+        return math.floor(x / size), math.floor(y / size)
+
+    def clear(self):
+        """Remove every entity, keeping the layers."""
+        for layer in self.layers:
+            self.layers[layer] = {}
+        self.entries = {}
+
+    def insert(self, entity, layer):
+        """File an entity under a layer at its current position."""
+        if entity in self.entries:
+            self.remove(entity)
+        cell = self.cell_of(entity.x, entity.y)
+        cells = self.layers.get(layer)
+        if cells is None:
+            cells = self.layers[layer] = {}
+        bucket = cells.get(cell)
+        if bucket is None:
+            bucket = cells[cell] = {}
+        bucket[entity] = None
+        self.entries[entity] = (layer, cell)
+
+    def remove(self, entity):
+        """Drop an entity from the index; unknown entities are ignored."""
+        entry = self.entries.pop(entity, None)
+        if entry is None:
+            return
+        layer, cell = entry
+        cells = self.layers[layer]
+        bucket = cells[cell]
+        del bucket[entity]
+        if not bucket:
+            del cells[cell]
+
+    def move(self, entity):
+        """
+        Re-file an entity if it left its cell.
+
+        Returns:
+            bool: True if the entity changed cells.
+        """
+        layer, cell = self.entries[entity]
+        new_cell = self.cell_of(entity.x, entity.y)
+        if new_cell == cell:
+            return False
+        cells = self.layers[layer]
+        bucket = cells[cell]
+        del bucket[entity]
+        if not bucket:
+            del cells[cell]
+        bucket = cells.get(new_cell)
+        if bucket is None:
+            bucket = cells[new_cell] = {}
+        bucket[entity] = None
+        self.entries[entity] = (layer, new_cell)
+        return True
+
+    def update(self):
+        """
+        Move every entity that crossed a cell boundary since the last update.
+
+        Returns:
+            int: Number of entities that changed cells.
+        """
+        size = self.cell_size
+        floor = math.floor
+        moved = []
+        for entity, (layer, cell) in self.entries.items():
+            new_cell = (floor(entity.x / size), floor(entity.y / size))
+            if new_cell != cell:
+                moved.append(entity)
+        for entity in moved:
+            self.move(entity)
+        return len(moved)
+
+    def _layer_cells(self, layers):
+        if layers is None:
+            return list(self.layers.values())
+        if isinstance(layers, str):
+            layers = (layers,)
+        return [self.layers[layer] for layer in layers if layer in self.layers]
+
+    def _candidates(self, layer_cells, x0, y0, x1, y1):
+        cx0, cy0 = self.cell_of(x0, y0)
+        cx1, cy1 = self.cell_of(x1, y1)
+        found = []
+        for cells in layer_cells:
+            if not cells:
+                continue
+            if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(cells):
+                # Query wider than the populated area: walk the cells instead
+                for (cx, cy), bucket in cells.items():
+                    if cx0 <= cx <= cx1 and cy0 <= cy <= cy1:
+                        found.extend(bucket)
+                continue
+            for cx in range(cx0, cx1 + 1):
+                for cy in range(cy0, cy1 + 1):
+                    bucket = cells.get((cx, cy))
+                    if bucket:
+                        found.extend(bucket)
+        return found
+
+    def nearby(self, x, y, radius, layers=None):
+        """
+        Broadphase candidates: every entity in the cells overlapping a square.
+
+        Cheaper than query_radius; callers that run their own narrowphase
+        test use this.
+
+        Args:
+            x (float): Query center x.
+            y (float): Query center y.
+            radius (float): Half width of the square.
+            layers (str or iterable, optional): Layers to search, all if None.
+
+        Returns:
+            list: Candidate entities, possibly farther than radius.
+        """
+        return self._candidates(self._layer_cells(layers), x - radius, y - radius, x + radius, y + radius)
+
+    def nearby_many(self, points, radii, layers=None):
+        """
+        Run nearby() for a batch of query squares.
+
+        Args:
+            points (sequence): (x, y) query centers.
+            radii (sequence): Half width of each query square.
+            layers (str or iterable, optional): Layers to search, all if None.
+
+        Returns:
+            list: One candidate list per query, in query order.
+        """
+        layer_cells = self._layer_cells(layers)
+        return [
+            self._candidates(layer_cells, x - radius, y - radius, x + radius, y + radius)
+            for (x, y), radius in zip(points, radii)
+        ]
+
+    def query_rect(self, x0, y0, x1, y1, layers=None):
+        """Return the entities whose position lies inside the rectangle [x0, x1] x [y0, y1]."""
+        return [
+            entity for entity in self._candidates(self._layer_cells(layers), x0, y0, x1, y1)
+            if x0 <= entity.x <= x1 and y0 <= entity.y <= y1
+        ]
+
+    def query_radius(self, x, y, radius, layers=None):
+        """Return the entities within radius of (x, y)."""
+        radius_sq = radius * radius
+        return [
+            entity for entity in self.nearby(x, y, radius, layers)
+            if (entity.x - x) ** 2 + (entity.y - y) ** 2 <= radius_sq
+        ]
+
+    def k_nearest(self, x, y, k, layers=None, max_radius=None):
+        """
+        Return up to k entities nearest to (x, y), closest first.
+
+        Searches rings of cells outward from the query cell and stops once
+        the k-th best distance is inside the area already covered.
+
+        Args:
+            x (float): Query x.
+            y (float): Query y.
+            k (int): Number of entities wanted.
+            layers (str or iterable, optional): Layers to search, all if None.
+            max_radius (float, optional): Ignore entities farther than this.
+
+        Returns:
+            list: Entities sorted by distance.
+        """
+        layer_cells = self._layer_cells(layers)
+        total = sum(len(bucket) for cells in layer_cells for bucket in cells.values())
+        if k <= 0 or total == 0:
+            return []
+        size = self.cell_size
+        cx, cy = self.cell_of(x, y)
+        max_ring = None if max_radius is None else int(max_radius // size) + 1
+        found = []  # (distance squared, order, entity)
+        seen = 0
+        ring = 0
+        while True:
+            for cells in layer_cells:
+                for gx, gy in _ring_cells(cx, cy, ring):
+                    bucket = cells.get((gx, gy))
+                    if not bucket:
+                        continue
+                    for entity in bucket:
+                        seen += 1
+                        found.append(((entity.x - x) ** 2 + (entity.y - y) ** 2, len(found), entity))
+            # Everything within ring * size of the query point has been seen
+            covered = ring * size
+            best = heapq.nsmallest(k, found)
+            if seen == total or (len(best) == k and best[-1][0] <= covered * covered):
+                break
+            if max_ring is not None and ring >= max_ring:
+                break
+            ring += 1
+        if max_radius is not None:
+            limit = max_radius * max_radius
+            best = [item for item in best if item[0] <= limit]
+        return [entity for _, _, entity in best]
+
+    def get_state(self, index_of):
+        """
+        Capture the cell layout for a game snapshot.
+
+        Args:
+            index_of (callable): Maps an entity to a value restore can map back.
+
+        Returns:
+            list: [(layer, cell, [indices])] in filing order.
+        """
+        return [
+            (layer, cell, [index_of(entity) for entity in bucket])
+            for layer, cells in self.layers.items()
+            for cell, bucket in cells.items()
+        ]
+
+    def set_state(self, state, entity_at):
+        """
+        Rebuild the index from get_state output.
+
+        Args:
+            state (list): Output of get_state.
+            entity_at (callable): Maps a saved index back to an entity.
+        """
+        self.clear()
+        for layer, cell, indices in state:
+            cells = self.layers.get(layer)
+            if cells is None:
+                cells = self.layers[layer] = {}
+            bucket = cells[cell] = {}
+            for index in indices:
+                entity = entity_at(index)
+                bucket[entity] = None
+                self.entries[entity] = (layer, cell)
+
+
+def _ring_cells(cx, cy, ring):
+    """Yield the cells at Chebyshev distance ring from (cx, cy)."""
+    if ring == 0:
+        yield cx, cy
+        return
+    for gx in range(cx - ring, cx + ring + 1):
+        yield gx, cy - ring
+        yield gx, cy + ring
+    for gy in range(cy - ring + 1, cy + ring):
+        yield cx - ring, gy
+        yield cx + ring, gy
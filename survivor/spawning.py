@@ -0,0 +1,65 @@
+class SpawnDirector:
+    """
+    Queue of pending spawns, released a bounded number per frame.
+
+    Waves and refills request spawns instead of creating them on the spot,
+    and take() hands back at most budget of them per frame, oldest requests
+    first. A large wave is therefore spread over several frames instead of
+    landing in one, so frame times stay flat across wave boundaries. The
+    director only counts; the game decides what a spawn of a kind is.
+    """
+
+    def __init__(self, budget):
+        """
+        Initialize an empty queue.
+
+        Args:
+            budget (int): Most spawns released by one take() call.
+        """
+        self.budget = max(1, int(budget))
+        self.clear()
+
+    def clear(self):
+        """Drop every pending spawn."""
+        self.queue = []  # [kind, count]，按请求顺序
+
+    def request(self, count, kind):
+        """Queue count spawns of a kind; consecutive requests of one kind are merged."""
+        if count <= 0:
+            return
+        if self.queue and self.queue[-1][0] == kind:
+            self.queue[-1][1] += count
+        else:
+            self.queue.append([kind, count])
+
+    def pending(self, *kinds):
+        """Return the number of queued spawns of the given kinds, or of every kind if none are given."""
+        return sum(count for kind, count in self.queue if not kinds or kind in kinds)
+
+    def take(self):
+        """
+        Release this frame's spawns.
+
+        Returns:
+            list: (kind, count) pairs in request order, at most budget spawns
+            in total; they are removed from the queue.
+        """
+        released = []
+        budget = self.budget
+        while self.queue and budget > 0:
+            entry = self.queue[0]
+            count = min(entry[1], budget)
+            released.append((entry[0], count))
+            budget -= count
+            entry[1] -= count
+            if entry[1] == 0:
+                self.queue.pop(0)
+        return released
+
+    def get_state(self):
+        """Capture the queue for a game snapshot."""
+        return [tuple(entry) for entry in self.queue]
+
+    def set_state(self, state):
+        """Load a state captured by get_state; the state is left untouched."""
+        self.queue = [list(entry) for entry in state]
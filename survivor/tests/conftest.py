@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+# 测试和run_*.py脚本一样从survivor目录导入模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from games.survivor import Game, STATE_PLAYING  # noqa: E402
+
+
+@pytest.fixture
+def make_game():
+    """Factory for seeded games that are already playing the first level."""
+    def make(seed=0, **kwargs):
+        game = Game(seed=seed, **kwargs)
+        game.game_state = STATE_PLAYING
+        game.reset_level()
+        return game
+    return make
@@ -0,0 +1,165 @@
+import types
+
+import numpy as np
+
+from games.survivor import (
+    ELITE_SIZE,
+    ENEMY,
+    ENEMY_ELITE,
+    ENEMY_SIZE,
+    KNOCKBACK_DURATION,
+    PLAYER,
+    STATE_PLAYING,
+    WEAPON_SIZE,
+    WEAPON_TYPES,
+    XP_DROP_CHANCE,
+    XP_GEM_VALUE,
+    subtract_hits,
+)
+
+
+def sequential_combat(self, player, pairs, hits):
+    """The hit-by-hit passes resolve_combat replaced, in their old order, as the reference"""
+    # 魔杖穿透命中
+    for i, weapon, damage in zip(hits.target, hits.weapon, hits.damage):
+        self.apply_damage(weapon, hits.enemies[i], damage)
+
+    # 直接碰撞：伤害、闪白、击退、伤害数字、死亡
+    contacts = pairs.projectile_enemy + [(c.aura, c.enemy) for c in pairs.aura_enemy if c.touching]
+    for weapon, enemy in contacts:
+        if weapon.removed or enemy.attributes.is_dying:
+            continue
+        old_hp = enemy.health_system.current_hp
+        enemy.attributes["white_effect_timer"] = 6
+        is_alive = self.apply_damage(weapon, enemy, weapon.attributes["damage"])
+        knockback_dx = enemy.x - player.x
+        knockback_dy = enemy.y - player.y
+        knockback_dist = (knockback_dx * knockback_dx + knockback_dy * knockback_dy) ** 0.5
+        if knockback_dist > 0:
+            knockback_dx /= knockback_dist
+            knockback_dy /= knockback_dist
+        else:
+            knockback_dx = self.combat_rng.uniform(-1, 1)
+            knockback_dy = self.combat_rng.uniform(-1, 1)
+        enemy.attributes["knockback_timer"] = KNOCKBACK_DURATION
+        enemy.attributes["knockback_dx"] = knockback_dx
+        enemy.attributes["knockback_dy"] = knockback_dy
+        self.spawn_damage_text(enemy.x, enemy.y, old_hp - enemy.health_system.current_hp)
+        if not is_alive:
+            self.score += 10
+            self.kill_count += 1
+            if enemy.kind == ENEMY_ELITE:
+                self.elite_kill_count += 1
+            if enemy.kind == ENEMY_ELITE or self.combat_rng.random() < XP_DROP_CHANCE:
+                self.spawn_xp(enemy.x, enemy.y, enemy.attributes.get("xp_value", XP_GEM_VALUE))
+            enemy.attributes["is_dying"] = True
+            enemy.attributes["death_anim_timer"] = 30
+            enemy.attributes["death_anim_size"] = ELITE_SIZE if enemy.kind == ENEMY_ELITE else ENEMY_SIZE
+            enemy.attributes["death_anim_white"] = True
+
+    # 光环：冷却到了才命中
+    contacts_by_aura = {}
+    for contact in pairs.aura_enemy:
+        if not contact.enemy.attributes.is_dying:
+            contacts_by_aura.setdefault(contact.aura, []).append(contact)
+    auras = self.weapon_systems["aura"]
+    for aura, contacts in contacts_by_aura.items():
+        if aura.removed:
+            continue
+        radius = aura.attributes.get("aura_radius")
+        if radius is None:
+            radius = WEAPON_SIZE * 2
+        contacts = [contact for contact in contacts if contact.dist <= radius]
+        if not contacts:
+            continue
+        slots = self.enemy_slots.slots_of([contact.enemy for contact in contacts])
+        next_hit = auras.hit_column(self.enemy_slots, aura)
+        ready = next_hit[slots] <= self.game_timer
+        if not ready.any():
+            continue
+        next_hit[slots[ready]] = self.game_timer + aura.attributes.get("cooldown", 78)
+        knockback = aura.attributes.get("knockback", 0)
+        for contact, hit in zip(contacts, ready.tolist()):
+            if not hit:
+                continue
+            enemy = contact.enemy
+            self.apply_damage(aura, enemy, aura.attributes.get("damage", 5))
+            if knockback > 0 and contact.dist > 0:
+                enemy.attributes["knockback_dx"] = contact.dx / contact.dist
+                enemy.attributes["knockback_dy"] = contact.dy / contact.dist
+                enemy.attributes["knockback_timer"] = 5
+
+    # 投射物二次命中与击退
+    for weapon, enemy in pairs.projectile_enemy:
+        if weapon.removed or enemy.attributes.is_dying:
+            continue
+        self.apply_damage(weapon, enemy, weapon.attributes.get("damage", 1))
+        if weapon.attributes.get("knockback", 1.0) > 0:
+            dx = enemy.x - weapon.x
+            dy = enemy.y - weapon.y
+            dist = (dx * dx + dy * dy) ** 0.5
+            if dist > 0:
+                enemy.attributes["knockback_timer"] = KNOCKBACK_DURATION
+                enemy.attributes["knockback_dx"] = dx / dist
+                enemy.attributes["knockback_dy"] = dy / dist
+    return
+    yield
+
+
+def combat_state(game):
+    enemies = sorted(
+        (
+            enemy.attributes.id,
+            enemy.health_system.current_hp,
+            enemy.health_system.is_alive,
+            enemy.attributes.is_dying,
+            enemy.attributes.get("white_effect_timer"),
+            enemy.attributes.get("knockback_timer"),
+            enemy.attributes.get("knockback_dx"),
+            enemy.attributes.get("knockback_dy"),
+        )
+        for kind in (ENEMY, ENEMY_ELITE)
+        for enemy in game.get_particles(kind)
+    )
+    return (
+        game.score,
+        game.kill_count,
+        game.elite_kill_count,
+        game.combat_rng.getstate(),
+        [np.asarray(column).tolist() for column in game.effects.get_state()],
+        game.encode(),
+        enemies,
+    )
+
+
+def test_subtract_hits_matches_hit_by_hit():
+    hp = np.array([10, 30, 5])
+    target = np.array([1, 0, 1, 2, 0, 1, 0])
+    damage = np.array([12, 4, 12, 3, 4, 12, 4])
+    remaining, after = subtract_hits(hp, target, damage)
+
+    current = hp.tolist()
+    expected = []
+    for i, d in zip(target.tolist(), damage.tolist()):
+        current[i] = max(0, current[i] - d)
+        expected.append(current[i])
+    assert after.tolist() == expected
+    assert remaining.tolist() == current
+
+
+def test_batched_combat_matches_sequential_passes(make_game):
+    games = [make_game(seed=3), make_game(seed=3)]
+    games[1].resolve_combat = types.MethodType(sequential_combat, games[1])
+    actions = []
+    for game in games:
+        game.get_particle(PLAYER).attributes["weapons"] = {w["name"]: 3 for w in WEAPON_TYPES}
+        actions.append([False] * 5)
+
+    for _ in range(900):
+        for k, game in enumerate(games):
+            if game.game_state != STATE_PLAYING:
+                game.resolve_menus()
+            actions[k] = game.agent_action(actions[k])
+            game.step(actions[k])
+        assert combat_state(games[0]) == combat_state(games[1])
+    assert games[0].kill_count > 0
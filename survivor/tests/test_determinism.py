@@ -0,0 +1,32 @@
+import pytest
+
+from collision_backends import COLLISION_BACKENDS, available_backends
+from games.survivor import PLAYER, STATE_PLAYING, WEAPON_TYPES
+
+
+def trajectory(game, frames=600):
+    game.get_particle(PLAYER).attributes["weapons"] = {w["name"]: 3 for w in WEAPON_TYPES}
+    actions = [False] * 5
+    states = []
+    for _ in range(frames):
+        if game.game_state != STATE_PLAYING:
+            game.resolve_menus()
+        actions = game.agent_action(actions)
+        game.step(actions)
+        states.append((game.encode(), game.score, game.xp, game.kill_count))
+    return states
+
+
+def test_same_seed_gives_the_same_trajectory(make_game):
+    first = trajectory(make_game(seed=7))
+    assert first[-1][3] > 0  # 有击杀，战斗和经验掉落的随机数都用到了
+    assert trajectory(make_game(seed=7)) == first
+    assert trajectory(make_game(seed=8)) != first
+
+
+@pytest.mark.parametrize("backend", [name for name in COLLISION_BACKENDS if name != "grid"])
+def test_collision_backends_give_the_same_trajectory(make_game, backend):
+    if backend not in available_backends():
+        pytest.skip(f"{backend} backend is not available")
+    expected = trajectory(make_game(seed=7, collision_backend="grid"))
+    assert trajectory(make_game(seed=7, collision_backend=backend)) == expected
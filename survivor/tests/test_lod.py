@@ -0,0 +1,25 @@
+from games.survivor import (
+    ENEMY, LAYER_ENEMIES, LOD_COLUMN, LOD_FAR, PLAYER, PLAYER_SIZE, SCREEN_HEIGHT, SCREEN_WIDTH,
+)
+
+
+def test_on_screen_enemy_is_hittable_with_player_in_world_corner(make_game):
+    game = make_game()
+    player = game.get_particle(PLAYER)
+    player.x = player.y = PLAYER_SIZE // 2
+    game.update_camera()
+
+    # 一个从远处走进视口对角的敌人：上一帧还在远档，不在碰撞索引里
+    game.spawn_enemies(1, ENEMY)
+    enemy = game.get_particles(ENEMY)[0]
+    enemy.x = game.camera.x + SCREEN_WIDTH - 1
+    enemy.y = game.camera.y + SCREEN_HEIGHT - 1
+    assert game.camera.contains(enemy.x, enemy.y)
+    game.enemy_slots.columns[LOD_COLUMN][game.enemy_slots.slots[enemy]] = LOD_FAR
+    game.collision.remove(enemy)
+
+    game.gather_enemies(player)
+    game.update_spatial_grid()
+
+    assert game.enemy_slots.columns[LOD_COLUMN][game.enemy_slots.slots[enemy]] != LOD_FAR
+    assert enemy in game.collision.nearby(enemy.x, enemy.y, 1, LAYER_ENEMIES)
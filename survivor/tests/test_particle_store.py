@@ -0,0 +1,16 @@
+import pytest
+
+from base_game import RowAttributes
+from particle_store import ParticleStore
+
+
+def test_timer_columns_reject_fractional_frame_counts():
+    store = ParticleStore()
+    attributes = RowAttributes(store, store.alloc("weapon"), {"lifetime": 60, "vx": 0.5})
+
+    attributes["lifetime"] = 30.0
+    assert attributes["lifetime"] == 30
+    with pytest.raises(ValueError):
+        attributes["lifetime"] = 29.5
+    assert attributes["lifetime"] == 30
+    assert attributes["vx"] == 0.5
@@ -0,0 +1,49 @@
+import pytest
+
+from games.survivor import PLAYER, STATE_PLAYING, WEAPON_TYPES
+
+
+def advance(game, actions):
+    if game.game_state != STATE_PLAYING:
+        game.resolve_menus()
+    actions = game.agent_action(actions)
+    game.step(actions)
+    return actions
+
+
+def play(game, actions, frames):
+    states = []
+    for _ in range(frames):
+        actions = advance(game, actions)
+        states.append((game.encode(), game.score, game.xp, game.kill_count, game.num_steps))
+    return states
+
+
+@pytest.mark.parametrize("use_store", [False, True])
+def test_restore_replays_the_same_frames(make_game, use_store):
+    game = make_game(seed=5, use_store=use_store)
+    game.get_particle(PLAYER).attributes["weapons"] = {w["name"]: 3 for w in WEAPON_TYPES}
+    play(game, [False] * 5, 300)
+
+    snapshot = game.snapshot()
+    first = play(game, [False] * 5, 300)
+    game.restore(snapshot)
+    second = play(game, [False] * 5, 300)
+    # 同一个快照可以恢复多次
+    game.restore(snapshot)
+    third = play(game, [False] * 5, 300)
+
+    assert first == second == third
+    assert first[0] != first[-1]
+
+
+@pytest.mark.parametrize("use_store", [False, True])
+def test_snapshot_restores_into_another_game(make_game, use_store):
+    game = make_game(seed=5, use_store=use_store)
+    game.get_particle(PLAYER).attributes["weapons"] = {w["name"]: 3 for w in WEAPON_TYPES}
+    play(game, [False] * 5, 300)
+
+    snapshot = game.snapshot()
+    other = make_game(seed=9, use_store=use_store)
+    other.restore(snapshot)
+    assert play(other, [False] * 5, 200) == play(game, [False] * 5, 200)
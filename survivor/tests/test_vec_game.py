@@ -0,0 +1,24 @@
+import numpy as np
+
+from vec_game import VecGame
+
+
+def run(batched, steps=400):
+    env = VecGame(4, seed=11, batched=batched)
+    actions = np.zeros((4, 5), dtype=bool)
+    for _ in range(steps):
+        observation, rewards, dones, info = env.step(actions)
+        actions = env.agent_actions(actions)
+    return observation, env.last_scores
+
+
+def test_batched_phases_match_stepping_each_game():
+    batched, batched_scores = run(True)
+    looped, looped_scores = run(False)
+    assert batched_scores.any()  # 有击杀，战斗阶段确实被合并执行过
+    np.testing.assert_array_equal(batched.game, looped.game)
+    np.testing.assert_array_equal(batched.kind, looped.kind)
+    np.testing.assert_array_equal(batched.x, looped.x)
+    np.testing.assert_array_equal(batched.y, looped.y)
+    np.testing.assert_array_equal(batched.player, looped.player)
+    np.testing.assert_array_equal(batched_scores, looped_scores)
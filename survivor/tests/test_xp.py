@@ -0,0 +1,56 @@
+import numpy as np
+
+from games.survivor import PLAYER, XP, XP_GEM_VALUE, XP_MAX_GEMS, XP_MERGE_DENSITY
+
+
+def gem_values(game):
+    return [xp.attributes.value for xp in game.get_particles(XP)]
+
+
+def test_dense_gem_field_merges_under_the_cap_and_keeps_its_value(make_game):
+    game = make_game(seed=1)
+    player = game.get_particle(PLAYER)
+    rng = np.random.default_rng(0)
+    for x, y, value in zip(
+        rng.uniform(player.x + 300, player.x + 1300, 500),
+        rng.uniform(player.y - 500, player.y + 500, 500),
+        rng.choice([XP_GEM_VALUE, 3 * XP_GEM_VALUE], 500),
+    ):
+        game.spawn_xp(x, y, int(value))
+    total = sum(gem_values(game))
+
+    removed = game.merge_xp()
+    game.flush_removals()
+
+    assert removed == 500 - game.count_particles(XP)
+    assert game.count_particles(XP) <= XP_MAX_GEMS
+    assert sum(gem_values(game)) == total
+
+
+def test_sparse_gems_only_merge_dense_cells(make_game):
+    game = make_game(seed=1)
+    player = game.get_particle(PLAYER)
+    for _ in range(XP_MERGE_DENSITY):
+        game.spawn_xp(player.x + 400, player.y + 400)
+    game.spawn_xp(player.x - 400, player.y - 400)
+
+    game.merge_xp()
+    game.flush_removals()
+
+    assert sorted(gem_values(game)) == [XP_GEM_VALUE, XP_MERGE_DENSITY * XP_GEM_VALUE]
+
+
+def test_pickup_credits_the_merged_value(make_game):
+    game = make_game(seed=1)
+    player = game.get_particle(PLAYER)
+    for _ in range(XP_MERGE_DENSITY):
+        game.spawn_xp(player.x, player.y)
+    game.merge_xp()
+    game.flush_removals()
+    assert gem_values(game) == [XP_MERGE_DENSITY * XP_GEM_VALUE]
+
+    xp_before = game.xp
+    game.step([False] * 5)
+
+    assert game.count_particles(XP) == 0
+    assert game.xp == xp_before + XP_MERGE_DENSITY * XP_GEM_VALUE
@@ -0,0 +1,74 @@
+import time
+
+import numpy as np
+
+
+class StepTimer:
+    """
+    Frame/wall-time budget and step() latency statistics for headless runs.
+
+    The clock is injectable (any callable returning seconds) so runs can be
+    timed with a fake clock; it measures both the budget and the latency of
+    each step. Latencies are kept in a list and only summarized at the end.
+    """
+
+    def __init__(self, max_frames=None, max_seconds=None, clock=time.perf_counter):
+        """
+        Initialize the timer.
+
+        Args:
+            max_frames (int, optional): Stop after this many steps.
+            max_seconds (float, optional): Stop after this much clock time.
+            clock (callable): Returns the current time in seconds.
+        """
+        self.max_frames = max_frames
+        self.max_seconds = max_seconds
+        self.clock = clock
+        self.latencies = []
+        self.started = clock()
+
+    @property
+    def frames(self):
+        return len(self.latencies)
+
+    def elapsed(self):
+        return self.clock() - self.started
+
+    def done(self):
+        """Return True once either budget is used up."""
+        if self.max_frames is not None and self.frames >= self.max_frames:
+            return True
+        return self.max_seconds is not None and self.elapsed() >= self.max_seconds
+
+    def step(self, game, action):
+        """Run game.step(action) and record how long it took."""
+        start = self.clock()
+        game.step(action)
+        self.latencies.append(self.clock() - start)
+
+    def summary(self, game):
+        """
+        Summarize the run.
+
+        Returns:
+            dict: frames, seconds, steps_per_second, mean_ms and p99_ms of
+            step(), and entities (particle count per kind at the end).
+        """
+        seconds = self.elapsed()
+        latencies = np.array(self.latencies) if self.latencies else np.zeros(1)
+        return {
+            "frames": self.frames,
+            "seconds": seconds,
+            "steps_per_second": self.frames / seconds if seconds > 0 else 0.0,
+            "mean_ms": float(latencies.mean() * 1000),
+            "p99_ms": float(np.percentile(latencies, 99) * 1000),
+            "entities": {kind: len(bucket) for kind, bucket in game.particles_by_kind.items() if bucket},
+        }
+
+    def report(self, game):
+        """Print the summary and return it."""
+        stats = self.summary(game)
+        print("帧数: {frames}, 用时: {seconds:.2f}秒, {steps_per_second:.0f} 步/秒".format(**stats))
+        print("step() 平均: {mean_ms:.3f}ms, p99: {p99_ms:.3f}ms".format(**stats))
+        print("实体数量: " + ", ".join("{}={}".format(kind, count) for kind, count in stats["entities"].items()))
+        return stats
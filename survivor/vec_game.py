@@ -0,0 +1,327 @@
+from contextlib import suppress
+from dataclasses import dataclass
+
+import numpy as np
+
+from games.survivor import (
+    ENEMY,
+    ENEMY_ELITE,
+    PLAYER,
+    STATE_GAME_OVER,
+    STATE_PLAYING,
+    STATE_UPGRADE_MENU,
+    WEAPON,
+    XP,
+    ContactBatch,
+    ContactResult,
+    EnemyBatch,
+    EnemyMotion,
+    EnemySeparation,
+    Game,
+    HitBatch,
+    SpawnBatch,
+    move_enemies,
+    narrowphase,
+    push_apart_enemies,
+    spawn_positions,
+    subtract_hits,
+)
+
+# 观测里实体的kind编码：OBS_KINDS中的下标
+OBS_KINDS = (PLAYER, ENEMY, ENEMY_ELITE, WEAPON, XP)
+# 每局一行的玩家特征
+PLAYER_FEATURES = ("x", "y", "hp", "level", "score")
+# 按游戏拆分的逐敌人结果字段
+_MOTION_FIELDS = ("x", "y", "dx", "dy", "despawn", "knocked", "knockback_timer")
+_CONTACT_FIELDS = ("dx", "dy", "dist", "touching", "in_radius")
+
+
+@dataclass
+class VecObservation:
+    """Entities of all games in shared flat arrays, with a game-index column"""
+    game: np.ndarray  # (M,) 实体所属的游戏下标
+    kind: np.ndarray  # (M,) OBS_KINDS中的下标
+    x: np.ndarray  # (M,)
+    y: np.ndarray  # (M,)
+    player: np.ndarray  # (N, len(PLAYER_FEATURES))
+
+
+def _bounds(counts):
+    """(start, end) of each part when parts of the given sizes are concatenated"""
+    ends = np.cumsum(counts).tolist()
+    return list(zip([0] + ends[:-1], ends))
+
+
+def run_spawns(batches):
+    """Place the spawns of several games in one spawn_positions call."""
+    if not any(len(batch.angle) for batch in batches):
+        return [([], [])] * len(batches)
+    merged = SpawnBatch(
+        [],
+        [],
+        np.concatenate([batch.angle for batch in batches]),
+        np.concatenate([batch.origin_x for batch in batches]),
+        np.concatenate([batch.origin_y for batch in batches]),
+    )
+    x, y = spawn_positions(merged)
+    return [(x[start:end], y[start:end]) for start, end in _bounds([len(batch.angle) for batch in batches])]
+
+
+def run_contacts(batches):
+    """Run the narrowphase of several games in one call."""
+    rows = []
+    for batch in batches:
+        rows += batch.rows
+    result = narrowphase(ContactBatch([], rows))
+    return [
+        ContactResult(*(getattr(result, name)[start:end] for name in _CONTACT_FIELDS))
+        for start, end in _bounds([len(batch.rows) for batch in batches])
+    ]
+
+
+def run_hits(batches):
+    """
+    Subtract the hits of several games in one subtract_hits call.
+
+    Each game gets its part back in its own dtype, so integer HP stays
+    integer even when another game's damage is fractional; games without
+    hits get None, as from run_phase.
+    """
+    hit = [batch for batch in batches if len(batch.hp)]
+    if not hit:
+        return [None] * len(batches)
+    sizes = [len(batch.hp) for batch in hit]
+    offsets = np.cumsum([0] + sizes[:-1])
+    remaining, after = subtract_hits(
+        np.concatenate([batch.hp for batch in hit]),
+        np.concatenate([batch.target + offset for batch, offset in zip(hit, offsets.tolist())]),
+        np.concatenate([batch.damage for batch in hit]),
+    )
+    parts = {}
+    hit_bounds = _bounds([len(batch.target) for batch in hit])
+    for batch, (start, end), (hit_start, hit_end) in zip(hit, _bounds(sizes), hit_bounds):
+        dtype = np.result_type(batch.hp, batch.damage)
+        parts[id(batch)] = (remaining[start:end].astype(dtype), after[hit_start:hit_end].astype(dtype))
+    return [parts.get(id(batch)) for batch in batches]
+
+
+def run_moves(batches):
+    """Move the enemies of several games in one move_enemies call."""
+    merged, group, counts = concat_batches(batches)
+    return split_motion(move_enemies(merged, group), counts)
+
+
+def run_separations(separations):
+    """Push apart the overlapping enemies of several games in one call."""
+    push_apart_enemies(concat_separations(separations))
+    return [None] * len(separations)
+
+
+# step_phases产出的请求类型 -> 多局合并执行的函数
+BATCHED_PHASES = {
+    SpawnBatch: run_spawns,
+    EnemyBatch: run_moves,
+    ContactBatch: run_contacts,
+    HitBatch: run_hits,
+    EnemySeparation: run_separations,
+}
+
+
+def concat_batches(batches):
+    """
+    Merge the EnemyBatch of several games into one.
+
+    Returns:
+        tuple: (merged EnemyBatch, game index per enemy, enemies per batch).
+    """
+    counts = [len(batch.enemies) for batch in batches]
+    enemies = []
+    rows = []
+    for batch in batches:
+        enemies += batch.enemies
+        rows += batch.rows
+    group = np.repeat(np.arange(len(batches)), counts)
+    return EnemyBatch(enemies, rows), group, counts
+
+
+def split_motion(motion, counts):
+    """Split the EnemyMotion of a merged batch back into one per game."""
+    ends = np.cumsum(counts)
+    starts = ends - counts
+    # 敌人对按i排序，而i按游戏连续编号，所以每局的敌人对是连续的一段
+    pair_bounds = np.searchsorted(motion.pair_i, np.concatenate((starts, ends[-1:]))).tolist()
+    parts = []
+    for k, (start, end) in enumerate(zip(starts.tolist(), ends.tolist())):
+        lo, hi = pair_bounds[k], pair_bounds[k + 1]
+        parts.append(EnemyMotion(
+            *(getattr(motion, name)[start:end] for name in _MOTION_FIELDS),
+            motion.pair_i[lo:hi] - start,
+            motion.pair_j[lo:hi] - start,
+            motion.unit_x[lo:hi],
+            motion.unit_y[lo:hi],
+        ))
+    return parts
+
+
+def concat_separations(separations):
+    """Merge the EnemySeparation of several games into one."""
+    enemies = []
+    offsets = []
+    for separation in separations:
+        offsets.append(len(enemies))
+        enemies += separation.enemies
+    return EnemySeparation(
+        enemies,
+        np.concatenate([separation.pair_i + offset for separation, offset in zip(separations, offsets)]),
+        np.concatenate([separation.pair_j + offset for separation, offset in zip(separations, offsets)]),
+        np.concatenate([separation.unit_x for separation in separations]),
+        np.concatenate([separation.unit_y for separation in separations]),
+    )
+
+
+class VecGame:
+    """
+    N independent survivor games stepped in lockstep.
+
+    Every step runs the games' step_phases generators side by side and does
+    the array work they yield for all games at once (see BATCHED_PHASES):
+    spawn placement, enemy movement (with a game-index column keeping the
+    games apart), the collision narrowphase, the combat HP subtraction and
+    the end-of-frame separation each take one call over the entities of
+    every game. What stays per game is the Python glue between the phases:
+    gathering the arrays, the weapon behaviors and writing results back to
+    the particles. Games that end are reset
+    automatically with a fresh seed, so the returned flags mark the last
+    frame of an episode. Upgrade menus are answered by each game's agent,
+    so a stream of movement actions is enough to keep every game going.
+    """
+
+    def __init__(self, num_games, seed=None, max_episode_steps=None, batched=True, **game_kwargs):
+        """
+        Create and reset the games.
+
+        Args:
+            num_games (int): Number of games.
+            seed (int, optional): Root seed; every game and every episode gets
+                its own seed derived from it. None draws fresh entropy.
+            max_episode_steps (int, optional): Truncate episodes after this
+                many steps.
+            batched (bool): Move the enemies of all games in one batch. False
+                steps each game on its own (same results, for comparison).
+            **game_kwargs: Passed to each Game.
+        """
+        self.num_games = num_games
+        self.max_episode_steps = max_episode_steps
+        self.batched = batched
+        # 每局一个种子序列，每次重置从中派生新的种子
+        self.seed_sequences = np.random.SeedSequence(seed).spawn(num_games)
+        self.games = [Game(seed=self._next_seed(k), **game_kwargs) for k in range(num_games)]
+        self.episode_steps = np.zeros(num_games, dtype=np.int64)
+        self.last_scores = np.zeros(num_games, dtype=np.int64)
+        for k in range(num_games):
+            self._reset_game(k, reseed=False)
+
+    def _next_seed(self, k):
+        child = self.seed_sequences[k].spawn(1)[0]
+        return int(child.generate_state(1, dtype=np.uint64)[0])
+
+    def _reset_game(self, k, reseed=True):
+        game = self.games[k]
+        if reseed:
+            game.reseed(self._next_seed(k))
+        game.reset_game()
+        game.game_state = STATE_PLAYING
+        self.episode_steps[k] = 0
+        self.last_scores[k] = game.score
+
+    def reset(self):
+        """Reset every game and return the first observation."""
+        for k in range(self.num_games):
+            self._reset_game(k)
+        return self.observe()
+
+    def step(self, actions):
+        """
+        Advance every game by one frame.
+
+        Args:
+            actions (array-like): (N, 5) booleans, one Game.step action per game.
+
+        Returns:
+            tuple: (observation, rewards, dones, info). Rewards are the score
+            gained this frame. Games flagged done have already been reset
+            and the observation shows their new episode; info holds the
+            "final_score" and "episode_steps" of the episodes that ended.
+        """
+        actions = np.asarray(actions, dtype=bool).reshape(self.num_games, -1).tolist()
+        pending = []
+        for game, action in zip(self.games, actions):
+            if game.game_state == STATE_UPGRADE_MENU:
+                game.resolve_menus()
+            if not self.batched:
+                game.step(action)
+                continue
+            phases = game.step_phases(action)
+            with suppress(StopIteration):
+                pending.append((phases, next(phases)))
+
+        # 所有游戏按相同顺序产出请求，每一轮同类请求合并执行；中途结束的游戏退出
+        while pending:
+            groups = {}
+            for k, (_, request) in enumerate(pending):
+                groups.setdefault(type(request), []).append(k)
+            answers = [None] * len(pending)
+            for phase, members in groups.items():
+                for k, answer in zip(members, BATCHED_PHASES[phase]([pending[k][1] for k in members])):
+                    answers[k] = answer
+            waiting = []
+            for (phases, _), answer in zip(pending, answers):
+                with suppress(StopIteration):
+                    waiting.append((phases, phases.send(answer)))
+            pending = waiting
+
+        self.episode_steps += 1
+        scores = np.fromiter((game.score for game in self.games), dtype=np.int64, count=self.num_games)
+        rewards = scores - self.last_scores
+        self.last_scores = scores
+        dones = np.fromiter(
+            (game.game_state == STATE_GAME_OVER for game in self.games), dtype=bool, count=self.num_games
+        )
+        if self.max_episode_steps is not None:
+            dones |= self.episode_steps >= self.max_episode_steps
+        info = {"final_score": scores[dones], "episode_steps": self.episode_steps[dones].copy()}
+        for k in np.flatnonzero(dones).tolist():
+            self._reset_game(k)
+        return self.observe(), rewards, dones, info
+
+    def agent_actions(self, actions):
+        """Return the built-in agent's next (N, 5) actions given the previous ones."""
+        actions = np.asarray(actions, dtype=bool).reshape(self.num_games, -1).tolist()
+        return np.array([game.agent_action(action) for game, action in zip(self.games, actions)], dtype=bool)
+
+    def observe(self):
+        """Gather the entities of every game into a VecObservation."""
+        counts = []
+        xs = []
+        ys = []
+        player = np.zeros((self.num_games, len(PLAYER_FEATURES)))
+        for k, game in enumerate(self.games):
+            for kind in OBS_KINDS:
+                bucket = game.particles_by_kind.get(kind, ())
+                counts.append(len(bucket))
+                xs += [particle.x for particle in bucket]
+                ys += [particle.y for particle in bucket]
+            particle = game.get_particle(PLAYER)
+            if particle is not None:
+                hp = particle.health_system.current_hp if particle.health_system else 0
+                player[k] = (particle.x, particle.y, hp, game.level, game.score)
+        # counts按(游戏, kind)排列
+        game_index = np.repeat(np.arange(self.num_games, dtype=np.int32), len(OBS_KINDS))
+        kind_index = np.tile(np.arange(len(OBS_KINDS), dtype=np.int8), self.num_games)
+        return VecObservation(
+            np.repeat(game_index, counts),
+            np.repeat(kind_index, counts),
+            np.array(xs, dtype=np.float64),
+            np.array(ys, dtype=np.float64),
+            player,
+        )
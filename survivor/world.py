@@ -0,0 +1,110 @@
+import math
+
+import numpy as np
+
+
+class Camera:
+    """
+    Screen-sized viewport onto a world larger than the screen.
+
+    The camera centres on a point (the player) but never shows anything
+    outside the world, so near the edges the point drifts off centre. x and
+    y are the world coordinates of the viewport's top-left corner; screen
+    coordinates are world coordinates minus (x, y).
+    """
+
+    def __init__(self, width, height, world_width, world_height):
+        """
+        Initialize a camera at the world's top-left corner.
+
+        Args:
+            width (float): Viewport width (the screen width).
+            height (float): Viewport height (the screen height).
+            world_width (float): World width.
+            world_height (float): World height.
+        """
+        self.width = width
+        self.height = height
+        self.world_width = world_width
+        self.world_height = world_height
+        self.x = 0.0
+        self.y = 0.0
+
+    def follow(self, x, y):
+        """Centre the viewport on (x, y), clamped to the world bounds."""
+        self.x = min(max(x - self.width / 2, 0.0), max(self.world_width - self.width, 0.0))
+        self.y = min(max(y - self.height / 2, 0.0), max(self.world_height - self.height, 0.0))
+
+    def contains(self, x, y, margin=0.0):
+        """True if (x, y) is inside the viewport grown by margin on every side."""
+        return (self.x - margin <= x <= self.x + self.width + margin and
+                self.y - margin <= y <= self.y + self.height + margin)
+
+    def to_screen(self, x, y):
+        """Convert world coordinates to screen coordinates."""
+        return x - self.x, y - self.y
+
+
+class ChunkGrid:
+    """
+    Square chunks over world space, with an active window around the camera.
+
+    Chunks are only a partition of coordinates: nothing is stored per
+    chunk, and an entity's chunk is computed from its position when needed,
+    so moving entities cost nothing to keep filed. The active chunks are the
+    ones overlapping the viewport plus margin chunks on every side; they
+    form a rectangle of chunk indices, so membership tests are a few
+    comparisons however large the world is.
+    """
+
+    def __init__(self, chunk_size, world_width, world_height, margin=1):
+        """
+        Initialize the grid with no active chunks.
+
+        Args:
+            chunk_size (float): Side of a chunk in world units.
+            world_width (float): World width.
+            world_height (float): World height.
+            margin (int): Chunks kept active beyond the viewport on each side.
+        """
+        self.chunk_size = chunk_size
+        self.cols = max(1, math.ceil(world_width / chunk_size))
+        self.rows = max(1, math.ceil(world_height / chunk_size))
+        self.margin = margin
+        # 活跃窗口（含两端）：col0..col1, row0..row1；col1 < col0表示没有活跃区块
+        self.bounds = (0, 0, -1, -1)
+
+    def chunk_of(self, x, y):
+        """Return the (col, row) of the chunk containing (x, y), clamped to the grid."""
+        col = min(max(int(x // self.chunk_size), 0), self.cols - 1)
+        row = min(max(int(y // self.chunk_size), 0), self.rows - 1)
+        return col, row
+
+    def activate(self, camera):
+        """Make the chunks overlapping the camera's viewport (plus the margin) the active window."""
+        col0, row0 = self.chunk_of(camera.x, camera.y)
+        col1, row1 = self.chunk_of(camera.x + camera.width, camera.y + camera.height)
+        self.bounds = (
+            max(col0 - self.margin, 0),
+            max(row0 - self.margin, 0),
+            min(col1 + self.margin, self.cols - 1),
+            min(row1 + self.margin, self.rows - 1),
+        )
+
+    def active_chunks(self):
+        """Return the (col, row) of every active chunk."""
+        col0, row0, col1, row1 = self.bounds
+        return [(col, row) for col in range(col0, col1 + 1) for row in range(row0, row1 + 1)]
+
+    def is_active(self, x, y):
+        """True if (x, y) lies in an active chunk."""
+        col0, row0, col1, row1 = self.bounds
+        col, row = self.chunk_of(x, y)
+        return col0 <= col <= col1 and row0 <= row <= row1
+
+    def active_mask(self, x, y):
+        """Vectorized is_active over coordinate arrays."""
+        col0, row0, col1, row1 = self.bounds
+        col = np.clip(np.floor_divide(x, self.chunk_size), 0, self.cols - 1)
+        row = np.clip(np.floor_divide(y, self.chunk_size), 0, self.rows - 1)
+        return (col >= col0) & (col <= col1) & (row >= row0) & (row <= row1)